@@ -4,10 +4,14 @@ Flask API Server - GPT-4o搭載 + Pydantic Validation
 """
 import os
 import json
+import re
+import time
+import uuid
+import base64
 import logging
 from datetime import datetime
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, abort, send_from_directory, g
 from flask_cors import CORS
 from pydantic import ValidationError
 from dotenv import load_dotenv
@@ -19,29 +23,37 @@ load_dotenv()
 from models import (
     QuestionRequest, SubmissionRequest, QuestionResponse, CorrectionResponse,
     ValidationRequest, ValidationResponse, ConstraintChecks,
+    BatchValidationRequest, BatchValidationResponse,
     OutlineRequest, OutlineResponse
 )
-from llm_service import generate_question, correct_answer
+from llm_service import generate_question, correct_answer, correct_multi_sentences
 from database import (
     save_question, get_question, save_submission, 
     get_submission_history, get_statistics, get_excluded_themes,
     get_theme_statistics
 )
-from constraint_validator import validate_constraints
+from constraint_validator import (
+    validate_constraints, validate_constraints_batch, WORD_COUNT_RULES
+)
 from outline_generator import generate_outline
 from japanese_utils import split_japanese_sentences
+from jobs import submit_job, get_job_status
+from points_normalizer import normalize_user_input
+import singleflight
+import question_bank
+import metrics
+from logging_utils import configure_logging, start_request_sampling, log_payload, LazyPreview
+from response_utils import FastJSONProvider, compress_response
+from static_assets import build_manifest, file_hash, hashed_filename, parse_hashed_filename
 import config
 
-# ロギング設定
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format=config.LOG_FORMAT,
-    datefmt=config.LOG_DATE_FORMAT
-)
+# ロギング設定（LOG_JSON=true で構造化ログ）
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Flask初期化
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app, origins=config.CORS_ORIGINS)
 
 # データディレクトリ（後方互換性のため残す）
@@ -52,32 +64,131 @@ logger.info(f"🚀 {config.APP_NAME} v{config.APP_VERSION} 起動: http://localh
 logger.info(f"📊 データベース: {config.DB_PATH}")
 logger.info(f"🎯 有効機能: {sum(config.FEATURES.values())}/{len(config.FEATURES)}")
 
+# ===== リクエスト単位のログサンプリング =====
+
+@app.before_request
+def sample_request_logging():
+    """大きなペイロードをDEBUGログに出すリクエストを抽選"""
+    start_request_sampling()
+
+# ===== リクエストの処理時間（/metrics） =====
+# after_request は登録と逆順に実行されるため、最初に登録して圧縮まで含めた時間を記録する
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """エンドポイント（URLルール）・メソッド・ステータスごとの処理時間（静的ファイルは除く）"""
+    start = g.get('request_start')
+    if start is not None and not request.path.startswith(('/static/', '/assets/')):
+        metrics.observe(
+            'http_request_duration_seconds', time.perf_counter() - start,
+            endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+            method=request.method,
+            status=response.status_code
+        )
+    return response
+
+# ===== レスポンス圧縮 =====
+# 処理時間の記録を除く他のフックより先に登録して、最後に圧縮する
+
+@app.after_request
+def compress(response):
+    """JSON・HTML・JS・CSS を Accept-Encoding に応じて br / gzip で圧縮"""
+    return compress_response(
+        response,
+        request.headers.get('Accept-Encoding', ''),
+        is_static=request.path.startswith(('/static/', '/assets/'))
+    )
+
+# ===== 利用者の識別 =====
+# ログインはないため、ブラウザごとのIDを Cookie で発行して履歴・出題の偏り判定・統計を利用者ごとに分ける
+# Cookie を使えないクライアント（スクリプトなど）は X-User-Id ヘッダーで指定できる
+
+USER_ID_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+@app.before_request
+def identify_user():
+    """Cookie（なければ X-User-Id ヘッダー）から利用者IDを取得し、なければ新しく発行"""
+    if request.path.startswith(('/static/', '/assets/', '/metrics')):
+        return
+    user_id = request.cookies.get(config.USER_COOKIE_NAME) or request.headers.get('X-User-Id', '')
+    g.new_user_id = not USER_ID_RE.match(user_id)
+    g.user_id = uuid.uuid4().hex if g.new_user_id else user_id
+
+
+@app.after_request
+def set_user_cookie(response):
+    """新しく発行した利用者IDを Cookie に保存"""
+    if g.get('new_user_id'):
+        response.set_cookie(
+            config.USER_COOKIE_NAME, g.user_id,
+            max_age=config.USER_COOKIE_MAX_AGE, httponly=True, samesite='Lax'
+        )
+    return response
+
 # ===== キャッシュ対策 =====
 
 @app.after_request
 def add_cache_control_headers(response):
     """
-    静的ファイル（JS/CSS）のキャッシュを無効化
+    ハッシュなしの静的ファイル（/static/）は毎回再検証させる
     
     理由: フロントエンドの修正が即座に反映されるようにする
-    対象: /static/main.js, /static/style.css
+    テンプレートからはハッシュ入りURL（/assets/、無期限キャッシュ）を参照するため、
+    /static/ を直接参照するのは古いページや外部からのリンクのみ。
+    ETag は残すので、内容が変わっていなければ 304 で本文は再送しない。
     """
     if request.path.startswith('/static/'):
-        # 開発環境：キャッシュを完全に無効化
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        # ETag を削除してブラウザのキャッシュ判定を完全に無効化
-        response.headers.pop('ETag', None)
+        response.headers['Cache-Control'] = 'no-cache'
         logger.debug(f"Cache-Control applied to: {request.path}")
     return response
 
+# ===== 静的ファイル（ハッシュ入りURL） =====
+
+STATIC_DIR = Path(app.static_folder)
+
+
+def asset_url(filename: str) -> str:
+    """静的ファイルの内容のハッシュ入りURL（テンプレートでは {{ asset_url('main.js') }}）"""
+    hashed = hashed_filename(STATIC_DIR, filename)
+    return f"/assets/{hashed}" if hashed else f"/static/{filename}"
+
+
+app.jinja_env.globals['asset_url'] = asset_url
+
+# 起動時にハッシュを計算しておく（以降はファイルが更新されたときだけ再計算）
+logger.info(f"🗂️ 静的ファイルのハッシュ: {len(build_manifest(STATIC_DIR))}件")
+
+
+@app.route('/assets/<path:hashed>')
+def hashed_asset(hashed):
+    """
+    ハッシュ入りURLの静的ファイル（例: /assets/main.3f2a1b9c0d.js → static/main.js）
+    ハッシュが現在の内容と一致すれば無期限キャッシュ、古いハッシュなら再検証付きで現在の内容を返す
+    """
+    parsed = parse_hashed_filename(hashed)
+    if parsed is None:
+        abort(404)
+    filename, digest = parsed
+    
+    response = send_from_directory(STATIC_DIR, filename)
+    if digest == file_hash(STATIC_DIR, filename):
+        response.headers['Cache-Control'] = f'public, max-age={config.ASSET_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 # ===== APIエンドポイント =====
 
 @app.route('/')
 def index():
-    """メインページ"""
-    return render_template('index.html')
+    """メインページ（語数カウントルールを埋め込み、フロントエンドの語数をサーバーと一致させる）"""
+    return render_template('index.html', word_count_rules=WORD_COUNT_RULES)
 
 
 @app.route('/system-info')
@@ -104,18 +215,30 @@ def api_generate_question():
         data = request.get_json() or {}
         question_request = QuestionRequest(**data)
         
-        # 最近使用されたテーマを除外
-        recent_themes = get_excluded_themes(max_recent=10)
+        # この利用者に最近出題したテーマを除外
+        recent_themes = get_excluded_themes(max_recent=10, user_id=g.user_id)
         all_excluded = list(set(question_request.excluded_themes + recent_themes))
         
-        # 問題を生成
-        question = generate_question(
-            difficulty=question_request.difficulty,
-            excluded_themes=all_excluded
-        )
+        # 問題バンクにこの利用者が未出題の問題があればそこから出題し、なければ生成
+        # （除外テーマは守り、最近使ったテーマはバンクの全ジャンルが該当しない限り避ける）
+        question = None
+        if config.QUESTION_BANK_ENABLED:
+            question = question_bank.pick_question(
+                g.user_id,
+                excluded_themes=question_request.excluded_themes,
+                avoid_themes=recent_themes
+            )
+        source = 'bank'
+        if question is None:
+            question = generate_question(
+                difficulty=question_request.difficulty,
+                excluded_themes=all_excluded,
+                user_id=g.user_id
+            )
+            source = 'llm'
         
         # データベースに保存
-        question_id = save_question(question)
+        question_id = save_question(question, user_id=g.user_id, source=source)
         
         # レスポンスを返す
         response_data = question.model_dump()
@@ -137,6 +260,7 @@ def api_correct_answer():
     """
     英作文を添削
     POST /api/correct
+    POST /api/correct?async=1 → 202 {"job_id": ...}（結果は GET /api/jobs/<job_id>）
     Body: {
         "question_id": "q_xxx",
         "japanese_sentences": [...],
@@ -149,73 +273,161 @@ def api_correct_answer():
         data = request.get_json()
         submission = SubmissionRequest(**data)
         
+        # ダブルクリックなどで同時に届いた同一の添削は1回の実行にまとめる
+        # （提出履歴は利用者ごとなので、別の利用者の同じ回答はまとめない）
+        user_id = g.user_id
+        flight_key = singleflight.make_key(
+            'correct', submission.question_id, normalize_user_input(submission.user_answer), user_id=user_id
+        )
+        run = lambda: singleflight.run(flight_key, lambda: _run_correction(submission, data, user_id))
+        
+        if _is_async_request():
+            return _submit_correction_job('correct', run)
+        
+        return jsonify(run()), 200
+        
+    except ValidationError as e:
+        logger.error(f"Validation error: {e}")
+        return jsonify({'error': 'Invalid request', 'details': e.errors()}), 400
+    
+    except Exception as e:
+        logger.error(f"Correction error: {e}", exc_info=True)
+        return jsonify({
+            'error': '申し訳ございません。一時的なエラーが発生しました。もう一度お試しください。',
+            'technical_details': str(e)
+        }), 500
+
+
+def _run_correction(submission: SubmissionRequest, data: dict, user_id: str = "") -> dict:
+    """
+    添削を実行して保存し、レスポンス用の dict を返す（同期・非同期ジョブ共通）
+    
+    途中で失敗した場合でも、基本的なフィードバック（フォールバック応答）を返す
+    """
+    try:
         # 添削を実行
         correction = correct_answer(submission)
         
-        # デバッグ用：添削結果を完全にログ出力
-        import json
-        response_dict = correction.model_dump()
-        logger.info(f"=== Full correction response ===")
-        logger.info(f"Points count: {len(response_dict.get('points', []))}")
-        for i, point in enumerate(response_dict.get('points', [])):
-            logger.info(f"Point {i}: before='{point.get('before', '')[:30]}', level='{point.get('level', 'MISSING')}'")
-        logger.info(f"Full JSON:\n{json.dumps(response_dict, ensure_ascii=False, indent=2)}")
+        response_data = correction.model_dump()
+        
+        # デバッグ用：添削結果（DEBUGレベルかつサンプリング当選時のみ全文をシリアライズ）
+        logger.info("Correction completed: %d points", len(response_data['points']))
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, point in enumerate(response_data['points']):
+                logger.debug("Point %d: before='%s', level='%s'", i, LazyPreview(point.get('before'), 30), point.get('level', 'MISSING'))
+        log_payload(logger, "Full correction response", response_data)
         
         # データベースに保存
         submission_id = save_submission(
             question_id=submission.question_id,
             user_answer=submission.user_answer,
-            correction=correction
+            correction=correction,
+            user_id=user_id
         )
         
-        # レスポンスを返す
-        response_data = correction.model_dump()
         response_data['submission_id'] = submission_id
-        
-        return jsonify(response_data), 200
-        
-    except ValidationError as e:
-        logger.error(f"Validation error: {e}")
-        return jsonify({'error': 'Invalid request', 'details': e.errors()}), 400
+        return response_data
     
     except Exception as e:
         logger.error(f"Correction error: {e}", exc_info=True)
         
         # エラーが発生した場合でも、ユーザーには基本的なフィードバックを返す
         try:
-            # フォールバック応答を生成
-            from llm_service import _generate_fallback_correction
-            user_answer = data.get('user_answer', '')
-            fallback_data = _generate_fallback_correction(
-                user_answer,
-                data.get('question_text', '')
-            )
-            
-            # constraint_checks を追加
-            word_count = len(user_answer.split())
-            fallback_data['constraint_checks'] = {
-                "word_count": word_count,
-                "within_word_range": 100 <= word_count <= 120,
-                "detected_units": 0,
-                "required_units": 2,
-                "has_required_units": False,
-                "unit_detection_confidence": "low",
-                "markers_found": [],
-                "because_count": 0,
-                "sentence_count": user_answer.count('.'),
-                "notes": ["システムエラーにより制約チェックをスキップしました"],
-                "suggestions": []
-            }
-            
-            logger.info("Returning fallback correction response to user")
-            return jsonify(fallback_data), 200
-            
+            return _build_fallback_correction(data)
         except Exception as fallback_error:
             logger.error(f"Fallback generation also failed: {fallback_error}")
-            return jsonify({
-                'error': '申し訳ございません。一時的なエラーが発生しました。もう一度お試しください。',
-                'technical_details': str(e)
-            }), 500
+            raise e
+
+
+def _build_fallback_correction(data: dict) -> dict:
+    """フォールバック応答を生成（LLMでの添削に失敗した場合）"""
+    from llm_service import _generate_fallback_correction
+    user_answer = data.get('user_answer', '')
+    fallback_data = _generate_fallback_correction(
+        user_answer,
+        data.get('question_text', '')
+    )
+    
+    # constraint_checks を追加
+    word_count = len(user_answer.split())
+    fallback_data['constraint_checks'] = {
+        "word_count": word_count,
+        "within_word_range": 100 <= word_count <= 120,
+        "detected_units": 0,
+        "required_units": 2,
+        "has_required_units": False,
+        "unit_detection_confidence": "low",
+        "markers_found": [],
+        "because_count": 0,
+        "sentence_count": user_answer.count('.'),
+        "notes": ["システムエラーにより制約チェックをスキップしました"],
+        "suggestions": []
+    }
+    
+    logger.info("Returning fallback correction response to user")
+    return fallback_data
+
+
+# ===== レスポンス形式の版 =====
+
+# 版2で省く、リクエストの内容をそのまま返しているだけの項目
+ECHO_FIELDS = ('japanese_sentences', 'user_sentences')
+
+
+def _api_version() -> int:
+    """X-API-Version ヘッダー（または ?api_version=）で指定されたレスポンス形式の版"""
+    value = request.headers.get('X-API-Version') or request.args.get('api_version')
+    try:
+        return int(value) if value else config.API_RESPONSE_VERSION_DEFAULT
+    except ValueError:
+        return config.API_RESPONSE_VERSION_DEFAULT
+
+
+def _strip_echo_fields(result: dict) -> dict:
+    """版2以降のレスポンスからエコー項目を省く（single-flight で共有する結果は書き換えない）"""
+    return {k: v for k, v in result.items() if k not in ECHO_FIELDS}
+
+
+# ===== 非同期ジョブ =====
+
+def _is_async_request() -> bool:
+    """?async=1（または true）なら非同期ジョブとして受け付ける"""
+    return request.args.get('async', '').lower() in ('1', 'true')
+
+
+def _submit_correction_job(kind: str, func):
+    """添削ジョブを登録して 202 を返す（実行待ちが上限なら 503）"""
+    job_id = submit_job(kind, func)
+    if job_id is None:
+        return jsonify({
+            'error': '現在混み合っています。しばらくしてからもう一度お試しください。'
+        }), 503
+    
+    response = jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f"/api/jobs/{job_id}"
+    })
+    response.headers['Location'] = f"/api/jobs/{job_id}"
+    return response, 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_get_job(job_id):
+    """
+    非同期ジョブの状態と結果を取得
+    GET /api/jobs/<job_id>
+    Response: {"job_id", "status": "queued|running|done|error", "result"（done時）, "error"（error時）, ...}
+    """
+    try:
+        job = get_job_status(job_id)
+        if job is None:
+            return jsonify({'error': 'job not found or expired'}), 404
+        return jsonify(job), 200
+        
+    except Exception as e:
+        logger.error(f"Job retrieval error: {e}")
+        return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/split-japanese', methods=['POST'])
@@ -250,6 +462,8 @@ def api_correct_multi_sentences():
     """
     複数文を個別に添削（新形式）
     POST /api/correct-multi
+    POST /api/correct-multi?async=1 → 202 {"job_id": ...}（結果は GET /api/jobs/<job_id>）
+    X-API-Version: 2 → レスポンスから japanese_sentences / user_sentences のエコーを省く
     Body: {
         "question_id": "q_xxx",
         "japanese_sentences": ["日本文1", "日本文2", "日本文3"],
@@ -291,24 +505,21 @@ def api_correct_multi_sentences():
             target_words=target_words
         )
         
-        # 添削を実行
-        correction = correct_answer(submission)
-        
-        # データベースに保存
-        submission_id = save_submission(
-            question_id=question_id,
-            user_answer=combined_user_answer,
-            correction=correction
+        # ダブルクリックなどで同時に届いた同一の添削は1回の実行にまとめる
+        user_id = g.user_id
+        flight_key = singleflight.make_key(
+            'correct-multi', question_id, normalize_user_input(combined_user_answer), user_id=user_id
         )
+        shared_run = lambda: singleflight.run(
+            flight_key,
+            lambda: _run_multi_correction(submission, japanese_sentences, user_sentences, user_id)
+        )
+        run = (lambda: _strip_echo_fields(shared_run())) if _api_version() >= 2 else shared_run
         
-        # レスポンスに文ごとの情報を追加
-        response_data = correction.model_dump()
-        response_data['submission_id'] = submission_id
-        response_data['sentence_count'] = len(user_sentences)
-        response_data['japanese_sentences'] = japanese_sentences
-        response_data['user_sentences'] = user_sentences
+        if _is_async_request():
+            return _submit_correction_job('correct-multi', run)
         
-        return jsonify(response_data), 200
+        return jsonify(run()), 200
         
     except ValidationError as e:
         logger.error(f"Validation error: {e}")
@@ -319,6 +530,30 @@ def api_correct_multi_sentences():
         return jsonify({'error': str(e)}), 500
 
 
+def _run_multi_correction(
+    submission: SubmissionRequest, japanese_sentences: list, user_sentences: list, user_id: str = ""
+) -> dict:
+    """複数文の添削を実行して保存し、レスポンス用の dict を返す（同期・非同期ジョブ共通）"""
+    # 添削を実行（前回から変更された文だけをLLMに送る）
+    correction = correct_multi_sentences(submission)
+    
+    # データベースに保存
+    submission_id = save_submission(
+        question_id=submission.question_id,
+        user_answer=submission.user_answer,
+        correction=correction,
+        user_id=user_id
+    )
+    
+    # レスポンスに文ごとの情報を追加
+    response_data = correction.model_dump()
+    response_data['submission_id'] = submission_id
+    response_data['sentence_count'] = len(user_sentences)
+    response_data['japanese_sentences'] = japanese_sentences
+    response_data['user_sentences'] = user_sentences
+    return response_data
+
+
 @app.route('/api/model_answer', methods=['POST'])
 def api_model_answer():
     """
@@ -343,18 +578,22 @@ def api_model_answer():
                 # 新形式（japanese_paragraphs）を優先、なければ旧形式（japanese_sentences）
                 if question_data.get('japanese_paragraphs'):
                     question_text = "\n".join(question_data['japanese_paragraphs'])
-                    logger.info(f"Retrieved japanese_paragraphs from DB: {question_text[:100]}...")
+                    logger.debug("Retrieved japanese_paragraphs from DB: %s", LazyPreview(question_text))
                 elif question_data.get('japanese_sentences'):
                     question_text = "\n".join(question_data['japanese_sentences'])
-                    logger.info(f"Retrieved japanese_sentences from DB: {question_text[:100]}...")
+                    logger.debug("Retrieved japanese_sentences from DB: %s", LazyPreview(question_text))
                 else:
                     return jsonify({'error': 'question not found in DB'}), 404
             else:
                 return jsonify({'error': 'question not found in DB'}), 404
         
-        # 模範解答を生成（日本語原文から英訳）
-        from llm_service import generate_model_answer_only
-        result = generate_model_answer_only(question_text)
+        # 模範解答を取得（原文ごとにキャッシュ、なければ日本語原文から英訳を生成）
+        from llm_service import get_model_answer
+        # 同じ問題の模範解答を同時に要求された場合は1回の生成にまとめる
+        result = singleflight.run(
+            singleflight.make_key('model_answer', question_id, question_text.strip()),
+            lambda: get_model_answer(question_text)
+        )
         
         return jsonify(result), 200
         
@@ -366,28 +605,71 @@ def api_model_answer():
 @app.route('/api/history', methods=['GET'])
 def api_get_history():
     """
-    提出履歴を取得
+    提出履歴を新しい順に取得（キーセットページング）
     GET /api/history?limit=50
+    GET /api/history?limit=50&cursor=<前のレスポンスの next_cursor>
+    GET /api/history?fields=id,submitted_at,total_score,theme
+    GET /api/history?scope=all → 全利用者の履歴（既定はこの利用者の履歴のみ）
+    ※fields 未指定時は全項目（X-API-Version: 2 では一覧表示用の項目のみ）
     """
     try:
-        limit = int(request.args.get('limit', 50))
-        history = get_submission_history(limit=limit)
-        return jsonify({'history': history}), 200
+        limit = int(request.args.get('limit', config.HISTORY_DEFAULT_LIMIT))
+        limit = max(1, min(limit, config.HISTORY_MAX_LIMIT))
+        
+        fields_param = request.args.get('fields')
+        if fields_param:
+            fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+        elif _api_version() >= 2:
+            fields = config.HISTORY_SUMMARY_FIELDS
+        else:
+            fields = None
+        
+        cursor = request.args.get('cursor')
+        before = _decode_history_cursor(cursor) if cursor else None
+        
+        user_id = None if request.args.get('scope') == 'all' else g.user_id
+        history = get_submission_history(limit=limit + 1, before=before, fields=fields, user_id=user_id)
+        next_cursor = None
+        if len(history) > limit:
+            history = history[:limit]
+            next_cursor = _encode_history_cursor(history[-1])
+        
+        return jsonify({'history': history, 'next_cursor': next_cursor}), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
         
     except Exception as e:
         logger.error(f"History retrieval error: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+def _encode_history_cursor(row: dict) -> str:
+    """ページの最後の行の (submitted_at, id) をカーソル文字列にする"""
+    key = json.dumps([row['submitted_at'], row['id']], ensure_ascii=False)
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+
+def _decode_history_cursor(cursor: str) -> tuple:
+    """カーソル文字列を (submitted_at, id) に戻す"""
+    try:
+        submitted_at, submission_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(submitted_at), str(submission_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
 @app.route('/api/statistics', methods=['GET'])
 def api_get_statistics():
     """
     統計情報を取得
     GET /api/statistics
+    GET /api/statistics?scope=me → この利用者の統計のみ（既定は全利用者）
     """
     try:
-        stats = get_statistics()
-        theme_stats = get_theme_statistics()
+        user_id = g.user_id if request.args.get('scope') == 'me' else None
+        stats = get_statistics(user_id=user_id)
+        theme_stats = get_theme_statistics(user_id=user_id)
         
         return jsonify({
             'statistics': stats,
@@ -424,17 +706,49 @@ def api_validate_constraints():
             required_units=validation_request.required_units
         )
         
-        # Pydanticモデルに変換
-        constraints = ConstraintChecks(**constraints_result)
+        response = _build_validation_response(constraints_result)
+        
+        return jsonify(response.model_dump()), 200
+        
+    except ValidationError as e:
+        logger.error(f"Validation error: {e}")
+        return jsonify({'error': 'Invalid request', 'details': e.errors()}), 400
+    
+    except Exception as e:
+        logger.error(f"Constraint validation error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/validate-constraints/batch', methods=['POST'])
+def api_validate_constraints_batch():
+    """
+    制約を一括検証（クラス全体の採点・オフライン評価用）
+    POST /api/validate-constraints/batch
+    Body: {
+        "texts": ["テキスト1", "テキスト2", ...],
+        "min_words": 60,
+        "max_words": 160,
+        "required_units": 2
+    }
+    Response: {"results": [...], "count": N}（入力順）
+    
+    ワーカーはスレッドで並行処理しているため、ここではプロセスプールを使わず逐次処理する
+    （スレッドを持つプロセスの fork を避ける。正規表現の検証なので数百件でも数十ミリ秒）
+    """
+    try:
+        data = request.get_json()
+        batch_request = BatchValidationRequest(**data)
         
-        # すべての制約を満たしているか判定
-        all_met = constraints.within_word_range and constraints.has_required_units
-        ready = all_met  # 追加条件があれば調整可能
+        constraints_results = validate_constraints_batch(
+            texts=batch_request.texts,
+            min_words=batch_request.min_words,
+            max_words=batch_request.max_words,
+            required_units=batch_request.required_units
+        )
         
-        response = ValidationResponse(
-            constraints=constraints,
-            all_constraints_met=all_met,
-            ready_to_submit=ready
+        response = BatchValidationResponse(
+            results=[_build_validation_response(r) for r in constraints_results],
+            count=len(constraints_results)
         )
         
         return jsonify(response.model_dump()), 200
@@ -444,10 +758,38 @@ def api_validate_constraints():
         return jsonify({'error': 'Invalid request', 'details': e.errors()}), 400
     
     except Exception as e:
-        logger.error(f"Constraint validation error: {e}")
+        logger.error(f"Batch constraint validation error: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+def _build_validation_response(constraints_result: dict) -> ValidationResponse:
+    """validate_constraints() の結果を ValidationResponse に変換"""
+    # Pydanticモデルに変換
+    constraints = ConstraintChecks(**constraints_result)
+    
+    # すべての制約を満たしているか判定
+    all_met = constraints.within_word_range and constraints.has_required_units
+    ready = all_met  # 追加条件があれば調整可能
+    
+    return ValidationResponse(
+        constraints=constraints,
+        all_constraints_met=all_met,
+        ready_to_submit=ready
+    )
+
+
+@app.route('/api/word-count-rules', methods=['GET'])
+def api_word_count_rules():
+    """
+    語数カウント共通ルールを取得（フロントエンドの語数カウンター用）
+    GET /api/word-count-rules
+    Response: {"version": 1, "punctuation_map": {...}, "word_token_pattern": "...", ...}
+    """
+    response = jsonify(WORD_COUNT_RULES)
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response, 200
+
+
 @app.route('/api/outline', methods=['POST'])
 def api_generate_outline():
     """
@@ -497,6 +839,12 @@ def health_check():
     }), 200
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus 形式のメトリクス（全ワーカーの合算）"""
+    return app.response_class(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 if __name__ == '__main__':
     # 設定の検証
     config_errors = config.validate_config()
@@ -0,0 +1,100 @@
+"""
+ロギングのオーバーヘッド計測
+宮崎大学医学部英作文特訓システム
+
+debug/llm_response_*.json の添削結果を使い、1リクエスト分の処理
+（points 正規化 + 添削結果全体のログ出力）にかかる時間を
+ログレベル × ペイロードサンプリング率の組み合わせごとに計測する。
+
+使い方:
+    python bench_logging.py [--iterations 200]
+"""
+import io
+import copy
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import config
+import logging_utils
+from logging_utils import LazyPreview, log_payload
+from points_normalizer import normalize_points
+from llm_service import normalize_user_input
+
+BASE_DIR = Path(__file__).parent
+
+logger = logging.getLogger("bench_logging")
+
+
+def load_samples():
+    """debug/ に保存された添削結果を読み込む"""
+    samples = []
+    for path in sorted((BASE_DIR / "debug").glob("llm_response_*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            # 途中で書き込みが途切れたファイルは除外
+            continue
+        if data.get("original") and data.get("points"):
+            samples.append(data)
+    return samples
+
+
+def simulate_request(sample):
+    """/api/correct 相当のログ出力を含む1リクエスト分の処理"""
+    logging_utils.start_request_sampling()
+    normalized_answer = normalize_user_input(sample["original"])
+    points = normalize_points(copy.deepcopy(sample["points"]), normalized_answer, [], sample["original"])
+
+    response_data = dict(sample, points=points)
+    logger.info("Correction completed: %d points", len(points))
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, point in enumerate(points):
+            logger.debug("Point %d: before='%s', level='%s'", i, LazyPreview(point.get("before"), 30), point.get("level"))
+    log_payload(logger, "Full correction response", response_data)
+
+
+def run(samples, level, sample_rate, iterations):
+    """指定の設定で iterations 回実行し、1リクエストあたりの平均時間（ms）を返す"""
+    # 出力先はメモリ（端末への書き込み時間を計測に含めない）
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setFormatter(logging.Formatter(config.LOG_FORMAT, datefmt=config.LOG_DATE_FORMAT))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    config.LOG_PAYLOAD_SAMPLE_RATE = sample_rate
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        simulate_request(samples[i % len(samples)])
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ロギングのオーバーヘッド計測")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    samples = load_samples()
+    if not samples:
+        print("debug/llm_response_*.json が見つかりません")
+        return
+
+    print(f"サンプル数: {len(samples)}, 反復: {args.iterations}")
+    print(f"{'level':<8}{'payload_rate':>14}{'ms/request':>12}")
+    for level, sample_rate in [
+        (logging.WARNING, 0.0),
+        (logging.INFO, 0.0),
+        (logging.DEBUG, 0.0),
+        (logging.DEBUG, config.LOG_PAYLOAD_SAMPLE_RATE),
+        (logging.DEBUG, 1.0),
+    ]:
+        elapsed = run(samples, level, sample_rate, args.iterations)
+        print(f"{logging.getLevelName(level):<8}{sample_rate:>14.2f}{elapsed:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
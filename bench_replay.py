@@ -0,0 +1,297 @@
+"""
+添削パイプラインのオフライン・リプレイ計測
+宮崎大学医学部英作文特訓システム
+
+OpenAI を呼ばずに、記録済みのLLM応答を差し替えたクライアント経由で流し、
+correct_answer の各段階と全体の処理時間を計測する。
+- 応答のコーパス
+  - debug/llm_response_*.json（生のLLM応答。原文がないため回答の行数分のダミー原文で添削する）
+  - デバッグキャプチャのアーカイブ（llm_responses.jsonl.gz のうち request 付きの1回目の応答）
+- 段階ごとの時間（ms）：入力の正規化 / プロンプト生成 / LLM呼び出し（差し替えクライアント） /
+  clean_json_response / json.loads / points の検証（_filter_valid_points） / normalize_points /
+  pydantic のバリデーション / DB保存
+- 全体：correct_answer + save_submission を1スレッドと --threads の並列数で実行し、
+  1リクエストあたりの時間（p50/p95）とスループットを計測
+- 結果は JSON に保存し、--compare で以前の結果との差を表示する（回帰の確認用）
+
+使い方:
+    python bench_replay.py [--iterations 200] [--threads 1,4,8] [--llm-latency-ms 0]
+                           [--archive data/debug_capture/llm_responses.jsonl.gz]
+                           [--out bench_results/replay.json] [--compare bench_results/前回.json]
+"""
+import io
+import os
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import config
+
+BASE_DIR = Path(__file__).parent
+
+STAGES = [
+    "normalize_input", "prompt_build", "llm_call", "clean_json", "json_loads",
+    "validate_points", "normalize_points", "pydantic", "db_save",
+]
+
+
+# ===== 応答のコーパス =====
+
+def _replay_submission(name: str, user_answer: str):
+    """原文のない応答用のリクエスト（回答の行数分のダミー原文）"""
+    from models import SubmissionRequest
+
+    lines = [line for line in user_answer.split("\n") if line.strip()]
+    return SubmissionRequest(
+        question_id=f"replay_{name}",
+        japanese_sentences=[f"原文第{i}文。" for i in range(1, len(lines) + 1)],
+        user_answer=user_answer,
+        target_words={"min": 10, "max": 160},
+    )
+
+
+def load_corpus(archives: List[Path]) -> List[Dict[str, Any]]:
+    """記録済みのLLM応答と、そのもとになったリクエストの組を読み込む"""
+    import debug_capture
+    from models import SubmissionRequest
+
+    corpus = []
+    for path in sorted((BASE_DIR / "debug").glob("llm_response_*.json")):
+        response = path.read_text(encoding="utf-8")
+        try:
+            data = json.loads(response)
+        except json.JSONDecodeError:
+            # 途中で書き込みが途切れたファイルは除外
+            continue
+        if data.get("original") and data.get("points"):
+            corpus.append({
+                "name": path.stem,
+                "submission": _replay_submission(path.stem, data["original"]),
+                "response": response,
+            })
+
+    for archive in archives:
+        for record in debug_capture.read_archive(archive):
+            if record.get("kind") == "correction" and record.get("request"):
+                corpus.append({
+                    "name": record["capture_id"],
+                    "submission": SubmissionRequest(**record["request"]),
+                    "response": record["response"],
+                })
+    return corpus
+
+
+# ===== 差し替えクライアント =====
+
+_current = threading.local()
+
+
+class ReplayClient:
+    """chat.completions.create に、実行中のリクエストの記録済み応答を返す OpenAI クライアントの代役"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        message = SimpleNamespace(role="assistant", content=_current.response)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")])
+
+
+def install_replay_client(latency_ms: float = 0.0):
+    import llm_service
+
+    llm_service._client = ReplayClient(latency_ms)
+    llm_service._client_pid = os.getpid()
+
+
+# ===== 計測 =====
+
+def run_stages(sample: Dict[str, Any]) -> Dict[str, float]:
+    """correct_answer と同じ順で各段階を実行し、段階ごとの時間（ms）を返す"""
+    import llm_service
+    from constraint_validator import normalize_punctuation
+    from points_normalizer import normalize_points, normalize_user_input
+    from prompts_correction_respect import get_correction_prompt
+    from models import CorrectionResponse
+    from database import save_submission
+
+    submission = sample["submission"]
+    _current.response = sample["response"]
+    timings = {}
+
+    def timed(stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings[stage] = (time.perf_counter() - start) * 1000
+        return result
+
+    question_text = "\n".join(submission.japanese_sentences)
+    normalized_answer = timed(
+        "normalize_input",
+        lambda: normalize_user_input(normalize_punctuation(submission.user_answer), preserve_newlines=True)
+    )
+    word_count = len(normalized_answer.split())
+    prompt = timed("prompt_build", get_correction_prompt,
+                   question_text=question_text, user_answer=normalized_answer, word_count=word_count)
+    response = timed("llm_call", llm_service.call_openai_with_retry, prompt, is_model_answer=True)
+    cleaned = timed("clean_json", llm_service.clean_json_response, response)
+    data = timed("json_loads", json.loads, cleaned)
+    data.setdefault("original", normalized_answer)
+    data.setdefault("corrected", normalized_answer)
+    data.setdefault("word_count", word_count)
+
+    points = timed("validate_points", llm_service._filter_valid_points, data.get("points", []), normalized_answer)
+    japanese_sentences = [s.strip() for s in question_text.replace('。', '.').split('.') if s.strip()]
+    data["points"] = timed("normalize_points", normalize_points,
+                           points, normalized_answer, japanese_sentences, submission.user_answer)
+    correction = timed("pydantic", CorrectionResponse, **data)
+    timed("db_save", save_submission, submission.question_id, submission.user_answer, correction)
+    return timings
+
+
+def run_end_to_end(sample: Dict[str, Any]) -> float:
+    """correct_answer + save_submission の1リクエスト分の時間（ms）"""
+    from llm_service import correct_answer
+    from database import save_submission
+
+    _current.response = sample["response"]
+    start = time.perf_counter()
+    correction = correct_answer(sample["submission"])
+    save_submission(sample["submission"].question_id, sample["submission"].user_answer, correction)
+    return (time.perf_counter() - start) * 1000
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "mean_ms": round(sum(ordered) / len(ordered), 4),
+        "p50_ms": round(percentile(50), 4),
+        "p95_ms": round(percentile(95), 4),
+        "max_ms": round(ordered[-1], 4),
+    }
+
+
+def run_concurrent(corpus: List[Dict[str, Any]], threads: int, iterations: int) -> Dict[str, float]:
+    """threads 並列で iterations リクエストを実行し、レイテンシとスループットを返す"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(lambda i: run_end_to_end(corpus[i % len(corpus)]), range(iterations)))
+    elapsed = time.perf_counter() - start
+    return dict(summarize(latencies), threads=threads, requests=iterations,
+                throughput_rps=round(iterations / elapsed, 2))
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]):
+    """以前の結果との差（平均時間・スループット）を表示"""
+    print(f"\n前回との比較（{previous['meta'].get('revision')} → {current['meta'].get('revision')}）")
+    print(f"{'stage':<20}{'before':>10}{'after':>10}{'change':>9}")
+    rows = [(stage, previous["stages"].get(stage, {}).get("mean_ms"), result["mean_ms"])
+            for stage, result in current["stages"].items()]
+    rows.append(("end_to_end", previous.get("end_to_end", {}).get("mean_ms"), current["end_to_end"]["mean_ms"]))
+    for name, before, after in rows:
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "-"
+        print(f"{name:<20}{before if before is not None else '-':>10}{after:>10}{change:>9}")
+
+    previous_runs = {run["threads"]: run for run in previous.get("concurrency", [])}
+    for run in current["concurrency"]:
+        before = previous_runs.get(run["threads"], {}).get("throughput_rps")
+        change = f"{(run['throughput_rps'] - before) / before * 100:+.1f}%" if before else "-"
+        print(f"{'rps @' + str(run['threads']) + ' threads':<20}{before or '-':>10}{run['throughput_rps']:>10}{change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="添削パイプラインのオフライン・リプレイ計測")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--threads", default="1,4,8", help="並列数（カンマ区切り）")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="差し替えクライアントの応答待ち時間")
+    parser.add_argument("--archive", type=Path, action="append", default=[],
+                        help="デバッグキャプチャのアーカイブ（複数指定可）")
+    parser.add_argument("--out", type=Path,
+                        default=BASE_DIR / "bench_results" / f"replay_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument("--compare", type=Path, help="比較する以前の結果（JSON）")
+    args = parser.parse_args()
+
+    # キャッシュ・デバッグ保存を無効にし、毎回パイプライン全体を通す
+    config.CORRECTION_CACHE_ENABLED = False
+    config.DEBUG_CAPTURE_ENABLED = False
+
+    # ログは本番と同じ INFO で、出力先はメモリ（端末への書き込み時間を計測に含めない）
+    handler = logging.StreamHandler(io.StringIO())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.INFO)
+
+    import database
+    database.DB_PATH = Path(tempfile.mkdtemp(prefix="bench_replay_")) / "bench.db"
+    database.init_database()
+    install_replay_client(args.llm_latency_ms)
+
+    corpus = load_corpus(args.archive)
+    if not corpus:
+        print("リプレイできる応答がありません（debug/llm_response_*.json または --archive）")
+        return
+
+    # 段階ごと（1スレッド）
+    stage_times: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    for i in range(args.iterations):
+        for stage, elapsed in run_stages(corpus[i % len(corpus)]).items():
+            stage_times[stage].append(elapsed)
+
+    result = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "samples": len(corpus),
+            "iterations": args.iterations,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "stages": {stage: summarize(times) for stage, times in stage_times.items()},
+        "end_to_end": summarize([run_end_to_end(corpus[i % len(corpus)]) for i in range(args.iterations)]),
+        "concurrency": [
+            run_concurrent(corpus, int(threads), args.iterations) for threads in args.threads.split(",")
+        ],
+    }
+
+    print(f"サンプル数: {len(corpus)}, 反復: {args.iterations}, LLM待ち: {args.llm_latency_ms}ms")
+    print(f"{'stage':<20}{'mean':>10}{'p50':>10}{'p95':>10}")
+    for stage, summary in list(result["stages"].items()) + [("end_to_end", result["end_to_end"])]:
+        print(f"{stage:<20}{summary['mean_ms']:>10.3f}{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}")
+    for run in result["concurrency"]:
+        print(f"threads={run['threads']:<3} {run['throughput_rps']:>8.1f} req/s  p50={run['p50_ms']:.2f}ms  p95={run['p95_ms']:.2f}ms")
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"結果: {args.out}")
+
+    if args.compare:
+        compare(json.loads(args.compare.read_text(encoding="utf-8")), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+添削レスポンスのサイズとシリアライズ時間の計測
+宮崎大学医学部英作文特訓システム
+
+debug/llm_response_*.json の添削結果から /api/correct-multi 相当のレスポンスを作り、
+- 従来の jsonify（ensure_ascii=True, sort_keys=True）
+- FastJSONProvider（UTF-8のまま・ソートなし・orjson があれば使用）
+- FastJSONProvider + 版2（エコー項目なし）
+それぞれのサイズ（無圧縮 / gzip / br）と1回あたりのシリアライズ時間を出力する。
+
+使い方:
+    python bench_response.py [--iterations 500]
+"""
+import json
+import time
+import argparse
+
+from flask import Flask
+
+import response_utils
+from response_utils import FastJSONProvider, compress_bytes
+from bench_logging import load_samples
+
+
+def build_response(sample):
+    """/api/correct-multi の応答（版1: エコー項目あり）を作る"""
+    user_sentences = sample["original"].split("\n")
+    japanese_sentences = [p.get("japanese_sentence") or "" for p in sample["points"]]
+    return dict(
+        sample,
+        submission_id=1,
+        sentence_count=len(user_sentences),
+        japanese_sentences=japanese_sentences,
+        user_sentences=user_sentences,
+    )
+
+
+def legacy_dumps(obj):
+    """Flask 既定の jsonify と同じ設定（本番の compact 出力）"""
+    return json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(",", ":"))
+
+
+def measure(dumps, payloads, iterations):
+    """1回あたりのシリアライズ時間（ms）と、全サンプル平均のサイズ（bytes）"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        dumps(payloads[i % len(payloads)])
+    elapsed_ms = (time.perf_counter() - start) / iterations * 1000
+
+    bodies = [dumps(p).encode("utf-8") for p in payloads]
+    sizes = {"raw": sum(len(b) for b in bodies) / len(bodies)}
+    for encoding in ("gzip", "br"):
+        if encoding == "br" and response_utils.brotli is None:
+            continue
+        sizes[encoding] = sum(len(compress_bytes(b, encoding)) for b in bodies) / len(bodies)
+    return elapsed_ms, sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="添削レスポンスのサイズとシリアライズ時間の計測")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    samples = load_samples()
+    if not samples:
+        print("debug/llm_response_*.json が見つかりません")
+        return
+
+    provider = FastJSONProvider(Flask(__name__))
+    v1 = [build_response(s) for s in samples]
+    v2 = [{k: v for k, v in r.items() if k not in ("japanese_sentences", "user_sentences")} for r in v1]
+
+    print(f"サンプル数: {len(samples)}, 反復: {args.iterations}, "
+          f"orjson: {'あり' if response_utils.orjson else 'なし'}, brotli: {'あり' if response_utils.brotli else 'なし'}")
+    print(f"{'format':<22}{'ms/dump':>9}{'raw(B)':>9}{'gzip(B)':>9}{'br(B)':>9}")
+    for name, dumps, payloads in [
+        ("jsonify (legacy)", legacy_dumps, v1),
+        ("FastJSONProvider v1", provider.dumps, v1),
+        ("FastJSONProvider v2", provider.dumps, v2),
+    ]:
+        elapsed_ms, sizes = measure(dumps, payloads, args.iterations)
+        br = f"{sizes['br']:>9.0f}" if "br" in sizes else f"{'-':>9}"
+        print(f"{name:<22}{elapsed_ms:>9.3f}{sizes['raw']:>9.0f}{sizes['gzip']:>9.0f}{br}")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,53 @@ OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
 OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
 OPENAI_TIMEOUT = int(os.getenv("OPENAI_TIMEOUT", "30"))
 
+# ===== Server Settings (gunicorn) =====
+
+# LLM応答待ちが大半のI/Oバウンドなアプリのため、既定はスレッドワーカー（gthread）
+# gthread: 1ワーカー = 1プロセス + GUNICORN_CONCURRENCY スレッド
+# gevent : 1ワーカー = 1プロセス + GUNICORN_CONCURRENCY グリーンレット（要 pip install gevent）
+# sync   : 1ワーカー = 1リクエスト（従来の設定）
+GUNICORN_WORKER_CLASS = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+GUNICORN_WORKERS = int(os.getenv("GUNICORN_WORKERS", "0"))  # 0 = ワーカークラスに応じて自動
+GUNICORN_CONCURRENCY = int(os.getenv("GUNICORN_CONCURRENCY", "16"))  # 1ワーカーあたりの同時リクエスト数
+
+# SQLite のロック待ち（秒）。スレッド/プロセス間で書き込みが重なったときに即エラーにしない
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "10"))
+
+# ===== Async Job Settings =====
+
+# /api/correct?async=1 などで受け付けた添削をバックグラウンドで実行するスレッド数（ワーカープロセスごと）
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "32"))  # 実行待ち+実行中の上限（超えたら 503）
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))  # 結果の保持期間（秒）
+# この秒数以上更新のない queued / running のジョブは失敗とみなす（ワーカーの再起動で止まったジョブ）
+# static/main.js の JOB_POLL_MAX_WAIT_MS はこれより長くする
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))
+
+# ===== Single-flight Settings =====
+
+# 同一リクエスト（エンドポイント・問題ID・正規化した回答が同じ）の同時実行を1回のLLM呼び出しにまとめる
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+SINGLEFLIGHT_LEASE_SECONDS = 300  # 実行中リースの期限（LLM応答の最大待ち時間より長く。期限切れなら他が引き継ぐ）
+SINGLEFLIGHT_RESULT_TTL = 10  # 完了後、同じリクエストに結果を返し続ける秒数（ダブルクリック対策）
+SINGLEFLIGHT_POLL_INTERVAL = 0.25  # 他プロセスの結果を待つときのポーリング間隔（秒）
+
+# ===== Correction Cache Settings =====
+
+# 同じ問題文・正規化後に同一の回答への添削結果を再利用（プロンプト変更時は自動で無効化）
+CORRECTION_CACHE_ENABLED = os.getenv("CORRECTION_CACHE_ENABLED", "true").lower() == "true"
+# 最後に使われてから（未使用なら保存から）この日数を過ぎたキャッシュは削除
+CORRECTION_CACHE_TTL_DAYS = int(os.getenv("CORRECTION_CACHE_TTL_DAYS", "30"))
+# テーブルごとの上限件数（超えた分は最後に使われたのが古い順に削除）
+CORRECTION_CACHE_MAX_ENTRIES = int(os.getenv("CORRECTION_CACHE_MAX_ENTRIES", "20000"))
+CORRECTION_CACHE_PRUNE_INTERVAL = 600  # 削除処理を行う間隔（秒、プロセスごと）
+
+# ===== Reprompt Settings =====
+
+# 添削ポイントが原文の文数に足りないとき、LLMに不足分を再依頼する（1回の添削で最大2回の追加呼び出し）
+# 無効なら再依頼せず、不足分は未提出の補足ポイントで埋める
+REPROMPT_ENABLED = os.getenv("REPROMPT_ENABLED", "false").lower() == "true"
+
 # ===== Word Count Settings =====
 
 # 理系・文系版の語数設定
@@ -90,11 +137,31 @@ SECTION_SENTENCES = {
 # 語数推定の係数（1文あたりの平均語数）
 WORDS_PER_SENTENCE = 15
 
+# ===== Debug Capture Settings =====
+
+# LLM応答のデバッグ保存（サンプリング + バックグラウンドスレッドで非同期書き込み）
+DEBUG_CAPTURE_ENABLED = os.getenv("DEBUG_CAPTURE_ENABLED", "false").lower() == "true"
+DEBUG_CAPTURE_SAMPLE_RATE = float(os.getenv("DEBUG_CAPTURE_SAMPLE_RATE", "0.1"))  # 0.0-1.0
+DEBUG_CAPTURE_DIR = Path(os.getenv("DEBUG_CAPTURE_DIR", str(Path(__file__).parent / "debug")))
+DEBUG_CAPTURE_QUEUE_SIZE = 100  # 満杯時は捨てる（リクエストをブロックしない）
+DEBUG_CAPTURE_MAX_BYTES = 10 * 1024 * 1024  # アーカイブ1ファイルの上限（超えたらローテーション）
+DEBUG_CAPTURE_BACKUP_COUNT = 5  # 保持する古いアーカイブの数
+
+# メトリクス（/metrics、Prometheus のテキスト形式）：ワーカーごとに METRICS_DIR へ書き出して合算する
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_DIR = Path(os.getenv("METRICS_DIR", str(DATA_DIR / "metrics")))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # 秒（他のワーカーの値の遅れの上限）
+# ヒストグラムのバケット（秒）：SQLite・正規化の数ミリ秒から LLM 応答の数十秒まで
+METRICS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 180.0)
+
 # ===== Logging Settings =====
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+LOG_JSON = os.getenv("LOG_JSON", "false").lower() == "true"  # 1行1JSONの構造化ログ
+# 大きなペイロード（添削結果全体・LLM応答全文）をDEBUGログに出すリクエストの割合
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.05"))
 
 # ===== Feature Flags =====
 
@@ -111,6 +178,40 @@ CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
 API_VERSION = "v1"
 API_PREFIX = "/api"
 
+# レスポンス形式の版（X-API-Version ヘッダーまたは ?api_version= で指定、未指定時はこの値）
+# 2: 添削レスポンスからリクエストのエコー（japanese_sentences / user_sentences）を省く
+#    /api/history の既定の項目を一覧表示用（HISTORY_SUMMARY_FIELDS）にする
+API_RESPONSE_VERSION_DEFAULT = int(os.getenv("API_RESPONSE_VERSION_DEFAULT", "1"))
+
+# /api/history の1ページあたりの件数（?limit= は HISTORY_MAX_LIMIT までに切り詰める）
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 200
+# 版2の /api/history の既定の項目（idx_submissions_history と idx_questions_theme のカバリングインデックスで取得）
+HISTORY_SUMMARY_FIELDS = ["id", "question_id", "mode", "word_count", "total_score", "submitted_at", "theme"]
+
+# レスポンス圧縮（Accept-Encoding に応じて br / gzip、br は brotli パッケージがある場合のみ）
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))  # これより小さいレスポンスは圧縮しない（バイト）
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5  # 動的レスポンス向け（11は静的ファイルの事前圧縮向けで遅い）
+
+# 問題バンク（import_questions.py で一括登録した問題）があれば、LLMで生成せずにそこから出題する
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "true").lower() == "true"
+QUESTION_IMPORT_BATCH_SIZE = 500  # 一括登録の1トランザクションあたりの件数
+
+# 問題本文の近似重複判定（MinHash + LSH）：文字 n-gram の推定 Jaccard 係数がこの値以上なら重複とみなす
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.6"))
+MINHASH_SHINGLE_SIZE = 3  # 文字 n-gram の n
+MINHASH_NUM_PERM = 64     # 署名の長さ（変えると保存済みの署名と比較できなくなる）
+MINHASH_BANDS = 16        # LSH のバンド数（1バンド4行：類似度0.6で約9割が候補になる）
+
+# 利用者ID（ログインなし、ブラウザごとに Cookie で発行）
+USER_COOKIE_NAME = "uid"
+USER_COOKIE_MAX_AGE = 60 * 60 * 24 * 365 * 2  # 2年
+
+# ハッシュ入りURL（/assets/main.<hash>.js）の静的ファイルのキャッシュ期間（秒、内容が変わるとURLも変わる）
+ASSET_MAX_AGE = 31536000
+
 # レート制限（将来の拡張用）
 RATE_LIMIT = {
     "enabled": False,
@@ -0,0 +1,14 @@
+"""
+テスト共通のフィクスチャ
+"""
+import pytest
+
+import database
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """一時ディレクトリのDBに切り替えて初期化"""
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_database()
+    return tmp_path / "test.db"
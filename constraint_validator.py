@@ -6,13 +6,85 @@
 1. 語数カウント（100-120語または80-120語）
 2. 2つの理由/提案/例の検出（ヒューリスティック）
 """
+import os
 import re
+import json
 import logging
-from typing import Dict, Any, List, Tuple
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 
+# 語数カウント共通ルール（static/word_count.js と共有）
+WORD_COUNT_RULES_PATH = Path(__file__).parent / 'data' / 'word_count_rules.json'
+
+
+def load_word_count_rules(path: Path = WORD_COUNT_RULES_PATH) -> Dict[str, Any]:
+    """
+    語数カウント共通ルール（全角→半角の変換表と単語パターン）を読み込む
+    
+    フロントエンドの語数カウンターも同じJSONを使うため、
+    サーバーとブラウザの語数が一致します。
+    
+    Args:
+        path: ルールJSONのパス
+        
+    Returns:
+        {"version", "punctuation_map", "word_token_pattern", "english_letter_pattern"}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+WORD_COUNT_RULES = load_word_count_rules()
+
+
+# ===== コンパイル済みパターン =====
+
+# 英単語トークン（アポストロフィ・ハイフンを含む）
+# JavaScript の正規表現と同じ結果になるよう、\w や \b を使わない明示的な文字クラス
+_WORD_TOKEN_RE = re.compile(WORD_COUNT_RULES['word_token_pattern'])
+_ENGLISH_LETTER_RE = re.compile(WORD_COUNT_RULES['english_letter_pattern'])
+
+# 1回の走査でマーカー・理由接続詞・文境界を検出する統合スキャナー
+# - marker: ディスコースマーカー（長いマーカーを先に並べ、"first of all" /
+#   "another reason is" が短いマーカーに先取りされないようにする）
+# - because: 理由接続詞（"as well", "as usual" を除外）
+# - boundary: 文境界（ピリオド・感嘆符・疑問符 + 空白）
+# 3種類は互いに重ならないため、交互に並べても個別に走査した場合と同じ結果になる
+_SCAN_RE = re.compile(
+    r'(?P<marker>\b(?:'
+    r'first of all|first(?:ly)?|second(?:ly)?|third(?:ly)?'
+    r'|another reason is|another|also|moreover|furthermore|in addition'
+    r'|one reason is|for example|for instance|additionally|besides'
+    r')\b)'
+    r'|(?P<because>\b(?:because|since|as(?!\s+(?:well|usual)))\b)'
+    r'|(?P<boundary>[.!?]+\s+)',
+    re.IGNORECASE
+)
+
+# 長いマーカーに含まれる短いマーカー（個別パターン時代と同じ結果を返すため）
+_NESTED_MARKERS = {
+    'first of all': len('first'),
+    'another reason is': len('another'),
+}
+
+# 全角→半角の変換表（すべて1文字→1文字なので str.translate で一括変換）
+_PUNCTUATION_TABLE = str.maketrans(WORD_COUNT_RULES['punctuation_map'])
+
+# バッチ検証でプロセスプールを使う最小件数
+BATCH_PROCESS_THRESHOLD = 200
+
+# バッチ検証用のプロセスプール（プロセスごとに1つを使い回す。起動コストを毎回払わないため）
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_key: Optional[Tuple[int, int]] = None  # (pid, max_workers)
+_process_pool_lock = threading.Lock()
+
+
 def normalize_punctuation(text: str) -> str:
     """
     全角記号を半角に正規化
@@ -24,9 +96,11 @@ def normalize_punctuation(text: str) -> str:
     - 全角感嘆符（！）→ 半角感嘆符（!）
     - 全角コロン（：）→ 半角コロン（:）
     - 全角セミコロン（；）→ 半角セミコロン（;）
-    - 全角引用符（""''）→ 半角引用符（""''）
+    - 全角引用符（“”‘’）→ 半角引用符（"'）
     - 全角ハイフン（ー）→ 半角ハイフン（-）
     
+    変換表は data/word_count_rules.json で定義（フロントエンドと共通）
+    
     Args:
         text: 正規化対象のテキスト
         
@@ -36,33 +110,7 @@ def normalize_punctuation(text: str) -> str:
     if not text:
         return text
     
-    # 全角→半角の変換マップ
-    replacements = {
-        '。': '.',  # 日本語の句点
-        '．': '.',  # 全角ピリオド
-        '，': ',',
-        '？': '?',
-        '！': '!',
-        '：': ':',
-        '；': ';',
-        '"': '"',
-        '"': '"',
-        ''': "'",
-        ''': "'",
-        '（': '(',  # 全角左括弧
-        '）': ')',  # 全角右括弧
-        '　': ' ',  # 全角スペース → 半角スペース
-        'ー': '-',
-        '－': '-',
-        '—': '-',
-        '–': '-',
-    }
-    
-    result = text
-    for full_width, half_width in replacements.items():
-        result = result.replace(full_width, half_width)
-    
-    return result
+    return text.translate(_PUNCTUATION_TABLE)
 
 
 def deterministic_word_count(text: str) -> int:
@@ -86,15 +134,17 @@ def deterministic_word_count(text: str) -> int:
         return 0
     
     # 全角記号を半角に正規化
-    text = normalize_punctuation(text)
-    
+    return _count_english_words(normalize_punctuation(text))
+
+
+def _count_english_words(text: str) -> int:
+    """正規化済みテキストの英単語数をカウント（deterministic_word_count の本体）"""
     # 英単語パターン（アポストロフィとハイフンを含む）
-    # \b[\w']+\b はアポストロフィを含む単語にマッチ
     # ハイフンでつながった単語は1語としてカウント
-    tokens = re.findall(r"\b[\w'-]+\b", text, re.UNICODE)
+    tokens = _WORD_TOKEN_RE.findall(text)
     
     # 英語の単語のみをフィルタ（少なくとも1文字の英字を含む）
-    english_words = [token for token in tokens if re.search(r'[a-zA-Z]', token)]
+    english_words = [token for token in tokens if _ENGLISH_LETTER_RE.search(token)]
     
     count = len(english_words)
     logger.debug(f"Word count: {count} (text length: {len(text)} chars)")
@@ -102,6 +152,58 @@ def deterministic_word_count(text: str) -> int:
     return count
 
 
+def scan_text(text: str) -> Dict[str, Any]:
+    """
+    統合スキャナーで1回だけ走査し、マーカー・理由接続詞・文数をまとめて取得
+    
+    全角記号の正規化は呼び出し側で1回だけ行い、正規化済みのテキストを渡します。
+    
+    Args:
+        text: 正規化済みのテキスト
+        
+    Returns:
+        {
+            "markers": [(マーカー文字列, 位置), ...]（位置順）,
+            "because_count": 理由接続詞の数,
+            "sentence_count": 文の数
+        }
+    """
+    markers = []
+    because_count = 0
+    sentence_count = 0
+    sentence_start = 0
+    
+    for match in _SCAN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'marker':
+            marker = match.group()
+            nested_length = _NESTED_MARKERS.get(marker.lower())
+            if nested_length:
+                # "First of all" は "First" としても検出されていた（後方互換）
+                markers.append((marker[:nested_length], match.start()))
+            markers.append((marker, match.start()))
+        elif kind == 'because':
+            because_count += 1
+        else:
+            # 末尾の空白まで届く区切りは文境界とみなさない（strip 後に分割していた従来と同じ）
+            if match.end() == len(text):
+                break
+            # 文境界：直前の区間が空白のみでなければ1文と数える
+            if text[sentence_start:match.start()].strip():
+                sentence_count += 1
+            sentence_start = match.end()
+    
+    # 最後の文（ピリオドの後にスペースがない場合）を含める
+    if text[sentence_start:].strip():
+        sentence_count += 1
+    
+    return {
+        "markers": markers,
+        "because_count": because_count,
+        "sentence_count": sentence_count
+    }
+
+
 def detect_discourse_markers(text: str) -> List[Tuple[str, int]]:
     """
     ディスコースマーカー（論理展開の指標）を検出
@@ -119,37 +221,7 @@ def detect_discourse_markers(text: str) -> List[Tuple[str, int]]:
     Returns:
         [(マーカー文字列, 位置), ...] のリスト
     """
-    # 全角記号を半角に正規化
-    text = normalize_punctuation(text)
-    
-    markers_patterns = [
-        r'\bfirst(?:ly)?\b',
-        r'\bfirst of all\b',
-        r'\bsecond(?:ly)?\b',
-        r'\bthird(?:ly)?\b',
-        r'\banother\b',
-        r'\balso\b',
-        r'\bmoreover\b',
-        r'\bfurthermore\b',
-        r'\bin addition\b',
-        r'\bone reason is\b',
-        r'\banother reason is\b',
-        r'\bfor example\b',
-        r'\bfor instance\b',
-        r'\badditionally\b',
-        r'\bbesides\b',
-    ]
-    
-    found_markers = []
-    
-    for pattern in markers_patterns:
-        for match in re.finditer(pattern, text, re.IGNORECASE):
-            found_markers.append((match.group(), match.start()))
-    
-    # 位置順にソート
-    found_markers.sort(key=lambda x: x[1])
-    
-    return found_markers
+    return scan_text(normalize_punctuation(text))["markers"]
 
 
 def detect_because_clauses(text: str) -> int:
@@ -162,21 +234,7 @@ def detect_because_clauses(text: str) -> int:
     Returns:
         理由接続詞の数
     """
-    # 全角記号を半角に正規化
-    text = normalize_punctuation(text)
-    
-    patterns = [
-        r'\bbecause\b',
-        r'\bsince\b',
-        r'\bas\b(?!\s+(?:well|usual))',  # "as well", "as usual"を除外
-    ]
-    
-    count = 0
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        count += len(matches)
-    
-    return count
+    return scan_text(normalize_punctuation(text))["because_count"]
 
 
 def detect_sentence_boundaries(text: str) -> int:
@@ -184,6 +242,7 @@ def detect_sentence_boundaries(text: str) -> int:
     文の数をカウント（ピリオド、感嘆符、疑問符で区切る）
     
     全角記号（．！？）は自動的に半角（.!?）に変換されます。
+    Mr., Dr., U.S. などの略語は考慮しない簡易的な文末検出です。
     
     Args:
         text: 検証対象のテキスト
@@ -191,16 +250,7 @@ def detect_sentence_boundaries(text: str) -> int:
     Returns:
         文の数
     """
-    # 全角記号を半角に正規化
-    text = normalize_punctuation(text)
-    
-    # Mr., Dr., U.S. などの略語に注意
-    # 簡易的な文末検出
-    sentences = re.split(r'[.!?]+\s+', text.strip())
-    # 最後の文（ピリオドの後にスペースがない場合）を含める
-    sentences = [s for s in sentences if s.strip()]
-    
-    return len(sentences)
+    return scan_text(normalize_punctuation(text))["sentence_count"]
 
 
 def detect_two_units(text: str) -> Dict[str, Any]:
@@ -226,9 +276,14 @@ def detect_two_units(text: str) -> Dict[str, Any]:
             "suggestions": 改善提案のリスト
         }
     """
-    markers = detect_discourse_markers(text)
-    because_count = detect_because_clauses(text)
-    sentence_count = detect_sentence_boundaries(text)
+    return _detect_two_units_from_scan(scan_text(normalize_punctuation(text)))
+
+
+def _detect_two_units_from_scan(scan: Dict[str, Any]) -> Dict[str, Any]:
+    """scan_text() の結果から2単位を判定（detect_two_units の本体）"""
+    markers = scan["markers"]
+    because_count = scan["because_count"]
+    sentence_count = scan["sentence_count"]
     
     detected_units = 0
     confidence = "low"
@@ -314,13 +369,16 @@ def validate_constraints(
             "suggestions": 改善提案のリスト
         }
     """
+    # 全角記号の正規化は1回だけ行う
+    normalized = normalize_punctuation(text) or ""
+    
     # 語数カウント
-    word_count = deterministic_word_count(text)
+    word_count = _count_english_words(normalized) if normalized.strip() else 0
     within_range = min_words <= word_count <= max_words
     
     # 2単位検出（翻訳問題ではrequired_units=0でスキップ）
     if required_units > 0:
-        unit_detection = detect_two_units(text)
+        unit_detection = _detect_two_units_from_scan(scan_text(normalized))
         detected_units = unit_detection["detected_units"]
         has_required = detected_units >= required_units
     else:
@@ -383,3 +441,62 @@ def validate_constraints(
         "notes": notes,
         "suggestions": suggestions
     }
+
+
+def validate_constraints_batch(
+    texts: List[str],
+    min_words: int,
+    max_words: int,
+    required_units: int = 2,
+    max_workers: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    複数テキストの制約を一括検証（クラス全体の採点・オフライン評価用）
+    
+    件数が BATCH_PROCESS_THRESHOLD 以上かつ max_workers > 1 の場合は
+    プロセスプールで並列に検証します。いずれの場合も結果は入力順です。
+    プロセスプールは初回に作成し、同じプロセス内では使い回します。
+    スレッドで並行処理する gunicorn ワーカー内では fork を避けるため max_workers を指定しないこと
+    （/api/validate-constraints/batch は逐次処理）。
+    
+    Args:
+        texts: 検証対象のテキストのリスト
+        min_words: 最小語数
+        max_words: 最大語数
+        required_units: 必要な理由/提案/例の数（デフォルト: 2）
+        max_workers: プロセス数（None または 1 なら逐次処理）
+        
+    Returns:
+        validate_constraints() の結果のリスト（入力順）
+    """
+    validate_one = partial(
+        validate_constraints,
+        min_words=min_words,
+        max_words=max_words,
+        required_units=required_units
+    )
+    
+    if max_workers and max_workers > 1 and len(texts) >= BATCH_PROCESS_THRESHOLD:
+        # プロセス間通信のオーバーヘッドを抑えるため、まとめて渡す
+        chunksize = max(1, len(texts) // (max_workers * 4))
+        logger.info(f"Batch validation: {len(texts)} texts with {max_workers} processes (chunksize={chunksize})")
+        executor = _get_process_pool(max_workers)
+        return list(executor.map(validate_one, texts, chunksize=chunksize))
+    
+    logger.debug(f"Batch validation: {len(texts)} texts (sequential)")
+    return [validate_one(text) for text in texts]
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """プロセスプールを作成（初回・fork後・プロセス数の変更時だけ）"""
+    global _process_pool, _process_pool_key
+
+    key = (os.getpid(), max_workers)
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_key != key:
+            if _process_pool is not None and _process_pool_key[0] == key[0]:
+                _process_pool.shutdown(wait=False)
+            _process_pool = ProcessPoolExecutor(max_workers=max_workers)
+            _process_pool_key = key
+            logger.info(f"Batch validation process pool started (pid={key[0]}, workers={max_workers})")
+        return _process_pool
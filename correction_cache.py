@@ -0,0 +1,237 @@
+"""
+添削結果キャッシュ（完全一致）
+宮崎大学医学部英作文特訓システム
+
+授業での利用では、教科書の英文をそのまま写した回答や、タイムアウト後の再提出など、
+同じ問題に対して（正規化すると）まったく同じ回答が何度も提出されます。
+このモジュールは (問題文のハッシュ, normalize_user_input 後の回答と語数のハッシュ, プロンプト版) を
+キーに、LLMで生成した添削結果（CorrectionResponse 全体）を SQLite に保存して再利用します。
+- 語数はプロンプトに含まれ、フロントエンドから送られる場合は回答から一意に決まらないためキーに含める
+- プロンプト版は、添削プロンプト（prompts_correction_respect.py）と模範解答プロンプト
+  （prompts_translation.py の MODEL_ANSWER_PROMPT_MIYAZAKI_TRANSLATION）のファイルの内容、
+  llm_service のシステムメッセージ・再プロンプトのハッシュ。プロンプトを変更すると
+  キーが変わり、古い版のキャッシュは最初の参照時に削除される
+- フォールバック応答（LLM失敗時）はキャッシュしない
+- CORRECTION_CACHE_PRUNE_INTERVAL 秒ごと（プロセスごと）の保存時に、期限切れ（CORRECTION_CACHE_TTL_DAYS）と
+  上限件数（CORRECTION_CACHE_MAX_ENTRIES）を超えた分を削除する
+
+複数文モード（/api/correct-multi）用に、文単位のキャッシュも持つ。
+(日本語の文, 正規化後の英文) ごとに添削ポイントを保存し、再提出時は
+変更された文だけをLLMに送る（llm_service.correct_multi_sentences）。
+変更された文だけを送る添削では語数を指定せず文から数えるため、文単位のキーに語数は含めない。
+模範解答は回答に依存しないため、原文ごとに保存して再利用する。
+"""
+import time
+import hashlib
+import logging
+import threading
+import importlib.util
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import config
+from database import (
+    get_cached_correction, save_cached_correction, delete_stale_correction_cache,
+    get_cached_sentence_points, save_cached_sentence_points,
+    get_cached_model_answer, save_cached_model_answer, prune_correction_cache
+)
+
+logger = logging.getLogger(__name__)
+
+# キャッシュする応答の形式（llm_service 側の後処理を変えて結果が変わる場合に上げる）
+CACHE_FORMAT_VERSION = 2
+
+# プロンプト版の計算に含めるモジュール（添削プロンプトと、get_prompts() の模範解答プロンプト）
+PROMPT_MODULES = ("prompts_correction_respect", "prompts_translation")
+
+# プロンプト版の計算に含める llm_service 内のプロンプト
+INLINE_PROMPTS = ("SYSTEM_MESSAGE", "MODEL_ANSWER_SYSTEM_MESSAGE", "REPROMPT_TEMPLATE")
+
+_prompt_version: Optional[str] = None
+_stale_purged = False
+_last_pruned = 0.0
+_lock = threading.Lock()
+
+
+def get_prompt_version() -> str:
+    """添削・模範解答プロンプトの版（プロセスごとに1回だけ計算）"""
+    global _prompt_version
+    if _prompt_version is None:
+        _prompt_version = compute_prompt_version()
+    return _prompt_version
+
+
+def compute_prompt_version() -> str:
+    """PROMPT_MODULES のソース（モジュールは import しない）と INLINE_PROMPTS のハッシュ"""
+    import llm_service
+
+    digest = hashlib.sha256()
+    for module_name in PROMPT_MODULES:
+        digest.update(_prompt_file(module_name).read_bytes())
+    for name in INLINE_PROMPTS:
+        digest.update(getattr(llm_service, name).encode("utf-8"))
+    return f"v{CACHE_FORMAT_VERSION}-{digest.hexdigest()[:16]}"
+
+
+def _prompt_file(module_name: str) -> Path:
+    return Path(importlib.util.find_spec(module_name).origin)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _answer_key(normalized_answer: str, word_count: int) -> str:
+    """回答と、プロンプトに渡す語数を合わせたハッシュ"""
+    return _hash(f"{word_count}\n{normalized_answer}")
+
+
+def lookup(question_text: str, normalized_answer: str, word_count: int) -> Optional[Dict[str, Any]]:
+    """
+    キャッシュ済みの添削結果を取得
+
+    Args:
+        question_text: 添削に使う日本語原文
+        normalized_answer: normalize_user_input 後の回答
+        word_count: 添削プロンプトに渡す語数
+
+    Returns:
+        CorrectionResponse の dict。キャッシュがない場合は None
+    """
+    if not config.CORRECTION_CACHE_ENABLED:
+        return None
+
+    version = get_prompt_version()
+    _purge_stale_once(version)
+
+    try:
+        cached = get_cached_correction(_hash(question_text), _answer_key(normalized_answer, word_count), version)
+    except Exception as e:
+        # キャッシュの障害で添削自体を止めない
+        logger.warning(f"Correction cache lookup failed: {e}")
+        return None
+
+    if cached is not None:
+        logger.info(f"Correction cache hit (prompt {version})")
+    return cached
+
+
+def store(question_text: str, normalized_answer: str, word_count: int, response: Dict[str, Any]):
+    """LLMで生成した添削結果をキャッシュに保存"""
+    if not config.CORRECTION_CACHE_ENABLED:
+        return
+
+    try:
+        save_cached_correction(_hash(question_text), _answer_key(normalized_answer, word_count), get_prompt_version(), response)
+    except Exception as e:
+        logger.warning(f"Correction cache store failed: {e}")
+    _prune_periodically()
+
+
+def lookup_sentences(japanese_sentences: List[str], normalized_sentences: List[str]) -> List[Optional[List[Dict[str, Any]]]]:
+    """
+    文単位のキャッシュを取得
+
+    Args:
+        japanese_sentences: 日本語の文（normalized_sentences と同じ順・同じ数）
+        normalized_sentences: 正規化後の英文（1文ずつ）
+
+    Returns:
+        文ごとの添削ポイント（CorrectionPoint の dict のリスト）。キャッシュがない文は None
+    """
+    if not config.CORRECTION_CACHE_ENABLED:
+        return [None] * len(normalized_sentences)
+
+    version = get_prompt_version()
+    _purge_stale_once(version)
+
+    results = []
+    for japanese, sentence in zip(japanese_sentences, normalized_sentences):
+        try:
+            results.append(get_cached_sentence_points(_hash(japanese), _hash(sentence), version))
+        except Exception as e:
+            logger.warning(f"Sentence cache lookup failed: {e}")
+            results.append(None)
+
+    hits = sum(1 for r in results if r is not None)
+    if hits:
+        logger.info(f"Sentence cache: {hits}/{len(results)} sentences hit (prompt {version})")
+    return results
+
+
+def store_sentence(japanese_sentence: str, normalized_sentence: str, points: List[Dict[str, Any]]):
+    """1文分の添削ポイントをキャッシュに保存（ポイントがない文は保存しない）"""
+    if not config.CORRECTION_CACHE_ENABLED or not points:
+        return
+
+    try:
+        save_cached_sentence_points(_hash(japanese_sentence), _hash(normalized_sentence), get_prompt_version(), points)
+    except Exception as e:
+        logger.warning(f"Sentence cache store failed: {e}")
+    _prune_periodically()
+
+
+def lookup_model_answer(question_text: str) -> Optional[Dict[str, Any]]:
+    """
+    原文に対するキャッシュ済みの模範解答を取得
+
+    Returns:
+        {"model_answer", "model_answer_explanation"}。キャッシュがない場合は None
+    """
+    if not config.CORRECTION_CACHE_ENABLED:
+        return None
+
+    try:
+        return get_cached_model_answer(_hash(question_text), get_prompt_version())
+    except Exception as e:
+        logger.warning(f"Model answer cache lookup failed: {e}")
+        return None
+
+
+def store_model_answer(question_text: str, model_answer: Optional[str], model_answer_explanation: Optional[str]):
+    """模範解答をキャッシュに保存（空の場合は保存しない）"""
+    if not config.CORRECTION_CACHE_ENABLED or not model_answer:
+        return
+
+    try:
+        save_cached_model_answer(_hash(question_text), get_prompt_version(), model_answer, model_answer_explanation)
+    except Exception as e:
+        logger.warning(f"Model answer cache store failed: {e}")
+    _prune_periodically()
+
+
+def _purge_stale_once(version: str):
+    """プロセスごとに1回、他のプロンプト版のキャッシュを削除"""
+    global _stale_purged
+    if _stale_purged:
+        return
+
+    with _lock:
+        if _stale_purged:
+            return
+        try:
+            deleted = delete_stale_correction_cache(version)
+            if deleted:
+                logger.info(f"Stale correction cache deleted: {deleted} entries (current prompt {version})")
+        except Exception as e:
+            logger.warning(f"Correction cache purge failed: {e}")
+        _stale_purged = True
+
+
+def _prune_periodically():
+    """CORRECTION_CACHE_PRUNE_INTERVAL 秒に1回、期限切れ・上限超過のキャッシュを削除"""
+    global _last_pruned
+    now = time.monotonic()
+    if _last_pruned and now - _last_pruned < config.CORRECTION_CACHE_PRUNE_INTERVAL:
+        return
+
+    with _lock:
+        if _last_pruned and now - _last_pruned < config.CORRECTION_CACHE_PRUNE_INTERVAL:
+            return
+        _last_pruned = now
+        try:
+            deleted = prune_correction_cache(config.CORRECTION_CACHE_TTL_DAYS, config.CORRECTION_CACHE_MAX_ENTRIES)
+            if deleted:
+                logger.info(f"Correction cache pruned: {deleted} entries")
+        except Exception as e:
+            logger.warning(f"Correction cache prune failed: {e}")
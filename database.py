@@ -4,12 +4,16 @@
 """
 import sqlite3
 import json
+import hashlib
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from contextlib import contextmanager
 from models import QuestionResponse, CorrectionResponse
+import config
+import metrics
+import near_duplicate
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -22,8 +26,14 @@ DB_PATH = DATA_DIR / 'miyazaki_igaku_eisakubun.db'
 
 @contextmanager
 def get_db_connection():
-    """データベース接続を取得"""
-    conn = sqlite3.connect(str(DB_PATH))
+    """
+    データベース接続を取得
+    
+    接続は呼び出しごとに作って閉じるため、スレッド間で共有されない
+    （gthread/gevent ワーカーでもそのまま安全に使える）。
+    書き込みが重なった場合は DB_BUSY_TIMEOUT 秒までロック解放を待つ。
+    """
+    conn = sqlite3.connect(str(DB_PATH), timeout=config.DB_BUSY_TIMEOUT)
     conn.row_factory = sqlite3.Row  # 辞書形式で結果を取得
     try:
         yield conn
@@ -36,6 +46,9 @@ def init_database():
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
+        # WALモード：書き込み中も読み込みをブロックしない（同時リクエスト対策、DBファイルに永続）
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         # 問題テーブル
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS questions (
@@ -49,18 +62,14 @@ def init_database():
                 model_answer TEXT,
                 alternative_answer TEXT,
                 common_mistakes TEXT,
+                user_id TEXT NOT NULL DEFAULT '',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
         
-        # 既存テーブルにexcerpt_typeカラムが無ければ追加
-        cursor.execute("PRAGMA table_info(questions)")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'excerpt_type' not in columns:
-            cursor.execute("ALTER TABLE questions ADD COLUMN excerpt_type TEXT")
-            logger.info("Added excerpt_type column to questions table")
-            conn.commit()
+        # 既存テーブルに後から追加した列が無ければ追加
+        _ensure_question_columns(cursor)
+        conn.commit()
         
         # 提出テーブル
         cursor.execute("""
@@ -77,102 +86,617 @@ def init_database():
                 score_grammar INTEGER,
                 score_word_count INTEGER,
                 total_score INTEGER,
+                user_id TEXT NOT NULL DEFAULT '',
                 submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (question_id) REFERENCES questions(id)
             )
         """)
         
-        # 既出テーマテーブル
+        # 既出テーマテーブル（利用者ごと。user_id = '' の行は全利用者の合計）
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS used_themes (
-                theme TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL DEFAULT '',
+                theme TEXT NOT NULL,
                 mode TEXT DEFAULT 'general',
                 count INTEGER DEFAULT 1,
-                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, theme)
             )
         """)
         
+        # 利用者IDの列がない既存DBを移行
+        _migrate_user_columns(cursor)
+        
         # インデックス
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_submissions_question 
             ON submissions(question_id)
         """)
         
+        # 履歴のキーセットページング用（submitted_at, id の降順）
+        # 一覧表示の項目も含めたカバリングインデックスにして、本文を読まずに1ページ分を取得する
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_submissions_history 
+            ON submissions(submitted_at DESC, id DESC, question_id, mode, word_count, total_score)
+        """)
+        
+        # 利用者ごとの履歴（利用者数が増えても、その利用者の行だけを読む）
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_submissions_user_history 
+            ON submissions(user_id, submitted_at DESC, id DESC, question_id, mode, word_count, total_score)
+        """)
+        
+        # 履歴の一覧表示でテーマを結合する用（questions の本文を読まずに id → theme を引く）
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_questions_theme 
+            ON questions(id, theme)
+        """)
+        
+        # 直近の出題（テーマ・抜粋タイプの偏り防止）：全体と利用者ごと
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_questions_created_at 
+            ON questions(created_at DESC)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_questions_user_created_at 
+            ON questions(user_id, created_at DESC)
+        """)
+        
+        # 問題バンク（一括登録した問題、source = 'import'）：内容のハッシュで重複を防ぎ、ジャンル別に引く
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_used_themes_last_used 
-            ON used_themes(last_used DESC)
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_import_hash 
+            ON questions(content_hash) WHERE source = 'import'
         """)
         
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_questions_import_theme 
+            ON questions(theme, excerpt_type) WHERE source = 'import'
+        """)
+        
+        # 利用者に出題済みの問題（バンクから同じ問題を二度出さない）
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_questions_user_hash 
+            ON questions(user_id, content_hash)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_used_themes_user_last_used 
+            ON used_themes(user_id, last_used DESC)
+        """)
+        
+        # テーマ統計（使用回数の多い順 上位20件）をソートせずにインデックスから読む
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_used_themes_user_count 
+            ON used_themes(user_id, count DESC, last_used DESC)
+        """)
+        
+        # 非同期ジョブテーブル（添削結果を一定時間保持、どのワーカーからでも参照できる）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                result TEXT,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP NOT NULL
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_expires_at 
+            ON jobs(expires_at)
+        """)
+        
+        # 同一リクエストの重複実行防止（single-flight）用のリーステーブル
+        # ワーカープロセス間で「誰がLLMを呼んでいるか」と直後の結果を共有する
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS inflight_leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                result TEXT,
+                expires_at TIMESTAMP NOT NULL
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_inflight_leases_expires_at 
+            ON inflight_leases(expires_at)
+        """)
+        
+        # 添削結果キャッシュ（同じ原文・同じ正規化後の回答・同じプロンプト版なら再利用）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS correction_cache (
+                question_hash TEXT NOT NULL,
+                answer_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                response TEXT NOT NULL,
+                hit_count INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_hit_at TIMESTAMP,
+                PRIMARY KEY (question_hash, answer_hash, prompt_version)
+            )
+        """)
+        
+        # 文単位の添削ポイントキャッシュ（複数文モードで変更された文だけを再添削するため）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sentence_points_cache (
+                japanese_hash TEXT NOT NULL,
+                sentence_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                points TEXT NOT NULL,
+                hit_count INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_hit_at TIMESTAMP,
+                PRIMARY KEY (japanese_hash, sentence_hash, prompt_version)
+            )
+        """)
+        
+        # 原文ごとの模範解答キャッシュ
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS model_answer_cache (
+                question_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                model_answer TEXT NOT NULL,
+                model_answer_explanation TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (question_hash, prompt_version)
+            )
+        """)
+        
+        # 添削ポイント（提出ごとの各ポイントを1行に。誤りの種類・ジャンル別の集計用）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS correction_points (
+                submission_id TEXT NOT NULL,
+                point_no INTEGER NOT NULL,
+                question_id TEXT NOT NULL,
+                user_id TEXT NOT NULL DEFAULT '',
+                sentence_no INTEGER,
+                level TEXT NOT NULL DEFAULT '',
+                japanese_sentence TEXT,
+                before_text TEXT NOT NULL,
+                after_text TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                alt TEXT,
+                PRIMARY KEY (submission_id, point_no),
+                FOREIGN KEY (submission_id) REFERENCES submissions(id)
+            )
+        """)
+        
+        # レベル別（誤りの種類ごとの件数）と問題別（ジャンル別はここから questions に JOIN）
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_correction_points_level 
+            ON correction_points(level, question_id)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_correction_points_question 
+            ON correction_points(question_id, level)
+        """)
+        
+        # 提出を削除したらそのポイントも削除（外部キー制約は有効にしていないためトリガーで）
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_correction_points_delete
+            AFTER DELETE ON submissions
+            BEGIN
+                DELETE FROM correction_points WHERE submission_id = OLD.id;
+            END
+        """)
+        
+        # 問題本文の MinHash 署名（内容のハッシュごと）と LSH のバケット（近似重複の候補検索用）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS question_signatures (
+                content_hash TEXT PRIMARY KEY,
+                signature BLOB NOT NULL
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS question_lsh_buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                PRIMARY KEY (band, bucket, content_hash)
+            ) WITHOUT ROWID
+        """)
+        
+        _init_submission_stats(cursor)
+        
         conn.commit()
         logger.info("Database initialized successfully")
+    
+    # 署名のない既存の問題を索引に追加（2回目以降の起動では対象なし）
+    index_missing_question_signatures()
+
+
+def _migrate_user_columns(cursor):
+    """利用者IDの列を追加（既存の行は user_id = '' = 利用者不明として残す）"""
+    for table in ('questions', 'submissions'):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if 'user_id' not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN user_id TEXT NOT NULL DEFAULT ''")
+            logger.info(f"Added user_id column to {table} table")
+    
+    # used_themes は主キーが theme → (user_id, theme) に変わるため作り直す
+    # 既存の行は全利用者の合計（user_id = ''）として移す
+    cursor.execute("PRAGMA table_info(used_themes)")
+    if 'user_id' not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("""
+            CREATE TABLE used_themes_new (
+                user_id TEXT NOT NULL DEFAULT '',
+                theme TEXT NOT NULL,
+                mode TEXT DEFAULT 'general',
+                count INTEGER DEFAULT 1,
+                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, theme)
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO used_themes_new (user_id, theme, mode, count, last_used)
+            SELECT '', theme, mode, count, last_used FROM used_themes
+        """)
+        cursor.execute("DROP TABLE used_themes")
+        cursor.execute("ALTER TABLE used_themes_new RENAME TO used_themes")
+        logger.info("Migrated used_themes to per-user rows")
+
+
+def _user_filter(user_id: Optional[str], column: str = "user_id") -> Tuple[str, List[Any]]:
+    """user_id が指定されていればその利用者に絞る WHERE 条件（None なら全利用者）"""
+    if user_id is None:
+        return "", []
+    return f"{column} = ?", [user_id]
+
+
+def _issued_questions_filter(user_id: Optional[str]) -> Tuple[str, List[Any]]:
+    """出題済みの問題（問題バンクに一括登録しただけの問題を除く）の WHERE 条件"""
+    user_condition, params = _user_filter(user_id)
+    conditions = [user_condition] if user_condition else []
+    return " AND ".join(conditions + ["source != 'import'"]), params
+
+
+# ===== 提出統計の集計テーブル =====
+# /api/statistics のたびに submissions を全件集計しないよう、合計・件数・最大値を
+# 1行の submission_stats に保持し、submissions への INSERT/UPDATE/DELETE のトリガーで更新する。
+# トリガーは同じトランザクション内で実行されるため、提出の保存と集計の更新は常に一致する。
+
+# (submissions の列, submission_stats の列名の接頭辞)
+_STATS_COLUMNS = (
+    ('total_score', 'total_score'),
+    ('score_content', 'content'),
+    ('score_structure', 'structure'),
+    ('score_vocabulary', 'vocabulary'),
+    ('score_grammar', 'grammar'),
+    ('score_word_count', 'word_count'),
+)
+
+
+def _stats_delta_sql(sign: str, row: str) -> str:
+    """トリガー内で NEW / OLD の行の値を件数・合計に加減する SET 句"""
+    return ",\n".join(
+        f"{prefix}_count = {prefix}_count {sign} ({row}.{column} IS NOT NULL), "
+        f"{prefix}_sum = {prefix}_sum {sign} COALESCE({row}.{column}, 0)"
+        for column, prefix in _STATS_COLUMNS
+    )
+
+
+def _init_submission_stats(cursor):
+    """集計テーブルとトリガーを作成（テーブルを新規作成した場合は既存の提出から集計）"""
+    columns = ",\n".join(
+        f"{prefix}_count INTEGER NOT NULL DEFAULT 0, {prefix}_sum INTEGER NOT NULL DEFAULT 0"
+        for _, prefix in _STATS_COLUMNS
+    )
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS submission_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_submissions INTEGER NOT NULL DEFAULT 0,
+            {columns},
+            max_score INTEGER
+        )
+    """)
+    
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_submission_stats_insert AFTER INSERT ON submissions
+        BEGIN
+            UPDATE submission_stats SET
+                total_submissions = total_submissions + 1,
+                {_stats_delta_sql('+', 'NEW')},
+                max_score = CASE
+                    WHEN NEW.total_score IS NOT NULL AND (max_score IS NULL OR NEW.total_score > max_score)
+                    THEN NEW.total_score ELSE max_score END
+            WHERE id = 1;
+        END
+    """)
+    
+    # 最大値は減らせないため、削除・更新で最大値の行が変わった場合のみ再計算する
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_submission_stats_delete AFTER DELETE ON submissions
+        BEGIN
+            UPDATE submission_stats SET
+                total_submissions = total_submissions - 1,
+                {_stats_delta_sql('-', 'OLD')},
+                max_score = CASE
+                    WHEN OLD.total_score IS NOT NULL AND OLD.total_score >= max_score
+                    THEN (SELECT MAX(total_score) FROM submissions) ELSE max_score END
+            WHERE id = 1;
+        END
+    """)
+    
+    score_columns = ", ".join(column for column, _ in _STATS_COLUMNS)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_submission_stats_update AFTER UPDATE OF {score_columns} ON submissions
+        BEGIN
+            UPDATE submission_stats SET
+                {_stats_delta_sql('-', 'OLD')}
+            WHERE id = 1;
+            UPDATE submission_stats SET
+                {_stats_delta_sql('+', 'NEW')},
+                max_score = CASE
+                    WHEN NEW.total_score IS NOT NULL AND (max_score IS NULL OR NEW.total_score >= max_score)
+                    THEN NEW.total_score
+                    WHEN OLD.total_score IS NOT NULL AND OLD.total_score >= max_score
+                    THEN (SELECT MAX(total_score) FROM submissions) ELSE max_score END
+            WHERE id = 1;
+        END
+    """)
+    
+    cursor.execute("INSERT OR IGNORE INTO submission_stats (id) VALUES (1)")
+    if cursor.rowcount == 1:
+        # 集計テーブル導入前の提出を反映
+        _rebuild_submission_stats(cursor)
+
+
+def _stats_aggregate_query(where: str = "") -> str:
+    """submissions から submission_stats と同じ列を集計する SELECT"""
+    aggregates = ",\n".join(
+        f"COUNT({column}) AS {prefix}_count, COALESCE(SUM({column}), 0) AS {prefix}_sum"
+        for column, prefix in _STATS_COLUMNS
+    )
+    return f"""
+        SELECT COUNT(*) AS total_submissions, {aggregates}, MAX(total_score) AS max_score
+        FROM submissions {where}
+    """
+
+
+def _rebuild_submission_stats(cursor):
+    """submissions を1回走査して submission_stats を作り直す"""
+    row = cursor.execute(_stats_aggregate_query()).fetchone()
+    
+    values = dict(zip(row.keys(), tuple(row)))
+    assignments = ", ".join(f"{name} = :{name}" for name in values)
+    cursor.execute(f"UPDATE submission_stats SET {assignments} WHERE id = 1", values)
+
+
+def rebuild_statistics() -> Dict[str, Any]:
+    """
+    集計テーブルを submissions から再計算（手動でデータを修正した場合などに使う）
+    
+    Returns:
+        再計算後の統計（get_statistics と同じ形式）
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR IGNORE INTO submission_stats (id) VALUES (1)")
+        _rebuild_submission_stats(cursor)
+        conn.commit()
+    
+    logger.info("Submission statistics rebuilt")
+    return get_statistics()
 
 
 # ===== 問題管理 =====
 
-def save_question(question: QuestionResponse) -> str:
-    """問題を保存"""
+# 後から追加した questions の列（古いDBには ALTER TABLE で追加する）
+_QUESTION_ADDED_COLUMNS = {
+    'question_text': 'TEXT',
+    'japanese_paragraphs': 'TEXT',
+    'excerpt_type': 'TEXT',
+    'topic_label': 'TEXT',
+    'content_hash': 'TEXT',
+    'source': "TEXT NOT NULL DEFAULT 'llm'",
+}
+
+_QUESTION_INSERT_COLUMNS = (
+    'id', 'mode', 'theme', 'topic_label', 'excerpt_type', 'question_text', 'japanese_sentences',
+    'japanese_paragraphs', 'hints', 'target_words', 'model_answer', 'alternative_answer',
+    'common_mistakes', 'user_id', 'content_hash', 'source'
+)
+
+
+def _ensure_question_columns(cursor) -> bool:
+    """questions に後から追加した列がなければ追加（追加したら True）"""
+    columns = {col[1] for col in cursor.execute("PRAGMA table_info(questions)").fetchall()}
+    added = False
+    for column, column_type in _QUESTION_ADDED_COLUMNS.items():
+        if column not in columns:
+            logger.info(f"Adding {column} column to questions table")
+            cursor.execute(f"ALTER TABLE questions ADD COLUMN {column} {column_type}")
+            added = True
+    return added
+
+
+_CONTENT_HASH_INDEX = _QUESTION_INSERT_COLUMNS.index('content_hash')
+
+
+def _question_texts(question: QuestionResponse) -> List[str]:
+    """問題の日本語の本文（段落形式なら japanese_paragraphs、旧形式なら japanese_sentences）"""
+    return question.japanese_paragraphs or question.japanese_sentences or []
+
+
+def _content_hash(texts: List[str]) -> str:
+    normalized = "\n".join("".join(str(text).split()) for text in texts)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def question_content_hash(question: QuestionResponse) -> str:
+    """問題の内容のハッシュ（日本語の本文から空白を除いて計算、一括登録の重複判定用）"""
+    return _content_hash(_question_texts(question))
+
+
+# ===== 近似重複の索引（MinHash + LSH） =====
+
+def _index_question_signature(cursor, content_hash: str, texts: List[str]):
+    """本文の署名と LSH のバケットを索引に追加（同じ内容のハッシュは1回だけ）"""
+    sig = near_duplicate.signature(texts)
+    cursor.execute(
+        "INSERT OR IGNORE INTO question_signatures (content_hash, signature) VALUES (?, ?)",
+        (content_hash, near_duplicate.pack(sig))
+    )
+    if cursor.rowcount:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO question_lsh_buckets (band, bucket, content_hash) VALUES (?, ?, ?)",
+            [(band, bucket, content_hash) for band, bucket in near_duplicate.band_buckets(sig)]
+        )
+
+
+def _near_duplicates(cursor, sig: List[int], threshold: float) -> List[Tuple[str, float]]:
+    """署名 sig とほぼ同じ本文の登録済み問題を探す（係数の高い順）"""
+    buckets = near_duplicate.band_buckets(sig)
+    # バンドごとに主キー (band, bucket) で候補を引き、候補の署名だけを読む
+    rows = cursor.execute(f"""
+        WITH probe(band, bucket) AS (VALUES {', '.join('(?, ?)' for _ in buckets)})
+        SELECT s.content_hash, s.signature FROM question_signatures s
+        WHERE s.content_hash IN (
+            SELECT b.content_hash FROM probe p
+            JOIN question_lsh_buckets b ON b.band = p.band AND b.bucket = p.bucket
+        )
+    """, [value for bucket in buckets for value in bucket]).fetchall()
+    matches = [(row[0], near_duplicate.similarity(sig, near_duplicate.unpack(row[1]))) for row in rows]
+    return sorted((m for m in matches if m[1] >= threshold), key=lambda m: m[1], reverse=True)
+
+
+def find_near_duplicate_questions(
+    texts: List[str],
+    threshold: Optional[float] = None
+) -> List[Tuple[str, float]]:
+    """
+    登録済みの全問題（生成・一括登録とも）から本文がほぼ同じ問題を探す
+    
+    Args:
+        texts: 日本語の本文（段落または文のリスト）
+        threshold: 推定 Jaccard 係数のしきい値（None なら NEAR_DUPLICATE_THRESHOLD）
+    
+    Returns:
+        [(内容のハッシュ, 推定 Jaccard 係数), ...]（係数の高い順）
+    """
+    return find_near_duplicate_signatures([near_duplicate.signature(texts)], threshold)[0]
+
+
+@metrics.timed("db.find_near_duplicate_questions")
+def find_near_duplicate_signatures(
+    signatures: List[List[int]],
+    threshold: Optional[float] = None
+) -> List[List[Tuple[str, float]]]:
+    """
+    計算済みの署名ごとに、登録済みの全問題から本文がほぼ同じ問題を探す（1接続でまとめて引く）
+    
+    Args:
+        signatures: near_duplicate.signature の署名のリスト
+        threshold: 推定 Jaccard 係数のしきい値（None なら NEAR_DUPLICATE_THRESHOLD）
+    
+    Returns:
+        署名ごとの [(内容のハッシュ, 推定 Jaccard 係数), ...]（係数の高い順）
+    """
+    threshold = config.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        return [_near_duplicates(cursor, sig, threshold) for sig in signatures]
+
+
+def index_missing_question_signatures() -> int:
+    """内容のハッシュ・署名のない既存の問題を索引に追加し、追加した件数を返す"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        rows = cursor.execute("""
+            SELECT q.id, q.content_hash, q.japanese_sentences, q.japanese_paragraphs FROM questions q
+            WHERE q.content_hash IS NULL
+               OR NOT EXISTS (SELECT 1 FROM question_signatures s WHERE s.content_hash = q.content_hash)
+        """).fetchall()
+        for row in rows:
+            texts = []
+            for column in ('japanese_paragraphs', 'japanese_sentences'):
+                try:
+                    texts = json.loads(row[column] or '[]')
+                except (json.JSONDecodeError, TypeError):
+                    texts = []
+                if texts:
+                    break
+            content_hash = row['content_hash']
+            if content_hash is None:
+                content_hash = _content_hash(texts)
+                cursor.execute("UPDATE questions SET content_hash = ? WHERE id = ?", (content_hash, row['id']))
+            _index_question_signature(cursor, content_hash, texts)
+        conn.commit()
+    if rows:
+        logger.info(f"Indexed signatures of {len(rows)} existing questions")
+    return len(rows)
+
+
+def _question_row(question_id: str, question: QuestionResponse, user_id: str, source: str) -> tuple:
+    """_QUESTION_INSERT_COLUMNS の順の値"""
+    return (
+        question_id,
+        "general",  # 理系・文系版のみ
+        question.theme,
+        question.topic_label,  # トピックラベル（A-H）
+        question.excerpt_type,
+        question.question_text,  # 英語の問題文を保存
+        json.dumps(question.japanese_sentences, ensure_ascii=False),
+        json.dumps(question.japanese_paragraphs if question.japanese_paragraphs else [], ensure_ascii=False),
+        json.dumps([h.model_dump() for h in question.hints], ensure_ascii=False),
+        json.dumps(question.target_words.model_dump(), ensure_ascii=False),
+        question.model_answer,
+        question.alternative_answer,
+        json.dumps(question.common_mistakes or [], ensure_ascii=False),
+        user_id,
+        question_content_hash(question),
+        source,
+    )
+
+
+def _new_question_id() -> str:
+    return f"q_{datetime.now().strftime('%Y%m%d')}_{uuid.uuid4().hex[:8]}"
+
+
+@metrics.timed("db.save_question")
+def save_question(question: QuestionResponse, user_id: str = "", source: str = "llm") -> str:
+    """
+    問題を保存
+    
+    Args:
+        question: 問題
+        user_id: 出題した利用者（'' は利用者不明）
+        source: 出典（llm: LLMで生成 / bank: 問題バンクから出題）
+    """
     # UUIDを使用してユニークなIDを生成
-    question_id = f"q_{datetime.now().strftime('%Y%m%d')}_{uuid.uuid4().hex[:8]}"
+    question_id = _new_question_id()
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # まずテーブルにquestion_textカラムがあるか確認して、なければ追加
-        cursor.execute("PRAGMA table_info(questions)")
-        columns = [col[1] for col in cursor.fetchall()]
-        if 'question_text' not in columns:
-            logger.info("Adding question_text column to questions table")
-            cursor.execute("ALTER TABLE questions ADD COLUMN question_text TEXT")
-            conn.commit()
-        
-        # japanese_paragraphsカラムがなければ追加
-        if 'japanese_paragraphs' not in columns:
-            logger.info("Adding japanese_paragraphs column to questions table")
-            cursor.execute("ALTER TABLE questions ADD COLUMN japanese_paragraphs TEXT")
-            conn.commit()
-        
-        # excerpt_typeカラムがなければ追加
-        if 'excerpt_type' not in columns:
-            logger.info("Adding excerpt_type column to questions table")
-            cursor.execute("ALTER TABLE questions ADD COLUMN excerpt_type TEXT")
-            conn.commit()
-        
-        # topic_labelカラムがなければ追加
-        if 'topic_label' not in columns:
-            logger.info("Adding topic_label column to questions table")
-            cursor.execute("ALTER TABLE questions ADD COLUMN topic_label TEXT")
+        # 後から追加した列がなければ追加（init_database 前の古いDB向け）
+        if _ensure_question_columns(cursor):
             conn.commit()
         
-        cursor.execute("""
-            INSERT INTO questions (
-                id, mode, theme, topic_label, excerpt_type, question_text, japanese_sentences, japanese_paragraphs, 
-                hints, target_words, model_answer, alternative_answer, common_mistakes
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            question_id,
-            "general",  # 理系・文系版のみ
-            question.theme,
-            question.topic_label,  # トピックラベル（A-H）
-            question.excerpt_type,  # ← 追加
-            question.question_text,  # 英語の問題文を保存
-            json.dumps(question.japanese_sentences, ensure_ascii=False),
-            json.dumps(question.japanese_paragraphs if question.japanese_paragraphs else [], ensure_ascii=False),
-            json.dumps([h.model_dump() for h in question.hints], ensure_ascii=False),
-            json.dumps(question.target_words.model_dump(), ensure_ascii=False),
-            question.model_answer,
-            question.alternative_answer,
-            json.dumps(question.common_mistakes or [], ensure_ascii=False)
-        ))
+        row = _question_row(question_id, question, user_id, source)
+        cursor.execute(f"""
+            INSERT INTO questions ({', '.join(_QUESTION_INSERT_COLUMNS)})
+            VALUES ({', '.join('?' * len(_QUESTION_INSERT_COLUMNS))})
+        """, row)
+        _index_question_signature(cursor, row[_CONTENT_HASH_INDEX], _question_texts(question))
         
         conn.commit()
         logger.info(f"Question saved: {question_id} - {question.theme} ({question.excerpt_type})")
     
     # 既出テーマを記録
-    record_used_theme(question.theme, "general")
+    record_used_theme(question.theme, "general", user_id=user_id)
     
     return question_id
 
 
+@metrics.timed("db.get_question")
 def get_question(question_id: str) -> Optional[Dict[str, Any]]:
     """問題を取得"""
     with get_db_connection() as conn:
@@ -217,14 +741,73 @@ def get_question(question_id: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+@metrics.timed("db.save_imported_questions")
+def save_imported_questions(questions: List[QuestionResponse]) -> int:
+    """
+    問題バンクに一括登録（1トランザクション、source = 'import'）
+    
+    内容のハッシュが既に登録済みの問題は idx_questions_import_hash により登録しない。
+    
+    Returns:
+        登録した件数
+    """
+    rows = [_question_row(_new_question_id(), question, "", "import") for question in questions]
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        _ensure_question_columns(cursor)
+        imported = 0
+        for row, question in zip(rows, questions):
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO questions ({', '.join(_QUESTION_INSERT_COLUMNS)})
+                VALUES ({', '.join('?' * len(_QUESTION_INSERT_COLUMNS))})
+            """, row)
+            if cursor.rowcount:
+                imported += 1
+                _index_question_signature(cursor, row[_CONTENT_HASH_INDEX], _question_texts(question))
+        conn.commit()
+        return imported
+
+
+@metrics.timed("db.pick_bank_question_id")
+def pick_bank_question_id(theme: str, user_id: str, excerpt_type: Optional[str] = None) -> Optional[str]:
+    """
+    問題バンクから、指定ジャンルでこの利用者にまだ出題していない問題を1件ランダムに選ぶ
+    
+    Args:
+        theme: ジャンル
+        user_id: 利用者ID（出題済みの判定は内容のハッシュで行う）
+        excerpt_type: 抜粋タイプ（None なら問わない）
+    
+    Returns:
+        問題ID（該当なしなら None）
+    """
+    conditions, params = ["b.source = 'import'", "b.theme = ?"], [theme]
+    if excerpt_type is not None:
+        conditions.append("b.excerpt_type = ?")
+        params.append(excerpt_type)
+    with get_db_connection() as conn:
+        row = conn.execute(f"""
+            SELECT b.id FROM questions b
+            WHERE {' AND '.join(conditions)}
+              AND NOT EXISTS (
+                  SELECT 1 FROM questions u WHERE u.user_id = ? AND u.content_hash = b.content_hash
+              )
+            ORDER BY RANDOM()
+            LIMIT 1
+        """, (*params, user_id)).fetchone()
+        return row[0] if row else None
+
+
 # ===== 提出管理 =====
 
+@metrics.timed("db.save_submission")
 def save_submission(
     question_id: str,
     user_answer: str,
-    correction: CorrectionResponse
+    correction: CorrectionResponse,
+    user_id: str = ""
 ) -> str:
-    """提出を保存（採点機能なし）"""
+    """提出と添削ポイントを保存（採点機能なし、user_id: 提出した利用者、'' は利用者不明）"""
     # UUIDを使用してユニークなIDを生成
     submission_id = f"s_{datetime.now().strftime('%Y%m%d')}_{uuid.uuid4().hex[:8]}"
     
@@ -236,8 +819,8 @@ def save_submission(
             INSERT INTO submissions (
                 id, question_id, mode, user_answer, corrected, word_count,
                 score_content, score_structure, score_vocabulary,
-                score_grammar, score_word_count, total_score
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                score_grammar, score_word_count, total_score, user_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             submission_id,
             question_id,
@@ -250,88 +833,424 @@ def save_submission(
             None,  # score_vocabulary (採点なし)
             None,  # score_grammar (採点なし)
             None,  # score_word_count (採点なし)
-            None   # total_score (採点なし)
+            None,  # total_score (採点なし)
+            user_id
         ))
         
+        # 添削ポイントを1件1行で保存（同じトランザクションで提出と一緒にコミット）
+        cursor.executemany("""
+            INSERT INTO correction_points (
+                submission_id, point_no, question_id, user_id, sentence_no, level,
+                japanese_sentence, before_text, after_text, reason, alt
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (
+                submission_id, point_no, question_id, user_id, point.sentence_no, point.level or "",
+                point.japanese_sentence, point.before, point.after, point.reason, point.alt
+            )
+            for point_no, point in enumerate(correction.points, 1)
+        ])
+        
         conn.commit()
         logger.info(f"Submission saved: {submission_id} (mode: general, no scoring)")
     
     return submission_id
 
 
-def get_submission_history(limit: int = 50) -> List[Dict[str, Any]]:
-    """提出履歴を取得"""
+# 履歴で取得できる項目（submissions の列と、JOIN した questions の列）
+HISTORY_SUBMISSION_FIELDS = (
+    'id', 'question_id', 'mode', 'user_answer', 'corrected', 'word_count',
+    'score_content', 'score_structure', 'score_vocabulary', 'score_grammar', 'score_word_count',
+    'total_score', 'submitted_at'
+)
+HISTORY_QUESTION_FIELDS = ('theme', 'japanese_sentences')
+HISTORY_FIELDS = HISTORY_SUBMISSION_FIELDS + HISTORY_QUESTION_FIELDS
+
+
+def build_history_query(
+    limit: int = 50,
+    before: Optional[Tuple[str, str]] = None,
+    fields: Optional[List[str]] = None,
+    user_id: Optional[str] = None
+) -> Tuple[str, List[Any]]:
+    """get_submission_history の SQL とパラメータ（引数は同じ。実行計画の確認用にも使う）"""
+    fields = list(fields) if fields else list(HISTORY_FIELDS)
+    unknown = [f for f in fields if f not in HISTORY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown history fields: {unknown}")
+    
+    columns = [f"s.{f}" for f in ('id', 'submitted_at')]
+    columns += [f"s.{f}" for f in fields if f in HISTORY_SUBMISSION_FIELDS and f not in ('id', 'submitted_at')]
+    question_columns = [f"q.{f}" for f in fields if f in HISTORY_QUESTION_FIELDS]
+    
+    # 問題側の項目が必要なときだけ結合する。LEFT JOIN なので、問題が見つからない提出も
+    # 項目の指定によらず同じ行の集合になる（どの fields でも同じカーソルで辿れる）
+    # 一覧表示の項目（HISTORY_SUMMARY_FIELDS）なら idx_submissions_history と
+    # idx_questions_theme の2つのカバリングインデックスだけで1ページ分を返せる
+    # （統計情報がないとプランナーは主キーの索引を選び本文を読むため、INDEXED BY で指定する）
+    query = f"SELECT {', '.join(columns + question_columns)} FROM submissions s"
+    if question_columns:
+        query += " LEFT JOIN questions q INDEXED BY idx_questions_theme ON s.question_id = q.id"
+    user_condition, params = _user_filter(user_id, "s.user_id")
+    conditions = [user_condition] if user_condition else []
+    if before is not None:
+        conditions.append("(s.submitted_at, s.id) < (?, ?)")
+        params.extend(before)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY s.submitted_at DESC, s.id DESC LIMIT ?"
+    params.append(limit)
+    return query, params
+
+
+@metrics.timed("db.get_submission_history")
+def get_submission_history(
+    limit: int = 50,
+    before: Optional[Tuple[str, str]] = None,
+    fields: Optional[List[str]] = None,
+    user_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    提出履歴を新しい順に取得（キーセットページング）
+    
+    Args:
+        limit: 取得件数
+        before: 前のページの最後の行の (submitted_at, id)。この行より古いものを返す
+        fields: 取得する項目（HISTORY_FIELDS の一部、None なら全項目）。
+                ページングのキー（id, submitted_at）は常に含める
+        user_id: 指定した利用者の提出のみ（None なら全利用者）
+    """
+    query, params = build_history_query(limit, before, fields, user_id)
+    
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 
-                s.*,
-                q.theme,
-                q.japanese_sentences
-            FROM submissions s
-            JOIN questions q ON s.question_id = q.id
-            ORDER BY s.submitted_at DESC
-            LIMIT ?
-        """, (limit,))
-        
-        rows = cursor.fetchall()
+        rows = conn.execute(query, params).fetchall()
         return [dict(row) for row in rows]
 
 
-def get_statistics() -> Dict[str, Any]:
-    """統計情報を取得"""
+# ===== 非同期ジョブ管理 =====
+
+def create_job(job_id: str, kind: str, ttl_seconds: int):
+    """ジョブを登録（queued）"""
     with get_db_connection() as conn:
-        cursor = conn.cursor()
+        conn.execute("""
+            INSERT INTO jobs (id, kind, status, expires_at)
+            VALUES (?, ?, 'queued', datetime('now', ?))
+        """, (job_id, kind, f"+{int(ttl_seconds)} seconds"))
+        conn.commit()
+
+
+def update_job(
+    job_id: str,
+    status: str,
+    ttl_seconds: int,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None
+):
+    """ジョブの状態を更新（保持期限は更新時点から ttl_seconds 秒後に延長）"""
+    with get_db_connection() as conn:
+        conn.execute("""
+            UPDATE jobs
+            SET status = ?, result = ?, error = ?,
+                updated_at = CURRENT_TIMESTAMP,
+                expires_at = datetime('now', ?)
+            WHERE id = ?
+        """, (
+            status,
+            json.dumps(result, ensure_ascii=False) if result is not None else None,
+            error,
+            f"+{int(ttl_seconds)} seconds",
+            job_id
+        ))
+        conn.commit()
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """ジョブを取得（保持期限切れのものは None）"""
+    with get_db_connection() as conn:
+        row = conn.execute("""
+            SELECT id, kind, status, result, error, created_at, updated_at, expires_at
+            FROM jobs
+            WHERE id = ? AND expires_at > datetime('now')
+        """, (job_id,)).fetchone()
+    
+    if row is None:
+        return None
+    
+    data = dict(row)
+    if data['result']:
+        data['result'] = json.loads(data['result'])
+    return data
+
+
+def fail_stale_jobs(stale_seconds: int, job_id: Optional[str] = None) -> int:
+    """
+    更新が stale_seconds 秒以上止まっている queued / running のジョブを error にする
+    
+    実行中のワーカーが再起動（max_requests・タイムアウト・デプロイ）されると、
+    ジョブは running のまま保持期限まで残り、ブラウザがポーリングし続けるため
+    
+    Args:
+        stale_seconds: この秒数以上更新がなければ失敗とみなす
+        job_id: 指定した場合はそのジョブだけを対象にする
+    
+    Returns:
+        error にした件数
+    """
+    sql = """
+        UPDATE jobs
+        SET status = 'error', error = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE status IN ('queued', 'running') AND updated_at <= datetime('now', ?)
+    """
+    params: List[Any] = ['添削が時間内に完了しませんでした。もう一度送信してください。', f"-{int(stale_seconds)} seconds"]
+    if job_id is not None:
+        sql += " AND id = ?"
+        params.append(job_id)
+    with get_db_connection() as conn:
+        cursor = conn.execute(sql, params)
+        conn.commit()
+        return cursor.rowcount
+
+
+def delete_expired_jobs() -> int:
+    """保持期限切れのジョブを削除し、削除件数を返す"""
+    with get_db_connection() as conn:
+        cursor = conn.execute("DELETE FROM jobs WHERE expires_at <= datetime('now')")
+        conn.commit()
+        return cursor.rowcount
+
+
+# ===== 重複実行防止リース（single-flight） =====
+
+def acquire_lease(key: str, owner: str, lease_seconds: int) -> bool:
+    """
+    リースを取得（未登録または期限切れの場合のみ成功）
+    
+    INSERT ... ON CONFLICT DO UPDATE WHERE で1文で判定するため、
+    複数プロセスが同時に呼んでも取得できるのは1つだけ
+    """
+    with get_db_connection() as conn:
+        cursor = conn.execute("""
+            INSERT INTO inflight_leases (key, owner, status, result, expires_at)
+            VALUES (?, ?, 'running', NULL, datetime('now', ?))
+            ON CONFLICT(key) DO UPDATE
+            SET owner = excluded.owner, status = 'running', result = NULL,
+                expires_at = excluded.expires_at
+            WHERE inflight_leases.expires_at <= datetime('now')
+        """, (key, owner, f"+{int(lease_seconds)} seconds"))
+        conn.commit()
+        return cursor.rowcount == 1
+
+
+def complete_lease(key: str, owner: str, result: Dict[str, Any], ttl_seconds: int):
+    """リースに結果を保存（ttl_seconds 秒間は同じリクエストにこの結果を返す）"""
+    with get_db_connection() as conn:
+        conn.execute("""
+            UPDATE inflight_leases
+            SET status = 'done', result = ?, expires_at = datetime('now', ?)
+            WHERE key = ? AND owner = ?
+        """, (json.dumps(result, ensure_ascii=False), f"+{int(ttl_seconds)} seconds", key, owner))
+        conn.execute("DELETE FROM inflight_leases WHERE expires_at <= datetime('now')")
+        conn.commit()
+
+
+def release_lease(key: str, owner: str):
+    """リースを解放（失敗時。待機中の他プロセスが代わりに実行できるようにする）"""
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM inflight_leases WHERE key = ? AND owner = ?", (key, owner))
+        conn.commit()
+
+
+def get_lease(key: str) -> Optional[Dict[str, Any]]:
+    """有効なリースを取得（期限切れ・未登録の場合は None）"""
+    with get_db_connection() as conn:
+        row = conn.execute("""
+            SELECT key, owner, status, result, expires_at
+            FROM inflight_leases
+            WHERE key = ? AND expires_at > datetime('now')
+        """, (key,)).fetchone()
+    
+    if row is None:
+        return None
+    
+    data = dict(row)
+    if data['result']:
+        data['result'] = json.loads(data['result'])
+    return data
+
+
+# ===== 添削結果キャッシュ =====
+
+@metrics.timed("db.get_cached_correction")
+def get_cached_correction(question_hash: str, answer_hash: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+    """キャッシュ済みの添削結果を取得（ヒット時はヒット回数を更新）"""
+    with get_db_connection() as conn:
+        row = conn.execute("""
+            SELECT response FROM correction_cache
+            WHERE question_hash = ? AND answer_hash = ? AND prompt_version = ?
+        """, (question_hash, answer_hash, prompt_version)).fetchone()
         
-        # 総提出数
-        cursor.execute("SELECT COUNT(*) as count FROM submissions")
-        total_submissions = cursor.fetchone()['count']
+        if row is None:
+            return None
         
-        # 平均スコア
-        cursor.execute("SELECT AVG(total_score) as avg_score FROM submissions")
-        avg_score = cursor.fetchone()['avg_score'] or 0
+        conn.execute("""
+            UPDATE correction_cache
+            SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+            WHERE question_hash = ? AND answer_hash = ? AND prompt_version = ?
+        """, (question_hash, answer_hash, prompt_version))
+        conn.commit()
+    
+    return json.loads(row['response'])
+
+
+def save_cached_correction(question_hash: str, answer_hash: str, prompt_version: str, response: Dict[str, Any]):
+    """添削結果をキャッシュに保存（同じキーがあれば上書き）"""
+    with get_db_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO correction_cache (question_hash, answer_hash, prompt_version, response)
+            VALUES (?, ?, ?, ?)
+        """, (question_hash, answer_hash, prompt_version, json.dumps(response, ensure_ascii=False)))
+        conn.commit()
+
+
+def get_cached_sentence_points(japanese_hash: str, sentence_hash: str, prompt_version: str) -> Optional[List[Dict[str, Any]]]:
+    """キャッシュ済みの1文分の添削ポイントを取得（ヒット時はヒット回数を更新）"""
+    with get_db_connection() as conn:
+        row = conn.execute("""
+            SELECT points FROM sentence_points_cache
+            WHERE japanese_hash = ? AND sentence_hash = ? AND prompt_version = ?
+        """, (japanese_hash, sentence_hash, prompt_version)).fetchone()
         
-        # 最高スコア
-        cursor.execute("SELECT MAX(total_score) as max_score FROM submissions")
-        max_score = cursor.fetchone()['max_score'] or 0
+        if row is None:
+            return None
         
-        # 項目別平均スコア
-        cursor.execute("""
-            SELECT 
-                AVG(score_content) as avg_content,
-                AVG(score_structure) as avg_structure,
-                AVG(score_vocabulary) as avg_vocabulary,
-                AVG(score_grammar) as avg_grammar,
-                AVG(score_word_count) as avg_word_count
-            FROM submissions
-        """)
-        avg_scores = cursor.fetchone()
-        
-        return {
-            'total_submissions': total_submissions,
-            'average_score': round(avg_score, 2),
-            'max_score': max_score,
-            'average_scores': {
-                'content': round(avg_scores['avg_content'] or 0, 2),
-                'structure': round(avg_scores['avg_structure'] or 0, 2),
-                'vocabulary': round(avg_scores['avg_vocabulary'] or 0, 2),
-                'grammar': round(avg_scores['avg_grammar'] or 0, 2),
-                'word_count': round(avg_scores['avg_word_count'] or 0, 2)
-            }
+        conn.execute("""
+            UPDATE sentence_points_cache
+            SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+            WHERE japanese_hash = ? AND sentence_hash = ? AND prompt_version = ?
+        """, (japanese_hash, sentence_hash, prompt_version))
+        conn.commit()
+    
+    return json.loads(row['points'])
+
+
+def save_cached_sentence_points(japanese_hash: str, sentence_hash: str, prompt_version: str, points: List[Dict[str, Any]]):
+    """1文分の添削ポイントをキャッシュに保存（同じキーがあれば上書き）"""
+    with get_db_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO sentence_points_cache (japanese_hash, sentence_hash, prompt_version, points)
+            VALUES (?, ?, ?, ?)
+        """, (japanese_hash, sentence_hash, prompt_version, json.dumps(points, ensure_ascii=False)))
+        conn.commit()
+
+
+def get_cached_model_answer(question_hash: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+    """キャッシュ済みの模範解答を取得"""
+    with get_db_connection() as conn:
+        row = conn.execute("""
+            SELECT model_answer, model_answer_explanation FROM model_answer_cache
+            WHERE question_hash = ? AND prompt_version = ?
+        """, (question_hash, prompt_version)).fetchone()
+    
+    return dict(row) if row else None
+
+
+def save_cached_model_answer(question_hash: str, prompt_version: str, model_answer: str, model_answer_explanation: Optional[str]):
+    """模範解答をキャッシュに保存（同じキーがあれば上書き）"""
+    with get_db_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO model_answer_cache (question_hash, prompt_version, model_answer, model_answer_explanation)
+            VALUES (?, ?, ?, ?)
+        """, (question_hash, prompt_version, model_answer, model_answer_explanation))
+        conn.commit()
+
+
+def delete_stale_correction_cache(prompt_version: str) -> int:
+    """現在のプロンプト版以外のキャッシュ（全体・文単位・模範解答）を削除し、削除件数を返す"""
+    with get_db_connection() as conn:
+        deleted = 0
+        for table in ("correction_cache", "sentence_points_cache", "model_answer_cache"):
+            cursor = conn.execute(f"DELETE FROM {table} WHERE prompt_version != ?", (prompt_version,))
+            deleted += cursor.rowcount
+        conn.commit()
+        return deleted
+
+
+def prune_correction_cache(ttl_days: int, max_entries: int) -> int:
+    """
+    キャッシュ（全体・文単位・模範解答）の期限切れ・上限超過分を削除し、削除件数を返す
+    
+    - 最後に使われてから（未使用なら保存から）ttl_days 日を過ぎたものを削除
+    - テーブルごとに max_entries 件を超えた分は、最後に使われたのが古い順（LRU）に削除
+    """
+    tables = {
+        "correction_cache": "COALESCE(last_hit_at, created_at)",
+        "sentence_points_cache": "COALESCE(last_hit_at, created_at)",
+        "model_answer_cache": "created_at",
+    }
+    with get_db_connection() as conn:
+        deleted = 0
+        for table, last_used in tables.items():
+            cursor = conn.execute(
+                f"DELETE FROM {table} WHERE {last_used} <= datetime('now', ?)",
+                (f"-{int(ttl_days)} days",)
+            )
+            deleted += cursor.rowcount
+            cursor = conn.execute(f"""
+                DELETE FROM {table} WHERE rowid IN (
+                    SELECT rowid FROM {table} ORDER BY {last_used} DESC LIMIT -1 OFFSET ?
+                )
+            """, (int(max_entries),))
+            deleted += cursor.rowcount
+        conn.commit()
+        return deleted
+
+
+@metrics.timed("db.get_statistics")
+def get_statistics(user_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    統計情報を取得
+    
+    全体の統計は submission_stats の1行を読むだけ。
+    user_id 指定時はその利用者の提出を idx_submissions_user_history の範囲だけ集計する。
+    """
+    with get_db_connection() as conn:
+        if user_id is None:
+            stats = conn.execute("SELECT * FROM submission_stats WHERE id = 1").fetchone()
+        else:
+            stats = conn.execute(_stats_aggregate_query("WHERE user_id = ?"), (user_id,)).fetchone()
+    
+    def average(prefix: str) -> float:
+        # AVG() と同じく NULL（採点なし）の提出は除いた平均、対象がなければ0
+        if stats is None or not stats[f'{prefix}_count']:
+            return 0
+        return round(stats[f'{prefix}_sum'] / stats[f'{prefix}_count'], 2)
+    
+    return {
+        'total_submissions': stats['total_submissions'] if stats else 0,
+        'average_score': average('total_score'),
+        'max_score': (stats['max_score'] if stats else None) or 0,
+        'average_scores': {
+            'content': average('content'),
+            'structure': average('structure'),
+            'vocabulary': average('vocabulary'),
+            'grammar': average('grammar'),
+            'word_count': average('word_count')
         }
+    }
 
 
-def get_recent_excerpt_types(limit: int = 10) -> List[str]:
-    """直近N問の抜粋タイプを取得"""
+def get_recent_excerpt_types(limit: int = 10, user_id: Optional[str] = None) -> List[str]:
+    """直近N問の抜粋タイプを取得（user_id 指定時はその利用者に出題した問題）"""
+    user_condition, params = _issued_questions_filter(user_id)
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT excerpt_type 
             FROM questions 
-            WHERE excerpt_type IS NOT NULL
+            WHERE excerpt_type IS NOT NULL AND {user_condition}
             ORDER BY created_at DESC 
             LIMIT ?
-        """, (limit,))
+        """, (*params, limit))
         
         return [row[0] for row in cursor.fetchall() if row[0]]
 
@@ -347,43 +1266,41 @@ def should_avoid_excerpt_type(excerpt_type: str) -> bool:
 
 # ===== 既出テーマ管理（重複回避） =====
 
-def record_used_theme(theme: str, mode: str = "general"):
-    """テーマの使用を記録"""
+def record_used_theme(theme: str, mode: str = "general", user_id: str = ""):
+    """
+    テーマの使用を記録
+    
+    全利用者の合計（user_id = ''）と、利用者ごとの行の両方を更新する
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # 既存のテーマを確認（modeも考慮）
-        cursor.execute("SELECT count FROM used_themes WHERE theme = ? AND mode = ?", (theme, mode))
-        row = cursor.fetchone()
-        
-        if row:
-            # 既存のテーマなら使用回数を増やす
+        # 新規テーマなら挿入、既存なら使用回数を増やす（modeも考慮）
+        # SELECT→INSERT/UPDATE の2段階だと同時リクエストで競合するため、1文で原子的に行う
+        for scope in dict.fromkeys(("", user_id)):
             cursor.execute("""
-                UPDATE used_themes 
+                INSERT INTO used_themes (user_id, theme, mode, count, last_used)
+                VALUES (?, ?, ?, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT(user_id, theme) DO UPDATE
                 SET count = count + 1, last_used = CURRENT_TIMESTAMP
-                WHERE theme = ? AND mode = ?
-            """, (theme, mode))
-        else:
-            # 新規テーマなら挿入
-            cursor.execute("""
-                INSERT INTO used_themes (theme, mode, count, last_used)
-                VALUES (?, ?, 1, CURRENT_TIMESTAMP)
-            """, (theme, mode))
+                WHERE used_themes.mode = excluded.mode
+            """, (scope, theme, mode))
         
         conn.commit()
         logger.info(f"Theme recorded: {theme} (mode: {mode})")
 
 
-def get_excluded_themes(max_recent: int = 10) -> List[str]:
-    """最近使用されたテーマを取得（重複回避用）"""
+def get_excluded_themes(max_recent: int = 10, user_id: Optional[str] = None) -> List[str]:
+    """最近使用されたテーマを取得（重複回避用、user_id 指定時はその利用者が使ったテーマ）"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT theme 
             FROM used_themes 
+            WHERE user_id = ?
             ORDER BY last_used DESC 
             LIMIT ?
-        """, (max_recent,))
+        """, (user_id or "", max_recent))
         
         rows = cursor.fetchall()
         themes = [row['theme'] for row in rows]
@@ -392,39 +1309,102 @@ def get_excluded_themes(max_recent: int = 10) -> List[str]:
         return themes
 
 
-def get_theme_statistics() -> List[Dict[str, Any]]:
-    """テーマの使用統計を取得"""
+def get_theme_statistics(user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """テーマの使用統計を取得（user_id 指定時はその利用者の統計）"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT theme, count, last_used
             FROM used_themes
+            WHERE user_id = ?
             ORDER BY count DESC, last_used DESC
             LIMIT 20
-        """)
+        """, (user_id or "",))
         
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
 
 
-def get_recent_themes(limit: int = 20) -> List[str]:
+# 誤りのレベル（❌ で始まる）。LIKE '❌%' は索引を範囲検索できないため、
+# [ERROR_LEVEL_PREFIX, 次の文字) の範囲で idx_correction_points_level をシークする
+ERROR_LEVEL_PREFIX = '❌'
+_ERROR_LEVEL_UPPER = chr(ord(ERROR_LEVEL_PREFIX) + 1)
+
+
+def build_error_statistics_query(
+    theme: Optional[str] = None,
+    user_id: Optional[str] = None,
+    errors_only: bool = True
+) -> Tuple[str, List[Any]]:
+    """get_error_statistics の SQL とパラメータ（引数は同じ。実行計画の確認用にも使う）"""
+    conditions, params = [], []
+    if errors_only:
+        conditions.append("p.level >= ? AND p.level < ?")
+        params.extend([ERROR_LEVEL_PREFIX, _ERROR_LEVEL_UPPER])
+    if theme is not None:
+        conditions.append("q.theme = ?")
+        params.append(theme)
+    user_condition, user_params = _user_filter(user_id, column="p.user_id")
+    if user_condition:
+        conditions.append(user_condition)
+        params.extend(user_params)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    query = f"""
+        SELECT q.theme AS theme, p.level AS level, COUNT(*) AS count
+        FROM correction_points p
+        JOIN questions q ON q.id = p.question_id
+        {where}
+        GROUP BY q.theme, p.level
+        ORDER BY q.theme, count DESC
+    """
+    return query, params
+
+
+def get_error_statistics(
+    theme: Optional[str] = None,
+    user_id: Optional[str] = None,
+    errors_only: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    ジャンル（theme）ごとの添削ポイントのレベル別件数（多い順）
+
+    Args:
+        theme: 指定したジャンルのみ（None なら全ジャンル）
+        user_id: 指定した利用者の提出のみ（None なら全利用者）
+        errors_only: ❌ のレベル（誤り）のみを数える
+
+    Returns:
+        [{"theme": ..., "level": ..., "count": ...}, ...]（ジャンルごとに件数の多い順）
+    """
+    query, params = build_error_statistics_query(theme, user_id, errors_only)
+
+    with get_db_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+
+def get_recent_themes(limit: int = 20, user_id: Optional[str] = None) -> List[str]:
     """
     直近N問のtheme（ジャンル）を取得（新しい順）
     
     Args:
         limit: 取得する問題数
+        user_id: 指定した利用者に出題した問題のみ（None なら全利用者）
     
     Returns:
         themeのリスト（新しい順）
     """
+    user_condition, params = _issued_questions_filter(user_id)
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT theme
             FROM questions
+            WHERE {user_condition}
             ORDER BY created_at DESC
             LIMIT ?
-        """, (limit,))
+        """, (*params, limit))
         
         rows = cursor.fetchall()
         themes = [row['theme'] for row in rows]
@@ -432,7 +1412,98 @@ def get_recent_themes(limit: int = 20) -> List[str]:
         return themes
 
 
-def get_recent_subtopics(limit: int = 10) -> List[str]:
+# サブトピック（A-H）のキーワード（全7ジャンル対応）
+TOPIC_KEYWORDS = {
+    "研究紹介": {
+        "A": ["記憶", "暗記", "想起", "テスト効果", "学習"],
+        "B": ["習慣", "継続", "報酬", "トリガー", "行動"],
+        "C": ["睡眠", "昼寝", "集中", "注意力"],
+        "D": ["運動", "ストレッチ", "姿勢", "健康", "軽運動"],
+        "E": ["食事", "カフェイン", "朝食", "間食", "嗜好"],
+        "F": ["ストレス", "不安", "怒り", "リラックス", "感情"],
+        "G": ["スマホ", "デジタル", "通知", "SNS"],
+        "H": ["協力", "共感", "コミュニケーション", "社会行動"]
+    },
+    "時事": {
+        "A": ["医療", "ワクチン", "感染症", "病院", "公衆衛生"],
+        "B": ["科学", "研究", "発見", "論文", "倫理"],
+        "C": ["AI", "テクノロジー", "データ", "セキュリティ"],
+        "D": ["環境", "災害", "猛暑", "洪水", "防災"],
+        "E": ["教育", "学校", "学力", "いじめ", "若者"],
+        "F": ["労働", "外国人", "少子", "高齢化", "人口"],
+        "G": ["経済", "物価", "住宅", "交通", "生活"],
+        "H": ["法", "規制", "プライバシー", "制度", "行政"]
+    },
+    "学術": {
+        "A": ["心理", "療法", "メンタル", "認知"],
+        "B": ["反復", "間隔", "記憶", "定着"],
+        "C": ["予防", "患者", "生活習慣"],
+        "D": ["脳", "注意", "意思決定", "バイアス"],
+        "E": ["対人", "支援", "共感"],
+        "F": ["自己制御", "動機", "習慣"],
+        "G": ["研究倫理", "プライバシー"],
+        "H": ["睡眠", "運動", "食行動"]
+    },
+    "ブログ": {
+        "A": ["スマホ", "通知", "SNS"],
+        "B": ["体", "不調", "首", "目", "肩", "睡眠"],
+        "C": ["待ち時間", "移動", "通勤", "通学"],
+        "D": ["学習", "仕事", "習慣"],
+        "E": ["お金", "買い物", "片づけ"],
+        "F": ["気分転換", "ストレス"],
+        "G": ["人間関係", "会話", "気疲れ"],
+        "H": ["食事", "カフェイン", "生活リズム"]
+    },
+    "レビュー": {
+        "A": ["映画", "ヒューマン", "ドラマ"],
+        "B": ["本", "ノンフィクション", "エッセイ"],
+        "C": ["ドキュメンタリー", "記事"],
+        "D": ["展示", "舞台", "イベント"],
+        "E": ["ボランティア", "実習", "体験"],
+        "F": ["サービス", "図書館", "施設"],
+        "G": ["仕事", "職業", "使命"],
+        "H": ["場面", "心に残る"]
+    },
+    "コラム": {
+        "A": ["マナー", "音", "ゴミ"],
+        "B": ["学校", "宿題", "ICT", "評価"],
+        "C": ["働き方", "リモート", "労働"],
+        "D": ["医療", "予防", "検診"],
+        "E": ["地域", "多文化", "共生", "町"],
+        "F": ["デジタル", "依存", "プライバシー"],
+        "G": ["環境", "節電", "リサイクル"],
+        "H": ["若者", "家庭", "時間"]
+    },
+    "図表": {
+        "A": ["学習時間", "スマホ時間"],
+        "B": ["睡眠時間", "疲労"],
+        "C": ["図書館", "施設", "利用", "曜日"],
+        "D": ["交通", "通勤", "利用者"],
+        "E": ["運動", "検診", "健康行動"],
+        "F": ["アンケート", "満足度", "意識"],
+        "G": ["年代", "若年", "中年", "高齢"],
+        "H": ["地域", "都市", "地方"]
+    }
+}
+
+
+def classify_topic_label(theme: str, text: str) -> Optional[str]:
+    """
+    本文・ヒントのテキストをキーワードマッチでサブトピック（A-H）に分類
+    
+    Returns:
+        最もキーワードが多く含まれるトピック（ジャンルが未定義・一致なしなら None）
+    """
+    best_topic, max_matches = None, 0
+    for topic, keywords in TOPIC_KEYWORDS.get(theme, {}).items():
+        matches = sum(1 for kw in keywords if kw in text)
+        if matches > max_matches:
+            max_matches = matches
+            best_topic = topic
+    return best_topic
+
+
+def get_recent_subtopics(limit: int = 10, user_id: Optional[str] = None) -> List[str]:
     """
     直近N問のサブトピック（A-H）をhintsから推測して取得（新しい順）
     
@@ -441,119 +1512,37 @@ def get_recent_subtopics(limit: int = 10) -> List[str]:
     
     Args:
         limit: 取得する問題数
+        user_id: 指定した利用者に出題した問題のみ（None なら全利用者）
     
     Returns:
         "ジャンル:トピック"形式のリスト（例: "研究紹介:C", "時事:A"）
     """
+    user_condition, params = _issued_questions_filter(user_id)
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT theme, hints, japanese_sentences
             FROM questions
+            WHERE {user_condition}
             ORDER BY created_at DESC
             LIMIT ?
-        """, (limit,))
+        """, (*params, limit))
         
         rows = cursor.fetchall()
         
         import json
         subtopics = []
         
-        # キーワードマッピング（全7ジャンル対応）
-        topic_keywords = {
-            "研究紹介": {
-                "A": ["記憶", "暗記", "想起", "テスト効果", "学習"],
-                "B": ["習慣", "継続", "報酬", "トリガー", "行動"],
-                "C": ["睡眠", "昼寝", "集中", "注意力"],
-                "D": ["運動", "ストレッチ", "姿勢", "健康", "軽運動"],
-                "E": ["食事", "カフェイン", "朝食", "間食", "嗜好"],
-                "F": ["ストレス", "不安", "怒り", "リラックス", "感情"],
-                "G": ["スマホ", "デジタル", "通知", "SNS"],
-                "H": ["協力", "共感", "コミュニケーション", "社会行動"]
-            },
-            "時事": {
-                "A": ["医療", "ワクチン", "感染症", "病院", "公衆衛生"],
-                "B": ["科学", "研究", "発見", "論文", "倫理"],
-                "C": ["AI", "テクノロジー", "データ", "セキュリティ"],
-                "D": ["環境", "災害", "猛暑", "洪水", "防災"],
-                "E": ["教育", "学校", "学力", "いじめ", "若者"],
-                "F": ["労働", "外国人", "少子", "高齢化", "人口"],
-                "G": ["経済", "物価", "住宅", "交通", "生活"],
-                "H": ["法", "規制", "プライバシー", "制度", "行政"]
-            },
-            "学術": {
-                "A": ["心理", "療法", "メンタル", "認知"],
-                "B": ["反復", "間隔", "記憶", "定着"],
-                "C": ["予防", "患者", "生活習慣"],
-                "D": ["脳", "注意", "意思決定", "バイアス"],
-                "E": ["対人", "支援", "共感"],
-                "F": ["自己制御", "動機", "習慣"],
-                "G": ["研究倫理", "プライバシー"],
-                "H": ["睡眠", "運動", "食行動"]
-            },
-            "ブログ": {
-                "A": ["スマホ", "通知", "SNS"],
-                "B": ["体", "不調", "首", "目", "肩", "睡眠"],
-                "C": ["待ち時間", "移動", "通勤", "通学"],
-                "D": ["学習", "仕事", "習慣"],
-                "E": ["お金", "買い物", "片づけ"],
-                "F": ["気分転換", "ストレス"],
-                "G": ["人間関係", "会話", "気疲れ"],
-                "H": ["食事", "カフェイン", "生活リズム"]
-            },
-            "レビュー": {
-                "A": ["映画", "ヒューマン", "ドラマ"],
-                "B": ["本", "ノンフィクション", "エッセイ"],
-                "C": ["ドキュメンタリー", "記事"],
-                "D": ["展示", "舞台", "イベント"],
-                "E": ["ボランティア", "実習", "体験"],
-                "F": ["サービス", "図書館", "施設"],
-                "G": ["仕事", "職業", "使命"],
-                "H": ["場面", "心に残る"]
-            },
-            "コラム": {
-                "A": ["マナー", "音", "ゴミ"],
-                "B": ["学校", "宿題", "ICT", "評価"],
-                "C": ["働き方", "リモート", "労働"],
-                "D": ["医療", "予防", "検診"],
-                "E": ["地域", "多文化", "共生", "町"],
-                "F": ["デジタル", "依存", "プライバシー"],
-                "G": ["環境", "節電", "リサイクル"],
-                "H": ["若者", "家庭", "時間"]
-            },
-            "図表": {
-                "A": ["学習時間", "スマホ時間"],
-                "B": ["睡眠時間", "疲労"],
-                "C": ["図書館", "施設", "利用", "曜日"],
-                "D": ["交通", "通勤", "利用者"],
-                "E": ["運動", "検診", "健康行動"],
-                "F": ["アンケート", "満足度", "意識"],
-                "G": ["年代", "若年", "中年", "高齢"],
-                "H": ["地域", "都市", "地方"]
-            }
-        }
-        
         for row in rows:
             theme = row['theme']
             hints_str = row['hints'] or ""
             ja_sentences = row['japanese_sentences'] or ""
             
             # 全ジャンル対応
-            if theme in topic_keywords:
+            if theme in TOPIC_KEYWORDS:
                 # hintsとja_sentencesを結合してテキスト検索
-                full_text = hints_str + " " + ja_sentences
-                
-                # 最もマッチするトピックを探す
-                max_matches = 0
-                best_topic = "不明"
-                
-                for topic, keywords in topic_keywords[theme].items():
-                    matches = sum(1 for kw in keywords if kw in full_text)
-                    if matches > max_matches:
-                        max_matches = matches
-                        best_topic = topic
-                
-                subtopics.append(f"{theme}:{best_topic}")
+                best_topic = classify_topic_label(theme, hints_str + " " + ja_sentences)
+                subtopics.append(f"{theme}:{best_topic or '不明'}")
             else:
                 # マッピング未定義のジャンル
                 subtopics.append(f"{theme}:未分類")
@@ -0,0 +1,218 @@
+"""
+LLM応答のデバッグ保存 - 非同期キャプチャ
+宮崎大学医学部英作文特訓システム
+
+添削リクエストの中で同期的にファイルを書くと、ディスクI/O分だけ応答が遅れ、
+同時リクエストが debug/llm_response_N.json を上書きし合っていました。
+このモジュールは以下の方式で保存します：
+1. リクエスト単位でサンプリング（DEBUG_CAPTURE_SAMPLE_RATE）
+2. 上限付きのメモリキューに積むだけ（満杯なら捨てる＝リクエストをブロックしない）
+3. バックグラウンドスレッドが gzip 圧縮の JSONL アーカイブに追記
+4. アーカイブが上限サイズを超えたらローテーション
+gunicorn の複数ワーカーが同じアーカイブに書くため、追記とローテーションは
+ロックファイル（fcntl.flock）でプロセス間の排他をとる。
+"""
+import os
+import json
+import gzip
+import queue
+import random
+import atexit
+import logging
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+try:
+    import fcntl
+except ImportError:  # Windows（開発用の単一プロセス）ではプロセス間ロックなし
+    fcntl = None
+
+import config
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_NAME = "llm_responses.jsonl.gz"
+LOCK_NAME = "llm_responses.lock"
+
+# ワーカー状態（fork後の子プロセスでは作り直す）
+_queue: Optional[queue.Queue] = None
+_worker: Optional[threading.Thread] = None
+_worker_pid: Optional[int] = None
+_lock = threading.Lock()
+_dropped = 0
+
+
+def should_capture() -> bool:
+    """このリクエストの応答を保存するか（有効かつサンプリングに当選した場合のみ）"""
+    if not config.DEBUG_CAPTURE_ENABLED:
+        return False
+    return random.random() < config.DEBUG_CAPTURE_SAMPLE_RATE
+
+
+def new_capture_id() -> str:
+    """キャプチャ用のリクエストIDを生成"""
+    return f"r_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def capture_llm_response(
+    capture_id: str,
+    attempt: int,
+    response: str,
+    kind: str = "correction",
+    request: Optional[Dict[str, Any]] = None
+) -> bool:
+    """
+    LLM応答をキャプチャキューに積む（ブロックしない）
+
+    Args:
+        capture_id: new_capture_id() で生成したリクエストID
+        attempt: 試行回数（1始まり）
+        response: LLMの生の応答
+        kind: 応答の種類（correction / model_answer など）
+        request: 応答のもとになったリクエスト（1回目の試行のみ、bench_replay.py でのリプレイ用）
+
+    Returns:
+        キューに積めた場合 True、キューが満杯で捨てた場合 False
+    """
+    global _dropped
+
+    record = {
+        "capture_id": capture_id,
+        "kind": kind,
+        "attempt": attempt,
+        "captured_at": datetime.now().isoformat(),
+        "response": response
+    }
+    if request is not None:
+        record["request"] = request
+
+    try:
+        _ensure_worker().put_nowait(record)
+        return True
+    except queue.Full:
+        with _lock:
+            _dropped += 1
+        logger.debug(f"Debug capture queue full, dropped {capture_id} (total dropped: {_dropped})")
+        return False
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """キューに積まれた応答をすべて書き出すまで待つ（テスト・終了処理用）"""
+    if _queue is None or _worker_pid != os.getpid():
+        return True
+
+    done = threading.Event()
+    try:
+        _queue.put(done, timeout=timeout)
+    except queue.Full:
+        return False
+    return done.wait(timeout)
+
+
+def read_archive(path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """アーカイブを読み込む（デバッグ・リプレイ用）"""
+    path = path or (Path(config.DEBUG_CAPTURE_DIR) / ARCHIVE_NAME)
+    if not path.exists():
+        return []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ===== 内部処理 =====
+
+def _ensure_worker() -> queue.Queue:
+    """書き込みスレッドを起動（初回またはfork後の子プロセスで1回だけ）"""
+    global _queue, _worker, _worker_pid
+
+    if _queue is not None and _worker_pid == os.getpid():
+        return _queue
+
+    with _lock:
+        if _queue is None or _worker_pid != os.getpid():
+            _queue = queue.Queue(maxsize=config.DEBUG_CAPTURE_QUEUE_SIZE)
+            _worker = threading.Thread(
+                target=_writer_loop,
+                args=(_queue,),
+                name="debug-capture-writer",
+                daemon=True
+            )
+            _worker_pid = os.getpid()
+            _worker.start()
+            logger.info(f"Debug capture writer started (pid={_worker_pid}, dir={config.DEBUG_CAPTURE_DIR})")
+
+    return _queue
+
+
+def _writer_loop(q: queue.Queue):
+    """キューから取り出してまとめて書き込む"""
+    while True:
+        batch = [q.get()]
+        # 溜まっている分はまとめて1回で書く
+        while len(batch) < 100:
+            try:
+                batch.append(q.get_nowait())
+            except queue.Empty:
+                break
+
+        records = [item for item in batch if isinstance(item, dict)]
+        if records:
+            try:
+                _write_records(records)
+            except Exception as e:
+                logger.warning(f"Debug capture write failed: {e}")
+
+        # flush() の待機を解除
+        for item in batch:
+            if isinstance(item, threading.Event):
+                item.set()
+
+
+def _write_records(records: List[Dict[str, Any]]):
+    """gzip JSONL アーカイブに追記（上限を超えていればローテーション）"""
+    directory = Path(config.DEBUG_CAPTURE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / ARCHIVE_NAME
+    lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+
+    # サイズ確認・ローテーション・追記を1つのロック内で行う
+    # （gzip メンバーの混在や、2つのワーカーが同じファイルをリネームするのを防ぐ）
+    with open(directory / LOCK_NAME, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            if path.exists() and path.stat().st_size >= config.DEBUG_CAPTURE_MAX_BYTES:
+                _rotate(path)
+
+            # 追記ごとに gzip メンバーが増えるが、gzip.open でそのまま連続して読める
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                f.write(lines)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _rotate(path: Path):
+    """llm_responses.jsonl.gz → llm_responses.1.jsonl.gz → ...（古いものから削除、ロック取得済みで呼ぶ）"""
+    backup_count = config.DEBUG_CAPTURE_BACKUP_COUNT
+    stem = path.name[:-len(".jsonl.gz")]
+
+    def backup(n: int) -> Path:
+        return path.with_name(f"{stem}.{n}.jsonl.gz")
+
+    oldest = backup(backup_count)
+    if oldest.exists():
+        oldest.unlink()
+    for n in range(backup_count - 1, 0, -1):
+        if backup(n).exists():
+            backup(n).rename(backup(n + 1))
+    if backup_count > 0:
+        path.rename(backup(1))
+    else:
+        path.unlink()
+    logger.info(f"Debug capture archive rotated: {path}")
+
+
+atexit.register(flush, 2.0)
@@ -0,0 +1,225 @@
+"""
+分析用エクスポート（問題・提出・添削ポイントを CSV.gz に書き出す）
+宮崎大学医学部英作文特訓システム
+
+ジャンル（theme）・抜粋タイプ（excerpt_type）・トピック（topic_label）ごとの誤り率や
+語数の分布をオフラインで分析するためのエクスポート。
+- 各テーブルを chunk_size 行ずつ読みながら gzip 圧縮した CSV に書き出す（DBの大きさによらずメモリは一定）
+- JSON の列（japanese_sentences・japanese_paragraphs・hints・target_words）は展開済みの列・行にする
+  （分析側で json.loads を繰り返さなくてよい）
+- 提出・添削ポイントには問題のジャンル等を付けて出力する（分析側で JOIN しなくてよい）
+- 全ファイルを同じ読み取りトランザクションで書き出すため、ファイル間の件数は一致する
+
+出力（--out のディレクトリ）:
+    questions.csv.gz          問題1件1行（語数範囲・文数・ヒント数など）
+    question_sentences.csv.gz 問題の日本文1文1行（kind: sentence / paragraph）
+    question_hints.csv.gz     ヒント1件1行
+    submissions.csv.gz        提出1件1行
+    correction_points.csv.gz  添削ポイント1件1行（is_error: ❌ のレベルなら 1）
+    manifest.json             各ファイルの列と行数
+
+使い方:
+    python export_analytics.py [--out exports/20260101] [--chunk-size 5000] [--with-text]
+"""
+import csv
+import gzip
+import json
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from database import get_db_connection, init_database
+
+DEFAULT_CHUNK_SIZE = 5000
+
+QUESTION_COLUMNS = [
+    "id", "mode", "theme", "topic_label", "excerpt_type", "user_id", "created_at",
+    "target_min", "target_max", "sentence_count", "paragraph_count", "japanese_chars", "hint_count",
+]
+SENTENCE_COLUMNS = ["question_id", "kind", "sentence_no", "text"]
+HINT_COLUMNS = ["question_id", "hint_no", "en", "ja", "pos", "usage"]
+SUBMISSION_COLUMNS = [
+    "id", "question_id", "user_id", "mode", "word_count", "total_score", "submitted_at",
+    "theme", "topic_label", "excerpt_type", "sentence_count", "point_count", "error_count",
+]
+SUBMISSION_TEXT_COLUMNS = ["user_answer", "corrected"]
+POINT_COLUMNS = [
+    "submission_id", "point_no", "question_id", "user_id", "sentence_no", "level", "is_error",
+    "theme", "topic_label", "excerpt_type",
+]
+POINT_TEXT_COLUMNS = ["japanese_sentence", "before_text", "after_text", "reason", "alt"]
+
+
+def _json_list(value: Optional[str]) -> List[Any]:
+    """JSON の列をリストとして読む（空・壊れた値は空リスト）"""
+    if not value:
+        return []
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def _json_dict(value: Optional[str]) -> Dict[str, Any]:
+    if not value:
+        return {}
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _question_column(conn, column: str, alias: str = "q") -> str:
+    """questions の列（古いDBで列がなければ NULL）"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(questions)")}
+    return f"{alias}.{column}" if column in columns else f"NULL AS {column}"
+
+
+def iter_chunks(conn, query: str, chunk_size: int) -> Iterator[Any]:
+    """クエリ結果を chunk_size 行ずつ読む（全件をメモリに載せない）"""
+    cursor = conn.execute(query)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def question_rows(rows: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    for row in rows:
+        sentences = _json_list(row["japanese_sentences"])
+        paragraphs = _json_list(row["japanese_paragraphs"])
+        target_words = _json_dict(row["target_words"])
+        yield {
+            "id": row["id"],
+            "mode": row["mode"],
+            "theme": row["theme"],
+            "topic_label": row["topic_label"],
+            "excerpt_type": row["excerpt_type"],
+            "user_id": row["user_id"],
+            "created_at": row["created_at"],
+            "target_min": target_words.get("min"),
+            "target_max": target_words.get("max"),
+            "sentence_count": len(sentences),
+            "paragraph_count": len(paragraphs),
+            "japanese_chars": sum(len(str(s)) for s in (paragraphs or sentences)),
+            "hint_count": len(_json_list(row["hints"])),
+        }
+
+
+def sentence_rows(rows: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    for row in rows:
+        for kind, column in (("sentence", "japanese_sentences"), ("paragraph", "japanese_paragraphs")):
+            for no, text in enumerate(_json_list(row[column]), 1):
+                yield {"question_id": row["id"], "kind": kind, "sentence_no": no, "text": text}
+
+
+def hint_rows(rows: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    for row in rows:
+        for no, hint in enumerate(_json_list(row["hints"]), 1):
+            if isinstance(hint, dict):
+                yield {"question_id": row["id"], "hint_no": no, **{k: hint.get(k) for k in HINT_COLUMNS[2:]}}
+
+
+def submission_rows(rows: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    for row in rows:
+        data = dict(row)
+        data["sentence_count"] = len(data["user_answer"].split("\n")) if data.get("user_answer") else 0
+        yield data
+
+
+def write_csv_gz(path: Path, columns: List[str], rows: Iterable[Dict[str, Any]]) -> int:
+    """行を gzip 圧縮した CSV に書き出し、書いた行数を返す"""
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def export_all(out_dir: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, with_text: bool = False) -> Dict[str, Any]:
+    """
+    全テーブルを out_dir に書き出し、manifest（各ファイルの列・行数）を返す
+
+    Args:
+        out_dir: 出力ディレクトリ（なければ作成）
+        chunk_size: 1回に読む行数
+        with_text: 提出の本文・添削ポイントの本文も出力する（ファイルが大きくなる）
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    with get_db_connection() as conn:
+        # topic_label・japanese_paragraphs は問題の初回保存時に追加される列のため、ない場合がある
+        topic_label, paragraphs = (_question_column(conn, c) for c in ("topic_label", "japanese_paragraphs"))
+
+    question_query = f"""
+        SELECT q.id, q.mode, q.theme, {topic_label}, q.excerpt_type, q.user_id, q.created_at,
+               q.japanese_sentences, {paragraphs}, q.hints, q.target_words
+        FROM questions q ORDER BY q.id
+    """
+    submission_columns = SUBMISSION_COLUMNS + (SUBMISSION_TEXT_COLUMNS if with_text else [])
+    # 件数は添削ポイントのインデックス（submission_id が先頭の主キー）から数える
+    submission_query = f"""
+        SELECT s.id, s.question_id, s.user_id, s.mode, s.word_count, s.total_score, s.submitted_at,
+               q.theme, {topic_label}, q.excerpt_type, s.user_answer{", s.corrected" if with_text else ""},
+               (SELECT COUNT(*) FROM correction_points p WHERE p.submission_id = s.id) AS point_count,
+               (SELECT COUNT(*) FROM correction_points p
+                WHERE p.submission_id = s.id AND p.level LIKE '❌%') AS error_count
+        FROM submissions s LEFT JOIN questions q ON q.id = s.question_id
+        ORDER BY s.submitted_at, s.id
+    """
+    point_columns = POINT_COLUMNS + (POINT_TEXT_COLUMNS if with_text else [])
+    point_text = ", " + ", ".join(f"p.{c}" for c in POINT_TEXT_COLUMNS) if with_text else ""
+    point_query = f"""
+        SELECT p.submission_id, p.point_no, p.question_id, p.user_id, p.sentence_no, p.level,
+               p.level LIKE '❌%' AS is_error, q.theme, {topic_label}, q.excerpt_type{point_text}
+        FROM correction_points p LEFT JOIN questions q ON q.id = p.question_id
+        ORDER BY p.submission_id, p.point_no
+    """
+
+    exports: List[tuple] = [
+        ("questions.csv.gz", QUESTION_COLUMNS, question_query, question_rows),
+        ("question_sentences.csv.gz", SENTENCE_COLUMNS, question_query, sentence_rows),
+        ("question_hints.csv.gz", HINT_COLUMNS, question_query, hint_rows),
+        ("submissions.csv.gz", submission_columns, submission_query, submission_rows),
+        ("correction_points.csv.gz", point_columns, point_query, lambda rows: (dict(r) for r in rows)),
+    ]
+
+    manifest = {"exported_at": datetime.now().isoformat(timespec="seconds"), "files": {}}
+    with get_db_connection() as conn:
+        # 全ファイルを同じスナップショットから読む（書き込み中でもファイル間で件数がずれない）
+        conn.execute("BEGIN")
+        try:
+            for filename, columns, query, to_rows in exports:
+                count = write_csv_gz(out_dir / filename, columns, to_rows(iter_chunks(conn, query, chunk_size)))
+                manifest["files"][filename] = {"columns": columns, "rows": count}
+        finally:
+            conn.rollback()
+
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="問題・提出・添削ポイントを分析用の CSV.gz に書き出す")
+    parser.add_argument("--out", default=f"exports/{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--with-text", action="store_true", help="提出・添削ポイントの本文も出力する")
+    args = parser.parse_args()
+
+    init_database()
+    manifest = export_all(Path(args.out), chunk_size=args.chunk_size, with_text=args.with_text)
+    for filename, info in manifest["files"].items():
+        print(f"{filename:<28}{info['rows']:>10} 行")
+    print(f"出力先: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,39 @@
 """
 Gunicorn configuration for production deployment
 """
+import gc
 import multiprocessing
 import os
+import sys
+
+# gunicorn は設定ファイルのグローバル変数名を設定項目として読むため、
+# config モジュールそのものではなく必要な値だけを取り込む
+from config import GUNICORN_WORKER_CLASS, GUNICORN_WORKERS, GUNICORN_CONCURRENCY
 
 # Server socket - 環境変数PORTを使用（Render対応）
 port = os.getenv('PORT', '8002')
 bind = f"0.0.0.0:{port}"
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
-worker_connections = 1000
+# 処理時間の大半はOpenAI APIの応答待ち（I/Oバウンド）なので、プロセスを増やすより
+# 1プロセス内で複数リクエストを並行処理する gthread / gevent の方がメモリ効率が良い
+worker_class = GUNICORN_WORKER_CLASS
+
+if worker_class == "gthread":
+    # threads: 1ワーカーあたりの同時リクエスト数
+    threads = GUNICORN_CONCURRENCY
+elif worker_class == "gevent":
+    # worker_connections: 1ワーカーあたりの同時リクエスト数（gevent/eventlet でのみ有効）
+    worker_connections = GUNICORN_CONCURRENCY
+
+if GUNICORN_WORKERS > 0:
+    workers = GUNICORN_WORKERS
+elif worker_class == "sync":
+    workers = multiprocessing.cpu_count() * 2 + 1
+else:
+    # 並行数はスレッド/グリーンレットで確保するため、プロセスはCPU数で十分
+    workers = max(2, multiprocessing.cpu_count())
+
 timeout = 240  # LLM応答待機時間を考慮（4分）
 keepalive = 5
 
@@ -25,7 +47,9 @@ access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"
 proc_name = "miyazaki_igaku_eisakubun"
 
 # Preload application
-preload_app = True
+# gevent は fork 後に monkey patch するため、事前ロードすると ssl/socket が
+# パッチ前のまま共有されてしまう → gevent のときだけ無効化
+preload_app = worker_class != "gevent"
 
 # Server mechanics
 daemon = False
@@ -34,3 +58,45 @@ umask = 0
 user = None
 group = None
 tmp_upload_dir = None
+
+
+# Server hooks
+# preload_app=True のとき、プロンプトテンプレート・問題ジャンル表・コンパイル済み正規表現などの
+# 読み取り専用データはマスターで1回だけ読み込み、fork 後は copy-on-write で全ワーカーが共有する。
+# 一方、OpenAI クライアント（httpx のコネクションプール）はワーカーごとに作り直す。
+# SQLite の接続は get_db_connection() の呼び出しごとに開閉しているため、fork をまたいで共有されない。
+
+def on_starting(server):
+    """マスター起動時：前回の起動でワーカーが書き出したメトリクスを削除（/metrics はこの起動からの合算）"""
+    import metrics
+    metrics.clear_shared()
+
+
+def when_ready(server):
+    """マスター起動完了時：共有したいモジュールを読み込み、GC の追跡対象から外す"""
+    llm_service = sys.modules.get("llm_service")
+    if llm_service is not None:
+        # app の import 時には遅延させているプロンプトと openai パッケージを、ここで読み込む
+        llm_service.get_prompts()
+        llm_service.preload_client_modules()
+
+    # ワーカーで GC が走ると、共有ページ上のオブジェクトヘッダに書き込みが起きて
+    # copy-on-write でページが複製される（ワーカーごとのRSSが増える）のを防ぐ
+    gc.collect()
+    gc.freeze()
+    server.log.info("Preloaded objects frozen for copy-on-write sharing: %d", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    """fork 直後（ワーカー側）：マスターから引き継いだ OpenAI クライアントを破棄"""
+    # 事前ロードしていない場合（gevent）はまだ import しない（monkey patch 前のため）
+    llm_service = sys.modules.get("llm_service")
+    if llm_service is not None:
+        llm_service.reset_client()
+
+
+def post_worker_init(worker):
+    """ワーカー初期化後：このワーカー専用の OpenAI クライアントを作成"""
+    # 初回リクエストでクライアント生成の待ちが発生しないよう、ここで作っておく
+    import llm_service
+    llm_service.get_client()
@@ -0,0 +1,35 @@
+"""
+問題ファイル（JSON / JSONL）を問題バンクに一括登録
+宮崎大学医学部英作文特訓システム
+
+各レコードは /api/question のレスポンスと同じ形式（QuestionResponse）。
+検証に通らない問題・7ジャンル以外の問題・登録済みと同じ本文の問題は登録しない。
+登録した問題は QUESTION_BANK_ENABLED のとき、LLMで生成する代わりに出題される。
+
+使い方:
+    python import_questions.py questions.jsonl [--batch-size 500]
+"""
+import argparse
+import logging
+from pathlib import Path
+
+from database import init_database
+from question_bank import import_questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="問題ファイルを問題バンクに一括登録")
+    parser.add_argument("path", type=Path, help="問題ファイル（.json: 問題の配列 / .jsonl: 1行1問）")
+    parser.add_argument("--batch-size", type=int, default=None, help="1トランザクションあたりの件数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+    init_database()
+    stats = import_questions(args.path, batch_size=args.batch_size)
+
+    print(f"読み込み: {stats['read']}件")
+    print(f"登録: {stats['imported']}件 / 重複: {stats['duplicates']}件 / 不正: {stats['invalid']}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+非同期ジョブ - 添削をバックグラウンドで実行し、結果をSQLiteに保持
+宮崎大学医学部英作文特訓システム
+
+添削はLLM応答待ちで最大数分かかり、その間HTTP接続を開いたままにすると
+プロキシやモバイル回線で切断され、完了した添削結果が失われていました。
+このモジュールは以下の方式で処理します：
+1. 受付時に job_id を発行して即座に返す（jobs テーブルに queued で登録）
+2. 上限付きのスレッドプールで添削を実行（実行待ち+実行中が JOB_MAX_PENDING を超えたら受け付けない）
+3. 結果は jobs テーブルに保存し、GET /api/jobs/<id> でどのワーカーからでも取得できる
+4. 結果は JOB_RESULT_TTL 秒後に期限切れ（新規受付時に期限切れ分を削除）
+5. JOB_STALE_SECONDS 秒以上更新のない queued / running のジョブは、実行していたワーカーが
+   再起動されたものとみなして error にする（ポーリングが保持期限まで続かないように）
+"""
+import os
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Any, Optional
+
+import config
+from database import create_job, update_job, get_job, delete_expired_jobs, fail_stale_jobs
+
+logger = logging.getLogger(__name__)
+
+# スレッドプール（fork後の子プロセスでは作り直す）
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_lock = threading.Lock()
+_pending = 0
+
+
+def new_job_id() -> str:
+    """ジョブIDを生成"""
+    return f"j_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:12]}"
+
+
+def submit_job(kind: str, func: Callable[[], Dict[str, Any]]) -> Optional[str]:
+    """
+    ジョブを登録してバックグラウンドで実行
+
+    Args:
+        kind: ジョブの種類（correct / correct-multi など）
+        func: 結果の dict を返す関数（リクエストコンテキスト外で実行される）
+
+    Returns:
+        job_id。実行待ちが上限に達している場合は None
+    """
+    global _pending
+
+    with _lock:
+        if _pending >= config.JOB_MAX_PENDING:
+            logger.warning(f"Job queue full ({_pending}/{config.JOB_MAX_PENDING}), rejected {kind}")
+            return None
+        _pending += 1
+
+    try:
+        deleted = delete_expired_jobs()
+        if deleted:
+            logger.info(f"Expired jobs deleted: {deleted}")
+        stale = fail_stale_jobs(config.JOB_STALE_SECONDS)
+        if stale:
+            logger.warning(f"Stale jobs marked as error: {stale}")
+
+        job_id = new_job_id()
+        create_job(job_id, kind, config.JOB_RESULT_TTL)
+        _ensure_executor().submit(_run_job, job_id, func)
+    except Exception:
+        _release()
+        raise
+
+    logger.info(f"Job queued: {job_id} ({kind})")
+    return job_id
+
+
+def get_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    ジョブの状態を取得（API応答用）
+
+    Returns:
+        {"job_id", "kind", "status", "created_at", "updated_at", "expires_at"}
+        + 完了時は "result"、失敗時は "error"。存在しない・期限切れの場合は None
+    """
+    if fail_stale_jobs(config.JOB_STALE_SECONDS, job_id):
+        logger.warning(f"Stale job marked as error: {job_id}")
+    job = get_job(job_id)
+    if job is None:
+        return None
+
+    status = {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at'],
+        'expires_at': job['expires_at']
+    }
+    if job['status'] == 'done':
+        status['result'] = job['result']
+    elif job['status'] == 'error':
+        status['error'] = job['error']
+    return status
+
+
+# ===== 内部処理 =====
+
+def _ensure_executor() -> ThreadPoolExecutor:
+    """スレッドプールを作成（初回またはfork後の子プロセスで1回だけ）"""
+    global _executor, _executor_pid
+
+    if _executor is not None and _executor_pid == os.getpid():
+        return _executor
+
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=config.JOB_WORKERS, thread_name_prefix="job-worker")
+            _executor_pid = os.getpid()
+            logger.info(f"Job executor started (pid={_executor_pid}, workers={config.JOB_WORKERS})")
+
+    return _executor
+
+
+def _run_job(job_id: str, func: Callable[[], Dict[str, Any]]):
+    """ジョブを実行して結果を保存"""
+    try:
+        update_job(job_id, 'running', config.JOB_RESULT_TTL)
+        result = func()
+        update_job(job_id, 'done', config.JOB_RESULT_TTL, result=result)
+        logger.info(f"Job done: {job_id}")
+    except Exception as e:
+        logger.error(f"Job failed: {job_id}: {e}", exc_info=True)
+        try:
+            update_job(job_id, 'error', config.JOB_RESULT_TTL, error=str(e))
+        except Exception as save_error:
+            logger.error(f"Failed to save job error: {job_id}: {save_error}")
+    finally:
+        _release()
+
+
+def _release():
+    """実行待ち+実行中のカウントを1つ減らす"""
+    global _pending
+    with _lock:
+        _pending = max(0, _pending - 1)
@@ -3,50 +3,176 @@ LLMサービス - OpenAI API呼び出しとリトライ処理
 宮崎大学医学部英作文特訓システム（100字指定）- 和文英訳対応
 """
 import os
+import re
 import json
 import logging
 import time
-from pathlib import Path
-from typing import Optional, Dict, Any, List
-from openai import OpenAI
+import threading
+from typing import Optional, Dict, Any, List, TYPE_CHECKING
+from functools import lru_cache
 from pydantic import ValidationError
 from models import QuestionResponse, CorrectionResponse, SubmissionRequest, TargetWords, ConstraintChecks
 from constraint_validator import validate_constraints as validate_constraints_func, normalize_punctuation
 from points_normalizer import normalize_points, normalize_user_input, split_into_sentences
 import config
+import correction_cache
+import debug_capture
+import metrics
+from logging_utils import LazyPreview, log_payload
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# ===== llm_service 内のプロンプト =====
+# correction_cache のプロンプト版にも含める（変更するとキャッシュが無効になる）
+
+# 問題生成などで使うシステムメッセージ
+SYSTEM_MESSAGE = "あなたは日本の大学入試英作文の専門家です。必ずJSON形式のみで回答してください。"
+
+# 模範解答・添削・再プロンプト（is_model_answer=True）で使うシステムメッセージ
+MODEL_ANSWER_SYSTEM_MESSAGE = """あなたは日本の大学入試英作文の専門家です。
+
+【🚨最重要指示🚨】
+模範解答を生成する際は、必ず以下を守ってください：
+1. 英文の語数を100-120語にすること（日本語訳は語数に含めない）
+2. 語数が不足する場合は、必ず文を追加して100語以上にすること
+3. 具体例を2つ以上含めること
+4. 高校3年生が実際に書ける基本的な表現のみ使うこと
+
+【語数確保の方法】
+- First理由: 6-7文、45-55語
+- Second理由: 6-7文、45-55語
+- 結論: 3-4文、30-40語
+- 合計: 必ず100-120語
+
+必ずJSON形式のみで回答してください。"""
+
+# 添削ポイント不足時の再プロンプト（str.format で埋める）
+REPROMPT_TEMPLATE = """
+🚨🚨🚨 重要：不足分{current_shortage}個の解説を必ず生成してください 🚨🚨🚨
+
+現在{current_count}個の解説がありますが、{required_points}個必要です。
+
+【既存の解説のbeforeリスト（絶対に重複禁止）】
+{existing_befores_str}
+
+【学生の英文（必ず参照）】
+{normalized_answer}
+
+【日本語原文】
+{question_text}
+
+【模範解答】
+{corrected}
+
+【絶対厳守事項】
+1. 必ず{current_shortage}個の新しい解説を出力すること
+2. beforeは既存の解説と絶対に重複させないこと
+3. 【重要】beforeは必ず「学生英文の完全な1文」であること（句・節だけは絶対禁止）
+   - 例（NG）: "were divide into"
+   - 例（OK）: "In the study, the participants were divide into three different groups."
+4. 【重要】levelは必ず「✅ 正しい表現」または「❌ 文法ミス」のみ（💡改善提案は廃止）
+5. ✅ 正しい表現の場合、afterはbeforeと完全に同一にすること
+6. 未提出の文がある場合のみ "(未提出：原文第N文)" を許可
+7. reasonは短く（1〜2文）、例文は不要
+
+【出力形式（必須）- JSON形式で必ず{current_shortage}個】
+```json
+{{
+  "points": [
+    {{
+      "before": "学生英文の完全な1文（全文）",
+      "after": "修正後の完全な1文（❌の場合）OR beforeと同一（✅の場合）",
+      "reason": "簡潔な説明（1〜2文）",
+      "level": "✅ 正しい表現 OR ❌ 文法ミス"
+    }}
+  ]
+}}
+```
+
+🚨 {current_shortage}個のpointsを返してください 🚨
+"""
+
+# ===== プロンプトテンプレート（遅延読み込み） =====
+# プロンプトモジュールは大きな文字列定数の集まりで、/health などの軽いリクエストには不要なため
+# 初回使用時に読み込む（gunicorn では when_ready フックでマスターに読み込み、ワーカーと共有する）
+
+@lru_cache(maxsize=None)
+def get_prompts() -> Dict[str, str]:
+    """統合されたプロンプト辞書を取得（初回呼び出し時にプロンプトモジュールを読み込む）"""
+    # 添削プロンプトは Respect First 版を使用
+    from prompts_correction_respect import PROMPTS as CORRECTION_PROMPTS
+    # 問題生成・模範解答は元のプロンプトを使用
+    from prompts_translation import (
+        QUESTION_PROMPT_MIYAZAKI_TRANSLATION,
+        MODEL_ANSWER_PROMPT_MIYAZAKI_TRANSLATION
+    )
+    # 問題ジャンル定義（問題生成用）も合わせて読み込んでおく
+    import prompts_translation_simple  # noqa: F401
+
+    return {
+        'question': QUESTION_PROMPT_MIYAZAKI_TRANSLATION,
+        'correction': CORRECTION_PROMPTS['correction'],
+        'model_answer': MODEL_ANSWER_PROMPT_MIYAZAKI_TRANSLATION
+    }
 
-# 添削プロンプトは Respect First 版を使用
-from prompts_correction_respect import (
-    PROMPTS as CORRECTION_PROMPTS,
-    get_correction_prompt
-)
-
-# 問題ジャンル定義とサンプル（問題生成用）
-from prompts_translation_simple import (
-    TRANSLATION_GENRES,
-    PAST_QUESTIONS_REFERENCE
-)
-
-# 問題生成・模範解答は元のプロンプトを使用
-from prompts_translation import (
-    QUESTION_PROMPT_MIYAZAKI_TRANSLATION,
-    MODEL_ANSWER_PROMPT_MIYAZAKI_TRANSLATION
-)
-
-# 統合されたプロンプト辞書を作成
-PROMPTS = {
-    'question': QUESTION_PROMPT_MIYAZAKI_TRANSLATION,
-    'correction': CORRECTION_PROMPTS['correction'],
-    'model_answer': MODEL_ANSWER_PROMPT_MIYAZAKI_TRANSLATION
-}
 
 logger = logging.getLogger(__name__)
 
-# OpenAI クライアント
-client = OpenAI(
-    api_key=config.OPENAI_API_KEY,
-    timeout=config.OPENAI_TIMEOUT
-)
+# OpenAI クライアント（プロセスごとに1つ）
+# 内部の httpx コネクションプールはスレッドセーフなので、gthread/gevent ワーカーの
+# 全スレッドで1つのクライアントを共有する（リクエストごとに作らない）。
+# preload_app=True の gunicorn マスターで作ると fork 後の全ワーカーがプールを
+# 引き継いでしまうため、初回使用時（または post_worker_init フック）に作成する。
+_client: Optional["OpenAI"] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> "OpenAI":
+    """このプロセス用の OpenAI クライアントを取得（fork 後の子プロセスでは作り直す）"""
+    global _client, _client_pid
+
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            # openai パッケージの import 自体が重いため、初回作成時に読み込む
+            from openai import OpenAI
+            _client = OpenAI(
+                api_key=config.OPENAI_API_KEY,
+                timeout=config.OPENAI_TIMEOUT
+            )
+            _client_pid = os.getpid()
+            logger.info(f"OpenAI client created (pid={_client_pid})")
+
+    return _client
+
+
+def preload_client_modules():
+    """
+    クライアント生成時に遅延 import されるモジュール（httpx・SSL 関連など）を読み込んでおく
+    
+    gunicorn マスターで呼ぶと、これらのモジュールが fork 後に copy-on-write で共有され、
+    ワーカーごとにクライアントを作ってもメモリが増えにくい。
+    作成したクライアントは通信に使わずにすぐ閉じる（コネクションは1本も開かない）。
+    """
+    from openai import OpenAI
+    OpenAI(api_key=config.OPENAI_API_KEY or "preload", timeout=config.OPENAI_TIMEOUT).close()
+
+
+def reset_client():
+    """
+    クライアントを破棄（gunicorn の post_fork フックから呼ぶ）
+    
+    マスターから引き継いだクライアントは close しない（ソケットを親と共有しているため）。
+    参照を外すだけにして、次の get_client() で新しいプールを作る。
+    """
+    global _client, _client_pid
+    with _client_lock:
+        _client = None
+        _client_pid = None
 
 
 # ===== プロンプトテンプレート（モード別） =====
@@ -914,7 +1040,7 @@ promote（動詞：促進する・奨励する：発展や普及を支援する
 
 
 # ===== （このセクションは削除 - prompts_correction_respect.py で定義済み） =====
-# PROMPTS 辞書は prompts_correction_respect.py からインポートされています
+# プロンプト辞書は get_prompts() で prompts_correction_respect.py などから遅延読み込みされます
 
 
 # ===== ユーティリティ関数 =====
@@ -1018,57 +1144,60 @@ def clean_json_response(response: str) -> str:
     return response
 
 
-def call_openai_with_retry(prompt: str, max_retries: int = 3, is_model_answer: bool = False) -> str:
-    """OpenAI APIをリトライ付きで呼び出し"""
+def call_openai_with_retry(
+    prompt: str,
+    max_retries: int = 3,
+    is_model_answer: bool = False,
+    call_type: str = "other",
+    temperature: float = 0.7
+) -> str:
+    """
+    OpenAI APIをリトライ付きで呼び出し
+    
+    Args:
+        call_type: メトリクスの呼び出し種別（question / correction / reprompt / model_answer）
+        temperature: 生成の温度（再プロンプトでは上げる）
+    """
     
     # モデル解答生成時は特別なシステムメッセージを使用
-    if is_model_answer:
-        system_message = """あなたは日本の大学入試英作文の専門家です。
-
-【🚨最重要指示🚨】
-模範解答を生成する際は、必ず以下を守ってください：
-1. 英文の語数を100-120語にすること（日本語訳は語数に含めない）
-2. 語数が不足する場合は、必ず文を追加して100語以上にすること
-3. 具体例を2つ以上含めること
-4. 高校3年生が実際に書ける基本的な表現のみ使うこと
-
-【語数確保の方法】
-- First理由: 6-7文、45-55語
-- Second理由: 6-7文、45-55語
-- 結論: 3-4文、30-40語
-- 合計: 必ず100-120語
-
-必ずJSON形式のみで回答してください。"""
-    else:
-        system_message = "あなたは日本の大学入試英作文の専門家です。必ずJSON形式のみで回答してください。"
+    system_message = MODEL_ANSWER_SYSTEM_MESSAGE if is_model_answer else SYSTEM_MESSAGE
     
     for attempt in range(max_retries):
+        start = time.perf_counter()
         try:
-            response = client.chat.completions.create(
+            response = get_client().chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": prompt}
                 ],
                 response_format={"type": "json_object"},  # JSONモードを有効化
-                temperature=0.7,
+                temperature=temperature,
                 max_tokens=3500,  # model_answer_explanation対応のため3500に増加
                 timeout=180.0  # タイムアウトを180秒に延長（OpenAI API応答待機）
             )
             
             content = response.choices[0].message.content
-            logger.info(f"OpenAI API response (attempt {attempt + 1}): {content[:200]}...")
+            metrics.observe("llm_request_duration_seconds", time.perf_counter() - start, call_type=call_type)
+            metrics.inc("llm_requests_total", call_type=call_type, result="ok")
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                metrics.inc("llm_tokens_total", usage.prompt_tokens or 0, call_type=call_type, kind="prompt")
+                metrics.inc("llm_tokens_total", usage.completion_tokens or 0, call_type=call_type, kind="completion")
+            logger.info("OpenAI API response (attempt %d): %d chars", attempt + 1, len(content))
+            logger.debug("OpenAI API response preview: %s", LazyPreview(content, 200))
             
-            # 🔍 デバッグ：完全なLLM応答をログ出力（添削の場合）
-            if not is_model_answer:
-                logger.info(f"[DEBUG] Full LLM response for correction:\n{content}")
+            # 🔍 デバッグ：完全なLLM応答（DEBUGレベルかつサンプリング当選時のみ）
+            log_payload(logger, "Full LLM response", content)
             
             return content
             
         except Exception as e:
             logger.error(f"OpenAI API error (attempt {attempt + 1}): {e}")
+            metrics.inc("llm_requests_total", call_type=call_type, result="error")
             if attempt == max_retries - 1:
                 raise
+            metrics.inc("llm_retries_total", call_type=call_type)
     
     raise Exception("Failed to get response from OpenAI after retries")
 
@@ -1250,14 +1379,22 @@ def enforce_excerpt_type_diversity(recent_types: List[str]) -> str:
     )[0]
 
 
-def generate_question(difficulty: str = "intermediate", excluded_themes: List[str] = None) -> QuestionResponse:
+def generate_question(
+    difficulty: str = "intermediate",
+    excluded_themes: List[str] = None,
+    user_id: Optional[str] = None
+) -> QuestionResponse:
     """
     翻訳問題を生成（リトライ付き）
     
     Args:
         difficulty: 難易度（翻訳問題では無視される）
         excluded_themes: 除外するジャンル（7ジャンル固定語）のリスト
+        user_id: 出題する利用者（直近の出題の偏り判定をその利用者の履歴で行う、None なら全体）
     """
+    # 問題ジャンル定義とサンプル（問題生成用）
+    from prompts_translation_simple import TRANSLATION_GENRES, PAST_QUESTIONS_REFERENCE
+    
     if excluded_themes is None:
         excluded_themes = []
     
@@ -1265,10 +1402,10 @@ def generate_question(difficulty: str = "intermediate", excluded_themes: List[st
     
     # 🎲 直近のtheme（ジャンル）をチェックし、偏りを防ぐ
     from database import get_recent_themes, get_recent_subtopics
-    recent_themes = get_recent_themes(30)
+    recent_themes = get_recent_themes(30, user_id=user_id)
     
     # 🔍 直近のサブトピック（A-H）を取得
-    recent_subtopics = get_recent_subtopics(10)
+    recent_subtopics = get_recent_subtopics(10, user_id=user_id)
     logger.info(f"📊 直近10問のサブトピック: {recent_subtopics}")
     
     # 現在のジャンルの直近トピックをフィルタリング
@@ -1284,7 +1421,7 @@ def generate_question(difficulty: str = "intermediate", excluded_themes: List[st
     
     # 🎲 直近のexcerpt_typeをチェックし、偏りを防ぐ
     from database import get_recent_excerpt_types
-    recent_types = get_recent_excerpt_types(10)
+    recent_types = get_recent_excerpt_types(10, user_id=user_id)
     
     # 🚀 システムレベルで強制的に多様性を確保
     forced_type = enforce_excerpt_type_diversity(recent_types)
@@ -1358,7 +1495,7 @@ def generate_question(difficulty: str = "intermediate", excluded_themes: List[st
     avoid_instructions += "\n🚨 この指示に従わない場合、システムは問題を却下します 🚨\n"
     
     # プロンプトを取得（翻訳用）
-    prompt_template = PROMPTS['question']
+    prompt_template = get_prompts()['question']
     
     prompt = prompt_template.format(
         excluded_themes=", ".join(excluded_themes) if excluded_themes else "なし",
@@ -1370,6 +1507,8 @@ def generate_question(difficulty: str = "intermediate", excluded_themes: List[st
     
     max_retries = 3
     retry_reason = []
+    # 指定と違うジャンル・抜粋タイプで却下したが、既出でなく出題はできる問題（フォールバック用）
+    candidate = None
     
     for attempt in range(max_retries):
         try:
@@ -1389,16 +1528,18 @@ def generate_question(difficulty: str = "intermediate", excluded_themes: List[st
                     retry_instructions += "- excerpt_type フィールドが必須です（P1_ONLY/P2_P3/P3_ONLY/P4_P5から選択）\n"
                 if 'too_many_paragraphs' in retry_reason:
                     retry_instructions += "- 段落数が多すぎます（1〜3段落にしてください）\n"
+                if 'near_duplicate' in retry_reason:
+                    retry_instructions += "- 本文が既出の問題とほぼ同じです。題材・場面・具体例を変えて新しい本文を書いてください\n"
                 
                 current_prompt += retry_instructions
                 logger.info(f"リトライ {attempt + 1}: 修正指示を追加")
             
             # OpenAI APIを呼び出し
-            response = call_openai_with_retry(current_prompt)
+            response = call_openai_with_retry(current_prompt, call_type="question")
             
             # JSONをクリーンアップ
             cleaned = clean_json_response(response)
-            logger.info(f"Cleaned JSON (attempt {attempt + 1}): {cleaned[:300]}...")
+            logger.debug("Cleaned JSON (attempt %d): %s", attempt + 1, LazyPreview(cleaned, 300))
             
             # JSONをパース
             data = json.loads(cleaned)
@@ -1406,6 +1547,12 @@ def generate_question(difficulty: str = "intermediate", excluded_themes: List[st
             # Pydanticでバリデーション（ここでValueErrorが発生する可能性）
             question = QuestionResponse(**data)
             
+            # 既出の問題（生成・一括登録とも）と本文がほぼ同じか（却下は下の順序で判定する）
+            from database import find_near_duplicate_questions
+            duplicates = find_near_duplicate_questions(question.japanese_paragraphs or question.japanese_sentences)
+            if not duplicates and question.theme in TRANSLATION_GENRES and question.theme not in excluded_themes:
+                candidate = question
+            
             # 🚨 強制されたタイプと一致するか検証
             if question.excerpt_type != forced_type:
                 logger.error(f"❌ excerpt_type不一致: 期待={forced_type}, 実際={question.excerpt_type}")
@@ -1425,11 +1572,17 @@ def generate_question(difficulty: str = "intermediate", excluded_themes: List[st
                 logger.warning(f"Invalid theme: {question.theme}, using fallback")
                 raise ValidationError(f"Theme must be one of: {TRANSLATION_GENRES}")
             
+            # 🚨 既出の問題（生成・一括登録とも）と本文がほぼ同じなら却下
+            if duplicates:
+                logger.warning(f"❌ 近似重複: 既出の問題との類似度 {duplicates[0][1]:.2f}")
+                raise ValueError(f"既出の問題と本文がほぼ同じです（類似度 {duplicates[0][1]:.2f}）。生成された問題は却下されます。")
+            
             logger.info(f"Successfully generated question: {question.theme}, excerpt_type: {question.excerpt_type}")
             return question
             
         except (json.JSONDecodeError, ValidationError, ValueError) as e:
             logger.warning(f"Question generation failed (attempt {attempt + 1}/{max_retries}): {e}")
+            metrics.inc("llm_parse_failures_total", call_type="question", error=type(e).__name__)
             
             # 次回リトライのための理由を記録
             retry_reason = []
@@ -1453,12 +1606,42 @@ def generate_question(difficulty: str = "intermediate", excluded_themes: List[st
                 retry_reason.append('missing_excerpt_type')
             if '1〜3個である必要' in error_msg:
                 retry_reason.append('too_many_paragraphs')
+            if '既出の問題と本文がほぼ同じ' in error_msg:
+                retry_reason.append('near_duplicate')
             
             if attempt == max_retries - 1:
                 # 最後のリトライでも失敗したらフォールバック
                 logger.error("All retries failed, returning fallback question")
-                return _get_fallback_question()
+                break
+    
+    return _fallback_question(candidate, excluded_themes, user_id)
+
+
+def _fallback_question(
+    candidate: Optional[QuestionResponse],
+    excluded_themes: List[str],
+    user_id: Optional[str]
+) -> QuestionResponse:
+    """
+    生成がすべて失敗したときの問題
     
+    固定の問題は一度出題すると以後は近似重複になるため、
+    1. 問題バンクのこの利用者に未出題の問題
+    2. 指定と違うジャンル・抜粋タイプで却下したが、既出でない生成済みの問題
+    3. 固定の問題
+    の順に使う。
+    """
+    if config.QUESTION_BANK_ENABLED:
+        import question_bank
+        question = question_bank.pick_any_question(user_id, excluded_themes=excluded_themes)
+        if question is not None:
+            metrics.inc("llm_fallbacks_total", kind="question_bank")
+            return question
+    if candidate is not None:
+        logger.warning(f"Serving rejected but unseen question: {candidate.theme}, excerpt_type: {candidate.excerpt_type}")
+        metrics.inc("llm_fallbacks_total", kind="question_candidate")
+        return candidate
+    metrics.inc("llm_fallbacks_total", kind="question")
     return _get_fallback_question()
 
 
@@ -1551,6 +1734,102 @@ def determine_required_points(question_text: str, user_answer: str) -> int:
 
 # ===== 添削サービス =====
 
+def _correction_from_cache(
+    cached: Dict[str, Any],
+    constraints: ConstraintChecks,
+    normalized_answer: str,
+    user_answer: str
+) -> CorrectionResponse:
+    """
+    キャッシュ済みの添削結果から、今回の提出用の CorrectionResponse を作る
+    
+    キャッシュは正規化後の回答で一致させているため、正規化前の入力に依存する
+    original_before（フロントエンド表示用）と制約チェックは今回の提出から取り直す
+    """
+    cached['constraint_checks'] = constraints.model_dump()
+    
+    student_sentences = split_into_sentences(normalized_answer)
+    original_sentences = split_into_sentences(user_answer)
+    for point in cached.get('points', []):
+        before = point.get('before')
+        if before in student_sentences:
+            index = student_sentences.index(before)
+            if index < len(original_sentences):
+                point['original_before'] = original_sentences[index]
+    
+    correction = CorrectionResponse(**cached)
+    logger.info(f"✅ Correction served from cache: {len(correction.points)} points")
+    return correction
+
+
+def _build_constraints(normalized_answer: str, word_count: int) -> ConstraintChecks:
+    """制約チェック（翻訳問題用）"""
+    return ConstraintChecks(
+        word_count=word_count,
+        within_word_range=10 <= word_count <= 160,
+        required_units=0,
+        detected_units=0,
+        has_required_units=True,
+        unit_detection_confidence="high",
+        markers_found=[],
+        because_count=0,
+        sentence_count=len([s for s in normalized_answer.split('.') if s.strip()]),
+        notes=[f"語数: {word_count}語（10-160語が推奨範囲）"],
+        suggestions=[]
+    )
+
+
+def _filter_valid_points(points: List[Dict[str, Any]], normalized_answer: str) -> List[Dict[str, Any]]:
+    """
+    LLMが返した points から使えるものを選び、必須フィールドを補完する
+    
+    【重要】バリデーションは緩めにして、正規化処理（normalize_points）で全文化する
+    - before が空・学生英文に含まれない・重複しているものは除く
+    - after / reason / level がなければ補う
+    """
+    valid_points = []
+    seen_befores = set()  # 重複排除用
+    
+    for i, point in enumerate(points):
+        # beforeが空またはない場合はスキップ
+        if 'before' not in point or not point.get('before', '').strip():
+            logger.warning(f"Skipping point {i+1} with empty 'before' field")
+            continue
+        
+        before_text = point['before'].strip()
+        
+        # 🚨重要：バリデーションは最小限に（正規化処理で全文化するため）
+        # プレースホルダのみチェック、それ以外は後で正規化
+        if before_text.startswith("(未提出："):
+            # プレースホルダはそのまま通す
+            pass
+        else:
+            # 断片でも通す（正規化処理で全文に拡張される）
+            # 最低限、学生英文に部分一致するかだけチェック
+            if before_text not in normalized_answer and not any(before_text.lower() in sentence.lower() for sentence in normalized_answer.split('.')):
+                # 完全一致も部分一致もしない場合のみスキップ
+                logger.warning(f"Skipping point {i+1}: before '{before_text[:50]}' not found in student answer")
+                continue
+        
+        # 重複排除: 同じ before の組み合わせは1つだけ採用（after は正規化前なので比較しない）
+        if before_text in seen_befores:
+            logger.warning(f"Skipping duplicate point {i+1}: {before_text[:50]}")
+            continue
+        seen_befores.add(before_text)
+            
+        if 'after' not in point or not point.get('after', '').strip():
+            point['after'] = point['before']
+        if 'reason' not in point:
+            point['reason'] = "指摘理由"
+        if 'level' not in point:
+            # 💡改善提案をデフォルトにしない（正規化で✅に変換される）
+            point['level'] = "✅ 正しい表現"
+            
+        valid_points.append(point)
+    
+    return valid_points
+
+
 def correct_answer(submission: SubmissionRequest) -> CorrectionResponse:
     """
     和文英訳を添削（miyazaki翻訳形式専用）
@@ -1560,7 +1839,7 @@ def correct_answer(submission: SubmissionRequest) -> CorrectionResponse:
     """
     # ステップ1: ユーザー入力の全角記号を半角に正規化
     normalized_answer = normalize_punctuation(submission.user_answer)
-    logger.info(f"Step 1 - Punctuation normalized (first 100 chars): {normalized_answer[:100]}...")
+    logger.debug("Step 1 - Punctuation normalized: %s", LazyPreview(normalized_answer))
     
     # 問題文を取得（優先順位: japanese_paragraphs > japanese_sentences > question_text）
     if submission.japanese_paragraphs:
@@ -1574,11 +1853,11 @@ def correct_answer(submission: SubmissionRequest) -> CorrectionResponse:
     # マルチセンテンスモード（japanese_sentencesが存在）の場合は改行を保持
     is_multi_sentence = bool(submission.japanese_sentences)
     normalized_answer = normalize_user_input(normalized_answer, preserve_newlines=is_multi_sentence)
-    logger.info(f"Step 2 - User input normalized (first 100 chars): {normalized_answer[:100]}...")
+    logger.debug("Step 2 - User input normalized: %s", LazyPreview(normalized_answer))
     if is_multi_sentence:
         logger.info(f"Multi-sentence mode: preserving newlines in user input")
     
-    logger.info(f"Question text for correction: {question_text[:200]}...")
+    logger.debug("Question text for correction: %s", LazyPreview(question_text, 200))
     
     # required_points を決定
     required_points = determine_required_points(question_text, normalized_answer)
@@ -1589,51 +1868,48 @@ def correct_answer(submission: SubmissionRequest) -> CorrectionResponse:
     logger.info(f"Word count: {word_count}")
     
     # 制約チェック（翻訳問題用）
-    constraints = ConstraintChecks(
-        word_count=word_count,
-        within_word_range=10 <= word_count <= 160,
-        required_units=0,
-        detected_units=0,
-        has_required_units=True,
-        unit_detection_confidence="high",
-        markers_found=[],
-        because_count=0,
-        sentence_count=len([s for s in normalized_answer.split('.') if s.strip()]),
-        notes=[f"語数: {word_count}語（10-160語が推奨範囲）"],
-        suggestions=[]
-    )
+    constraints = _build_constraints(normalized_answer, word_count)
+    
+    # 完全一致キャッシュ：同じ原文に対して正規化後に同一の回答なら、LLMを呼ばずに返す
+    cached = correction_cache.lookup(question_text, normalized_answer, word_count)
+    if cached is not None:
+        return _correction_from_cache(cached, constraints, normalized_answer, submission.user_answer)
     
     # 添削プロンプトを生成（Respect First版）
-    correction_prompt = get_correction_prompt(
-        question_text=question_text,
-        user_answer=normalized_answer,
-        word_count=word_count
-    )
+    from prompts_correction_respect import get_correction_prompt
+    with metrics.span("llm.prompt_build"):
+        correction_prompt = get_correction_prompt(
+            question_text=question_text,
+            user_answer=normalized_answer,
+            word_count=word_count
+        )
+    
+    # デバッグ保存の対象か（リクエスト単位でサンプリング、全試行を同じIDで保存）
+    capture_id = debug_capture.new_capture_id() if debug_capture.should_capture() else None
     
     # LLM呼び出し（リトライ付き）
     max_retries = 3
     for attempt in range(max_retries):
         try:
             logger.info(f"Correction attempt {attempt + 1}/{max_retries}")
-            response = call_openai_with_retry(correction_prompt, is_model_answer=True)
+            response = call_openai_with_retry(correction_prompt, is_model_answer=True, call_type="correction")
             
             # デバッグ：完全なレスポンスをログに出力
-            logger.info(f"Full LLM response for correction (length: {len(response)} chars)")
-            logger.info(f"Response first 500 chars: {response[:500]}")
-            logger.info(f"Response last 500 chars: {response[-500:]}")
+            logger.info("LLM response for correction: %d chars", len(response))
             
-            # デバッグ：完全なレスポンスをファイルに保存
-            debug_dir = Path(__file__).parent / "debug"
-            debug_dir.mkdir(exist_ok=True)
-            debug_file = debug_dir / f"llm_response_{attempt+1}.json"
-            with open(debug_file, 'w', encoding='utf-8') as f:
-                f.write(response)
-            logger.info(f"Full response saved to: {debug_file}")
+            # デバッグ：サンプリングされたリクエストのみ、非同期でアーカイブに保存
+            if capture_id:
+                debug_capture.capture_llm_response(
+                    capture_id, attempt + 1, response,
+                    request=submission.model_dump(exclude_none=True) if attempt == 0 else None
+                )
             
-            cleaned = clean_json_response(response)
+            with metrics.span("llm.clean_json"):
+                cleaned = clean_json_response(response)
             
             # JSONパース
-            correction_data = json.loads(cleaned)
+            with metrics.span("llm.json_parse"):
+                correction_data = json.loads(cleaned)
             
             # 必須フィールドの確認と補完
             if 'original' not in correction_data:
@@ -1648,47 +1924,9 @@ def correct_answer(submission: SubmissionRequest) -> CorrectionResponse:
                 correction_data['points'] = []
                 logger.warning("No points returned by LLM, initializing empty list")
             
-            # pointsの各要素に必須フィールドを補完
-            # 【重要】バリデーションは緩めにして、正規化処理で全文化する
-            valid_points = []
-            seen_befores = set()  # 重複排除用
-            
-            for i, point in enumerate(correction_data.get('points', [])):
-                # beforeが空またはない場合はスキップ
-                if 'before' not in point or not point.get('before', '').strip():
-                    logger.warning(f"Skipping point {i+1} with empty 'before' field")
-                    continue
-                
-                before_text = point['before'].strip()
-                
-                # 🚨重要：バリデーションは最小限に（正規化処理で全文化するため）
-                # プレースホルダのみチェック、それ以外は後で正規化
-                if before_text.startswith("(未提出："):
-                    # プレースホルダはそのまま通す
-                    pass
-                else:
-                    # 断片でも通す（正規化処理で全文に拡張される）
-                    # 最低限、学生英文に部分一致するかだけチェック
-                    if before_text not in normalized_answer and not any(before_text.lower() in sentence.lower() for sentence in normalized_answer.split('.')):
-                        # 完全一致も部分一致もしない場合のみスキップ
-                        logger.warning(f"Skipping point {i+1}: before '{before_text[:50]}' not found in student answer")
-                        continue
-                
-                # 重複排除: 同じ before の組み合わせは1つだけ採用（after は正規化前なので比較しない）
-                if before_text in seen_befores:
-                    logger.warning(f"Skipping duplicate point {i+1}: {before_text[:50]}")
-                    continue
-                seen_befores.add(before_text)
-                    
-                if 'after' not in point or not point.get('after', '').strip():
-                    point['after'] = point['before']
-                if 'reason' not in point:
-                    point['reason'] = "指摘理由"
-                if 'level' not in point:
-                    # 💡改善提案をデフォルトにしない（正規化で✅に変換される）
-                    point['level'] = "✅ 正しい表現"
-                    
-                valid_points.append(point)
+            # pointsの各要素に必須フィールドを補完（バリデーションは緩め、正規化処理で全文化する）
+            with metrics.span("llm.validate_points"):
+                valid_points = _filter_valid_points(correction_data.get('points', []), normalized_answer)
             
             # ===== 【最重要】points の正規化処理 =====
             # 1. before/after を全文に拡張
@@ -1725,8 +1963,10 @@ def correct_answer(submission: SubmissionRequest) -> CorrectionResponse:
                 logger.warning(f"Points shortage detected: need {shortage} more points")
                 
                 # ステップ1: 再プロンプトで追加生成を試みる（最優先・コピー禁止）
+                # REPROMPT_ENABLED でなければ LLM を追加で呼ばず、ステップ2の補足ポイントで埋める
                 reprompt_success = False
-                for reprompt_attempt in range(2):  # 最大2回試行
+                max_reprompts = 2 if config.REPROMPT_ENABLED else 0
+                for reprompt_attempt in range(max_reprompts):  # 最大2回試行
                     try:
                         current_shortage = required_points - len([p for p in valid_points if p.get('level') != '内容評価'])
                         if current_shortage <= 0:
@@ -1741,52 +1981,20 @@ def correct_answer(submission: SubmissionRequest) -> CorrectionResponse:
                         
                         temperature = 0.7 if reprompt_attempt == 0 else 0.9
                         
-                        reprompt = f"""
-🚨🚨🚨 重要：不足分{current_shortage}個の解説を必ず生成してください 🚨🚨🚨
-
-現在{len([p for p in valid_points if p.get('level') != '内容評価'])}個の解説がありますが、{required_points}個必要です。
-
-【既存の解説のbeforeリスト（絶対に重複禁止）】
-{existing_befores_str}
-
-【学生の英文（必ず参照）】
-{normalized_answer}
-
-【日本語原文】
-{question_text}
-
-【模範解答】
-{correction_data.get('corrected', '')}
-
-【絶対厳守事項】
-1. 必ず{current_shortage}個の新しい解説を出力すること
-2. beforeは既存の解説と絶対に重複させないこと
-3. 【重要】beforeは必ず「学生英文の完全な1文」であること（句・節だけは絶対禁止）
-   - 例（NG）: "were divide into"
-   - 例（OK）: "In the study, the participants were divide into three different groups."
-4. 【重要】levelは必ず「✅ 正しい表現」または「❌ 文法ミス」のみ（💡改善提案は廃止）
-5. ✅ 正しい表現の場合、afterはbeforeと完全に同一にすること
-6. 未提出の文がある場合のみ "(未提出：原文第N文)" を許可
-7. reasonは短く（1〜2文）、例文は不要
-
-【出力形式（必須）- JSON形式で必ず{current_shortage}個】
-```json
-{{
-  "points": [
-    {{
-      "before": "学生英文の完全な1文（全文）",
-      "after": "修正後の完全な1文（❌の場合）OR beforeと同一（✅の場合）",
-      "reason": "簡潔な説明（1〜2文）",
-      "level": "✅ 正しい表現 OR ❌ 文法ミス"
-    }}
-  ]
-}}
-```
-
-🚨 {current_shortage}個のpointsを返してください 🚨
-"""
+                        reprompt = REPROMPT_TEMPLATE.format(
+                            current_shortage=current_shortage,
+                            current_count=len([p for p in valid_points if p.get('level') != '内容評価']),
+                            required_points=required_points,
+                            existing_befores_str=existing_befores_str,
+                            normalized_answer=normalized_answer,
+                            question_text=question_text,
+                            corrected=correction_data.get('corrected', '')
+                        )
                         
-                        additional_response = call_openai_with_retry(reprompt, is_model_answer=True, temperature=temperature)
+                        metrics.inc("llm_reprompts_total")
+                        additional_response = call_openai_with_retry(
+                            reprompt, is_model_answer=True, call_type="reprompt", temperature=temperature
+                        )
                         additional_cleaned = clean_json_response(additional_response)
                         additional_data = json.loads(additional_cleaned)
                         
@@ -1811,7 +2019,7 @@ def correct_answer(submission: SubmissionRequest) -> CorrectionResponse:
                                 valid_points.append(point)
                                 existing_befores.append(before)
                                 added_count += 1
-                                logger.info(f"Added point from reprompt: {before[:50]}...")
+                                logger.debug("Added point from reprompt: %s", LazyPreview(before, 50))
                                 
                                 # 目標達成チェック
                                 if len([p for p in valid_points if p.get('level') != '内容評価']) >= required_points:
@@ -1833,6 +2041,7 @@ def correct_answer(submission: SubmissionRequest) -> CorrectionResponse:
                 if final_non_eval < required_points:
                     final_shortage = required_points - final_non_eval
                     logger.warning(f"Step 3: Using quality-assured filler for remaining {final_shortage} shortage")
+                    metrics.inc("llm_fallbacks_total", final_shortage, kind="filler_point")
                     
                     # 日本語原文を文ごとに分割
                     jp_sentences = [s.strip() for s in question_text.split('。') if s.strip()]
@@ -1889,22 +2098,28 @@ appropriate（形容詞：適切な・ふさわしい）／suitable（形容詞
                     logger.info("✅ Model answer generated")
                 except Exception as e:
                     logger.error(f"Failed to generate model answer: {e}")
+                    metrics.inc("llm_fallbacks_total", kind="model_answer")
                     correction_data['model_answer'] = None
                     correction_data['model_answer_explanation'] = None
             
             # Pydanticモデルでバリデーション
-            correction = CorrectionResponse(**correction_data)
+            with metrics.span("llm.pydantic"):
+                correction = CorrectionResponse(**correction_data)
             logger.info(f"✅ Correction successful: {len(correction.points)} points")
+            correction_cache.store(question_text, normalized_answer, word_count, correction.model_dump())
+            correction_cache.store_model_answer(question_text, correction.model_answer, correction.model_answer_explanation)
             return correction
             
         except json.JSONDecodeError as e:
             logger.error(f"JSON parse error (attempt {attempt + 1}): {e}")
+            metrics.inc("llm_parse_failures_total", call_type="correction", error="JSONDecodeError")
             last_error = e
             if attempt < max_retries - 1:
                 time.sleep(2)
                 continue
         except ValueError as e:
             logger.error(f"Validation error (attempt {attempt + 1}): {e}")
+            metrics.inc("llm_parse_failures_total", call_type="correction", error=type(e).__name__)
             last_error = e
             if attempt < max_retries - 1:
                 time.sleep(2)
@@ -1918,6 +2133,7 @@ appropriate（形容詞：適切な・ふさわしい）／suitable（形容詞
     
     # すべてのリトライ失敗時のフォールバック
     logger.error(f"All {max_retries} attempts failed. Generating fallback response.")
+    metrics.inc("llm_fallbacks_total", kind="correction")
     fallback = _generate_fallback_correction(normalized_answer, question_text)
     fallback['constraint_checks'] = constraints.model_dump()
     fallback['word_count'] = word_count
@@ -1936,6 +2152,223 @@ appropriate（形容詞：適切な・ふさわしい）／suitable（形容詞
     return CorrectionResponse(**fallback)
 
 
+def _split_points_by_sentence(points: List[Dict[str, Any]], normalized_sentences: List[str]):
+    """
+    添削ポイントを、どの英文（複数文モードの1行）に対するものかで振り分ける
+    
+    Returns:
+        (文ごとのポイントのリスト, どの文にも対応しないポイントのリスト)
+    """
+    sentence_index = {}
+    for i, line in enumerate(normalized_sentences):
+        for sentence in split_into_sentences(line):
+            sentence_index.setdefault(sentence, i)
+    
+    grouped = [[] for _ in normalized_sentences]
+    unassigned = []
+    for point in points:
+        before = point.get('before') or ''
+        index = sentence_index.get(before)
+        if index is None:
+            index = next((i for i, line in enumerate(normalized_sentences) if before and before in line), None)
+        if index is None:
+            unassigned.append(point)
+        else:
+            grouped[index].append(point)
+    return grouped, unassigned
+
+
+def _cacheable_points(points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """提出ごとに変わる項目（文番号・正規化前の入力）を除いたポイント"""
+    return [
+        {k: v for k, v in point.items() if k not in ('sentence_no', 'original_before')}
+        for point in points
+    ]
+
+
+def _corrected_sentence(sentence: str, points: List[Dict[str, Any]]) -> str:
+    """1行分の修正版英文（❌のポイントがある文は after に置き換える）"""
+    parts = []
+    for student_sentence in split_into_sentences(sentence) or [sentence]:
+        fixed = next(
+            (p['after'] for p in points
+             if p.get('before') == student_sentence and (p.get('level') or '').startswith('❌')),
+            None
+        )
+        parts.append(fixed or student_sentence)
+    return ' '.join(parts)
+
+
+# 未提出の文のプレースホルダー（app.py で "(未提出：原文第N文)" に置換、正規化後は "(未提出: 原文第N文)."）
+_UNSUBMITTED_RE = re.compile(r'^\(未提出[：:]\s*原文第\d+文\)\.?$')
+
+
+def is_unsubmitted_sentence(sentence: str) -> bool:
+    """未提出の文のプレースホルダーか"""
+    return bool(_UNSUBMITTED_RE.match(sentence.strip()))
+
+
+def _model_answer_by_sentence(model: Dict[str, Any], count: int) -> List[Dict[str, Optional[str]]]:
+    """
+    模範解答を文ごとの {"english", "explanation"} に分ける
+    
+    generate_model_answer_only の構造化出力は、model_answer が1文ずつ空行区切り、
+    model_answer_explanation が "N文目: 英文" / "（日本語）" / 解説 の繰り返しになっている。
+    文数が合わない場合は english を None にする。
+    """
+    model_answer = model.get('model_answer') or ''
+    englishes = [s.strip() for s in model_answer.split('\n\n') if s.strip()]
+    if len(englishes) != count:
+        englishes = split_into_sentences(model_answer)
+    if len(englishes) != count:
+        englishes = [None] * count
+    
+    explanations = {}
+    for block in re.split(r'\n+(?=\d+文目:)', model.get('model_answer_explanation') or ''):
+        match = re.match(r'^(\d+)文目:[^\n]*\n+(?:（[^\n]*）\n+)?(.*)$', block.strip(), re.S)
+        if match:
+            explanations[int(match.group(1))] = match.group(2).strip()
+    
+    return [{'english': englishes[i], 'explanation': explanations.get(i + 1)} for i in range(count)]
+
+
+def _unsubmitted_point(sentence_no: int, placeholder: str, japanese: str, model_sentence: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """未提出の文に対する解説ポイント（模範解答から作る、LLMは呼ばない）"""
+    explanation = model_sentence['explanation'] or "模範解答を参考に、この文の英訳に取り組んでみましょう。"
+    return {
+        "japanese_sentence": japanese,
+        "before": placeholder,
+        "after": model_sentence['english'] or "(模範解答を参照してください)",
+        "reason": f"{sentence_no}文目: (未提出のため模範解答を掲載)\n（{japanese}）\n{explanation}",
+        "level": "✅ 補足解説",
+        "sentence_no": sentence_no
+    }
+
+
+def get_model_answer(question_text: str) -> dict:
+    """
+    模範解答を取得（原文ごとのキャッシュがなければ generate_model_answer_only で生成して保存）
+    
+    Returns:
+        dict: {"model_answer": str, "model_answer_explanation": str}
+    """
+    cached = correction_cache.lookup_model_answer(question_text)
+    if cached is not None:
+        logger.info("Model answer served from cache")
+        return cached
+    
+    result = generate_model_answer_only(question_text)
+    correction_cache.store_model_answer(
+        question_text, result.get('model_answer'), result.get('model_answer_explanation')
+    )
+    return result
+
+
+def correct_multi_sentences(submission: SubmissionRequest) -> CorrectionResponse:
+    """
+    複数文モードの添削（文単位キャッシュ + 変更された文だけ再添削）
+    
+    (日本語の文, 正規化後の英文) ごとに添削ポイントのキャッシュを引き、
+    - どの文もキャッシュにない：従来どおり correct_answer で全体を添削
+    - 一部の文がキャッシュにない：その文だけを correct_answer に送り、キャッシュ済みの文と結合
+    - すべての文がキャッシュにある：LLMを呼ばずに結合
+    新たに添削した文のポイントはキャッシュに保存する。
+    未提出の文（プレースホルダー）はLLMに送らず、模範解答から解説ポイントを作る。
+    
+    Args:
+        submission: 提出データ（japanese_sentences と、各文に対応する英文を改行で結合した user_answer）
+    """
+    japanese_sentences = submission.japanese_sentences or []
+    normalized_answer = normalize_user_input(normalize_punctuation(submission.user_answer), preserve_newlines=True)
+    normalized_sentences = normalized_answer.split('\n')
+    
+    # 英文内の改行などで文の対応が取れない場合は全体を添削
+    if len(normalized_sentences) != len(japanese_sentences):
+        logger.info(f"Sentence cache skipped: {len(japanese_sentences)} Japanese vs {len(normalized_sentences)} English lines")
+        return correct_answer(submission)
+    
+    unsubmitted = {i for i, sentence in enumerate(normalized_sentences) if is_unsubmitted_sentence(sentence)}
+    cached = correction_cache.lookup_sentences(japanese_sentences, normalized_sentences)
+    missing = [i for i, points in enumerate(cached) if points is None and i not in unsubmitted]
+    
+    if len(missing) == len(normalized_sentences):
+        correction = correct_answer(submission)
+        grouped, _ = _split_points_by_sentence([p.model_dump() for p in correction.points], normalized_sentences)
+        for i, points in enumerate(grouped):
+            correction_cache.store_sentence(japanese_sentences[i], normalized_sentences[i], _cacheable_points(points))
+        return correction
+    
+    # 変更された文（キャッシュにない文）だけを添削
+    fresh_points = {}
+    unassigned = []
+    if missing:
+        logger.info(f"Partial re-correction: {len(missing)}/{len(normalized_sentences)} sentences changed")
+        partial_sentences = [normalized_sentences[i] for i in missing]
+        partial = correct_answer(SubmissionRequest(
+            question_id=submission.question_id,
+            japanese_sentences=[japanese_sentences[i] for i in missing],
+            user_answer='\n'.join(partial_sentences),
+            target_words=submission.target_words
+        ))
+        grouped, unassigned = _split_points_by_sentence([p.model_dump() for p in partial.points], partial_sentences)
+        for k, i in enumerate(missing):
+            fresh_points[i] = _cacheable_points(grouped[k])
+            correction_cache.store_sentence(japanese_sentences[i], normalized_sentences[i], fresh_points[i])
+    else:
+        logger.info(f"No sentences sent to LLM ({len(unsubmitted)} unsubmitted, "
+                    f"{len(normalized_sentences) - len(unsubmitted)} from sentence cache)")
+    
+    # 模範解答は回答に依存しないため、原文ごとのキャッシュを使う
+    question_text = "\n".join(japanese_sentences)
+    try:
+        model = get_model_answer(question_text)
+    except Exception as e:
+        logger.error(f"Failed to generate model answer: {e}")
+        metrics.inc("llm_fallbacks_total", kind="model_answer")
+        model = {}
+    model_sentences = _model_answer_by_sentence(model, len(normalized_sentences))
+    
+    # キャッシュ済みの文・新たに添削した文・未提出の文を、文の順に結合
+    original_lines = [line.strip() for line in submission.user_answer.split('\n') if line.strip()]
+    points = []
+    corrected_lines = []
+    for i, sentence in enumerate(normalized_sentences):
+        if i in unsubmitted:
+            points.append(_unsubmitted_point(i + 1, sentence, japanese_sentences[i], model_sentences[i]))
+            corrected_lines.append(model_sentences[i]['english'] or sentence)
+            continue
+        
+        sentence_points = cached[i] if cached[i] is not None else fresh_points.get(i, [])
+        student_sentences = split_into_sentences(sentence)
+        original_sentences = split_into_sentences(original_lines[i]) if i < len(original_lines) else []
+        for point in sentence_points:
+            point['sentence_no'] = i + 1
+            point['japanese_sentence'] = japanese_sentences[i]
+            before = point.get('before')
+            if before in student_sentences and student_sentences.index(before) < len(original_sentences):
+                point['original_before'] = original_sentences[student_sentences.index(before)]
+            points.append(point)
+        corrected_lines.append(_corrected_sentence(sentence, sentence_points))
+    points.extend(unassigned)
+    
+    # 語数は提出された文のみで数える（プレースホルダーは数えない）
+    if submission.word_count is not None:
+        word_count = submission.word_count
+    else:
+        word_count = sum(len(s.split()) for i, s in enumerate(normalized_sentences) if i not in unsubmitted)
+    correction = CorrectionResponse(
+        original=normalized_answer,
+        corrected='\n'.join(corrected_lines),
+        word_count=word_count,
+        points=points,
+        constraint_checks=_build_constraints(normalized_answer, word_count),
+        model_answer=model.get('model_answer'),
+        model_answer_explanation=model.get('model_answer_explanation')
+    )
+    logger.info(f"✅ Multi-sentence correction merged: {len(points)} points ({len(missing)} sentences re-corrected)")
+    return correction
+
+
 def generate_model_answer_only(question_text: str) -> dict:
     """
     日本語原文から模範英訳を生成（翻訳用）- JSON構造化出力版
@@ -1948,14 +2381,14 @@ def generate_model_answer_only(question_text: str) -> dict:
     """
     from japanese_utils import split_japanese_sentences
     
-    prompt = PROMPTS['model_answer'].format(question_text=question_text)
+    prompt = get_prompts()['model_answer'].format(question_text=question_text)
     
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = call_openai_with_retry(prompt, is_model_answer=True)
+            response = call_openai_with_retry(prompt, is_model_answer=True, call_type="model_answer")
             cleaned = clean_json_response(response)
-            logger.info(f"Model answer JSON (attempt {attempt + 1}): {cleaned[:300]}...")
+            logger.debug("Model answer JSON (attempt %d): %s", attempt + 1, LazyPreview(cleaned, 300))
             
             data = json.loads(cleaned)
             
@@ -2000,7 +2433,7 @@ def generate_model_answer_only(question_text: str) -> dict:
                 }
                 
                 logger.info("[構造化出力] 構造化出力の変換完了")
-                logger.info(f"[構造化出力] model_answer: {result['model_answer'][:100]}...")
+                logger.debug("[構造化出力] model_answer: %s", LazyPreview(result['model_answer']))
                 
                 return result
             
@@ -2014,7 +2447,7 @@ def generate_model_answer_only(question_text: str) -> dict:
             
             # 🚨重要：日本語原文を直接追加（LLMの出力は信頼しない）
             japanese_sentences = split_japanese_sentences(question_text)
-            logger.info(f"Japanese sentences from original: {japanese_sentences}")
+            logger.debug("Japanese sentences from original: %s", japanese_sentences)
             
             # model_answer_explanation を文単位に分割して日本語を挿入
             explanation_lines = data['model_answer_explanation'].split('\n')
@@ -2081,6 +2514,7 @@ def generate_model_answer_only(question_text: str) -> dict:
             
         except (json.JSONDecodeError, ValueError) as e:
             logger.warning(f"Model answer generation failed (attempt {attempt + 1}): {e}")
+            metrics.inc("llm_parse_failures_total", call_type="model_answer", error=type(e).__name__)
             if attempt == max_retries - 1:
                 raise ValueError(f"Failed to generate model answer after {max_retries} attempts: {e}")
     
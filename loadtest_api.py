@@ -0,0 +1,186 @@
+"""
+APIの負荷テスト（出題 → 複数文添削 → 模範解答）
+宮崎大学医学部英作文特訓システム
+
+OpenAI 互換のスタブ（stub_openai.py）を立て、gunicorn でアプリを起動して、
+利用者ごとに次の流れを同時に実行する：
+    POST /api/question → POST /api/correct-multi → POST /api/model_answer
+スタブの応答時間の分布・障害の注入（429 / 500 / タイムアウト / 壊れたJSON）は stub_openai.py と同じ引数で指定する。
+エンドポイントごとの成功・失敗数、レイテンシ（p50/p95/最大）、全体のスループット、
+スタブ側で観測した呼び出し回数（種類別）・注入した障害・最大同時処理数を出力する。
+
+アプリは一時ディレクトリを作業ディレクトリにして起動する（data/ のDB・キャッシュは汚さない）。
+スタブは同じ本文の問題を返すため、近似重複の判定・問題バンク・添削キャッシュは無効にする。
+
+使い方:
+    python loadtest_api.py --users 50 --concurrency 20 --latency lognormal:1.5,0.4
+    python loadtest_api.py --users 100 --rate-429 0.05 --rate-malformed 0.02 --output result.json
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from japanese_utils import split_japanese_sentences
+from loadtest_gunicorn import wait_until_ready
+from stub_openai import StubOpenAIHandler, add_stub_arguments, settings_from_args, start_server
+
+BASE_DIR = Path(__file__).parent
+
+ENDPOINTS = ["/api/question", "/api/correct-multi", "/api/model_answer"]
+
+
+def post_json(url, payload, user_id):
+    """1リクエスト送信し、(ステータス, レスポンス, 所要秒) を返す"""
+    req = urllib.request.Request(
+        url,
+        data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json", "X-User-Id": user_id},
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=600) as res:
+            status, body = res.status, res.read()
+    except urllib.error.HTTPError as e:
+        status, body = e.code, e.read()
+    except OSError:
+        status, body = 0, b""
+    elapsed = time.perf_counter() - start
+    try:
+        data = json.loads(body) if body else None
+    except json.JSONDecodeError:
+        data = None
+    return status, data, elapsed
+
+
+def run_user(base_url, index):
+    """1人分の流れ（出題 → 複数文添削 → 模範解答）を実行し、エンドポイントごとの (ステータス, 所要秒) を返す"""
+    user_id = f"loadtest_{index:06d}"
+    results = []
+
+    status, question, elapsed = post_json(f"{base_url}/api/question", {}, user_id)
+    results.append(("/api/question", status, elapsed))
+    if status != 200 or not question:
+        return results
+
+    japanese_sentences = [
+        s for paragraph in (question.get("japanese_paragraphs") or question.get("japanese_sentences") or [])
+        for s in split_japanese_sentences(paragraph)
+    ]
+    user_sentences = [f"This is my answer to sentence {i} of the passage." for i in range(1, len(japanese_sentences) + 1)]
+    status, _, elapsed = post_json(f"{base_url}/api/correct-multi", {
+        "question_id": question["question_id"],
+        "japanese_sentences": japanese_sentences,
+        "user_sentences": user_sentences,
+        "target_words": question.get("target_words", {"min": 60, "max": 90}),
+    }, user_id)
+    results.append(("/api/correct-multi", status, elapsed))
+
+    status, _, elapsed = post_json(f"{base_url}/api/model_answer", {"question_id": question["question_id"]}, user_id)
+    results.append(("/api/model_answer", status, elapsed))
+    return results
+
+
+def summarize(endpoint, results):
+    latencies = sorted(t for name, status, t in results if name == endpoint and status == 200)
+    failed = [status for name, status, _ in results if name == endpoint and status != 200]
+    return {
+        "endpoint": endpoint,
+        "ok": len(latencies),
+        "failed": len(failed),
+        "failed_statuses": {str(s): failed.count(s) for s in sorted(set(failed))},
+        "p50_s": round(latencies[len(latencies) // 2], 3) if latencies else None,
+        "p95_s": round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 3) if latencies else None,
+        "max_s": round(latencies[-1], 3) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="APIの負荷テスト（OpenAI 互換スタブを使用）")
+    parser.add_argument("--users", type=int, default=50, help="流れ（出題→添削→模範解答）を実行する利用者数")
+    parser.add_argument("--concurrency", type=int, default=20, help="同時に実行する利用者数")
+    parser.add_argument("--worker-class", default="gthread", choices=["sync", "gthread", "gevent"])
+    parser.add_argument("--workers", type=int, default=0, help="ワーカー数（0 = gunicorn_config.py の自動設定）")
+    parser.add_argument("--threads", type=int, default=16, help="gthread/gevent の1ワーカーあたり同時処理数")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", help="結果をJSONで保存するパス")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub, stub_url = start_server(settings_from_args(args))
+    workdir = tempfile.mkdtemp(prefix="loadtest_api_")
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(BASE_DIR),
+        PORT=str(args.port),
+        GUNICORN_WORKER_CLASS=args.worker_class,
+        GUNICORN_CONCURRENCY=str(args.threads),
+        OPENAI_API_KEY="sk-loadtest",
+        OPENAI_BASE_URL=stub_url,
+        LOG_LEVEL="WARNING",
+        CORRECTION_CACHE_ENABLED="false",
+        QUESTION_BANK_ENABLED="false",
+        NEAR_DUPLICATE_THRESHOLD="2",
+    )
+    if args.workers:
+        env["GUNICORN_WORKERS"] = str(args.workers)
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(BASE_DIR / "gunicorn_config.py"),
+         "--access-logfile", "/dev/null", "app:app"],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not wait_until_ready(f"{base_url}/health"):
+            print("gunicorn did not start")
+            return
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = [r for user in pool.map(lambda i: run_user(base_url, i), range(args.users)) for r in user]
+        elapsed = time.perf_counter() - start
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        stub.shutdown()
+
+    completed = sum(1 for name, status, _ in results if name == "/api/model_answer" and status == 200)
+    report = {
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "worker_class": args.worker_class,
+        "elapsed_s": round(elapsed, 2),
+        "flows_per_s": round(completed / elapsed, 2),
+        "endpoints": [summarize(endpoint, results) for endpoint in ENDPOINTS],
+        "stub": StubOpenAIHandler.stats.snapshot(),
+    }
+
+    print(f"利用者: {args.users}（同時 {args.concurrency}）, 所要: {report['elapsed_s']}s, "
+          f"完了した流れ: {completed} ({report['flows_per_s']}/s)")
+    print(f"{'endpoint':<22}{'ok':>6}{'failed':>8}{'p50(s)':>9}{'p95(s)':>9}{'max(s)':>9}")
+    for r in report["endpoints"]:
+        print(f"{r['endpoint']:<22}{r['ok']:>6}{r['failed']:>8}{r['p50_s'] or '-':>9}{r['p95_s'] or '-':>9}{r['max_s'] or '-':>9}")
+    print(f"stub: {json.dumps(report['stub'], ensure_ascii=False)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
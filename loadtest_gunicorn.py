@@ -0,0 +1,185 @@
+"""
+gunicorn ワーカー方式の負荷テスト（sync vs gthread / gevent）
+宮崎大学医学部英作文特訓システム
+
+OpenAI API の代わりに、一定時間待ってから応答するスタブ（stub_openai.py）を立て、
+gunicorn_config.py を各ワーカー方式で起動して /api/model_answer に同時リクエストを送る。
+ワーカー方式ごとに以下を出力する：
+- 最大同時処理数（スタブ側で観測した、同時にLLM応答を待っていたリクエスト数）
+- スループット・レイテンシ
+- gunicorn プロセスツリーのメモリ（PSS合計、Linuxの /proc から取得）
+- 1GBあたりの同時処理数
+
+使い方:
+    python loadtest_gunicorn.py --requests 200 --concurrency 100 --latency 2
+    python loadtest_gunicorn.py --profiles sync gthread gevent --workers 2
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from stub_openai import StubOpenAIHandler, StubSettings, start_server
+
+BASE_DIR = Path(__file__).parent
+
+QUESTION_TEXT = "医師は患者の話をよく聞くべきだ。"
+
+
+def process_tree(pid):
+    """pid とその子孫プロセスの一覧（Linux）"""
+    pids = [pid]
+    for p in pids:
+        try:
+            children = Path(f"/proc/{p}/task/{p}/children").read_text().split()
+        except OSError:
+            continue
+        pids.extend(int(c) for c in children)
+    return pids
+
+
+def memory_kb(pid):
+    """プロセスのPSS（copy-on-write で共有しているページは按分）、取れなければRSS"""
+    try:
+        text = Path(f"/proc/{pid}/smaps_rollup").read_text()
+        key = "Pss:"
+    except OSError:
+        try:
+            text = Path(f"/proc/{pid}/status").read_text()
+            key = "VmRSS:"
+        except OSError:
+            return 0
+    for line in text.splitlines():
+        if line.startswith(key):
+            return int(line.split()[1])
+    return 0
+
+
+def wait_until_ready(url, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def post_model_answer(url):
+    """1リクエスト送信し、(成功したか, 所要秒) を返す"""
+    payload = json.dumps({"question_id": "q_loadtest", "question_text": QUESTION_TEXT}).encode("utf-8")
+    req = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=300) as res:
+            ok = res.status == 200
+    except OSError:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def run_profile(profile, args, stub_url):
+    """指定のワーカー方式で gunicorn を起動して負荷をかける"""
+    env = dict(
+        os.environ,
+        PORT=str(args.port),
+        GUNICORN_WORKER_CLASS=profile,
+        GUNICORN_CONCURRENCY=str(args.threads),
+        OPENAI_API_KEY="sk-loadtest",
+        OPENAI_BASE_URL=stub_url,
+        OPENAI_TIMEOUT="300",
+        LOG_LEVEL="WARNING",
+        # 模範解答キャッシュが効くと2回目以降LLMを呼ばなくなるため無効にする
+        CORRECTION_CACHE_ENABLED="false",
+    )
+    if args.workers:
+        env["GUNICORN_WORKERS"] = str(args.workers)
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "--access-logfile", "/dev/null", "app:app"],
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not wait_until_ready(f"{base_url}/health"):
+            return {"profile": profile, "error": "gunicorn did not start"}
+
+        StubOpenAIHandler.stats.reset()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(lambda _: post_model_answer(f"{base_url}/api/model_answer"), range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+        pids = process_tree(server.pid)
+        total_kb = sum(memory_kb(pid) for pid in pids)
+        latencies = sorted(t for ok, t in results if ok)
+        peak = StubOpenAIHandler.stats.snapshot()["peak_in_flight"]
+        return {
+            "profile": profile,
+            "processes": len(pids),
+            "ok": len(latencies),
+            "failed": len(results) - len(latencies),
+            "elapsed_s": round(elapsed, 2),
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "p50_s": round(latencies[len(latencies) // 2], 2) if latencies else None,
+            "p95_s": round(latencies[int(len(latencies) * 0.95) - 1], 2) if latencies else None,
+            "peak_in_flight": peak,
+            "memory_mb": round(total_kb / 1024, 1),
+            "in_flight_per_gb": round(peak / (total_kb / 1024 / 1024), 1) if total_kb else None,
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gunicorn ワーカー方式の負荷テスト")
+    parser.add_argument("--profiles", nargs="+", default=["sync", "gthread"], choices=["sync", "gthread", "gevent"])
+    parser.add_argument("--requests", type=int, default=200, help="総リクエスト数")
+    parser.add_argument("--concurrency", type=int, default=100, help="クライアント側の同時接続数")
+    parser.add_argument("--latency", type=float, default=2.0, help="スタブのLLM応答時間（秒）")
+    parser.add_argument("--workers", type=int, default=0, help="ワーカー数（0 = gunicorn_config.py の自動設定）")
+    parser.add_argument("--threads", type=int, default=16, help="gthread/gevent の1ワーカーあたり同時処理数")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+
+    stub, stub_url = start_server(StubSettings(latency=f"fixed:{args.latency}"))
+
+    results = []
+    for profile in args.profiles:
+        result = run_profile(profile, args, stub_url)
+        results.append(result)
+        print(json.dumps(result, ensure_ascii=False))
+
+    stub.shutdown()
+
+    print()
+    print(f"{'profile':<10}{'procs':>6}{'peak':>7}{'rps':>8}{'p95(s)':>8}{'MB':>9}{'in-flight/GB':>14}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['profile']:<10} {r['error']}")
+            continue
+        print(f"{r['profile']:<10}{r['processes']:>6}{r['peak_in_flight']:>7}{r['throughput_rps']:>8}"
+              f"{r['p95_s'] or '-':>8}{r['memory_mb']:>9}{r['in_flight_per_gb'] or '-':>14}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
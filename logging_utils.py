@@ -0,0 +1,110 @@
+"""
+構造化ロギング - レベル判定付きの遅延フォーマットとJSONフォーマッター
+宮崎大学医学部英作文特訓システム
+
+- 大きなペイロード（添削結果全体・LLM応答全文）は、DEBUGレベルが有効で
+  かつリクエストがサンプリングに当選した場合のみシリアライズする
+- LazyJson / LazyPreview を %-style の引数に渡すと、ログが実際に出力される
+  ときまで json.dumps や文字列切り出しが行われない
+- LOG_JSON=true で1行1JSONの構造化ログを出力（extra= のフィールドも含む）
+"""
+import json
+import random
+import logging
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Optional
+
+import config
+
+# 現在のリクエストで大きなペイロードをログに出すか（リクエスト単位で決定）
+# ContextVar なので gthread のスレッド・gevent のグリーンレットごとに独立している
+_payload_sampled: ContextVar[bool] = ContextVar("payload_sampled", default=False)
+
+# LogRecord の標準属性（これ以外は extra= で渡された構造化フィールド）
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class LazyJson:
+    """出力時にだけ json.dumps する（ログが捨てられる場合はシリアライズしない）"""
+
+    __slots__ = ("obj", "indent")
+
+    def __init__(self, obj: Any, indent: Optional[int] = 2):
+        self.obj = obj
+        self.indent = indent
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, ensure_ascii=False, indent=self.indent, default=str)
+
+
+class LazyPreview:
+    """出力時にだけ先頭N文字を切り出す"""
+
+    __slots__ = ("text", "limit")
+
+    def __init__(self, text: Optional[str], limit: int = 100):
+        self.text = text
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = self.text or ""
+        return text if len(text) <= self.limit else f"{text[:self.limit]}..."
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1JSONのログフォーマッター"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging():
+    """ルートロガーを設定（LOG_JSON=true ならJSONフォーマッター）"""
+    handler = logging.StreamHandler()
+    if config.LOG_JSON:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(config.LOG_FORMAT, datefmt=config.LOG_DATE_FORMAT))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(getattr(logging, config.LOG_LEVEL))
+
+
+def start_request_sampling() -> bool:
+    """リクエスト開始時に、大きなペイロードをログに出すかを抽選する"""
+    sampled = random.random() < config.LOG_PAYLOAD_SAMPLE_RATE
+    _payload_sampled.set(sampled)
+    return sampled
+
+
+def payload_logging_enabled(logger: logging.Logger) -> bool:
+    """DEBUGレベルが有効かつサンプリングに当選しているか"""
+    return logger.isEnabledFor(logging.DEBUG) and _payload_sampled.get()
+
+
+def log_payload(logger: logging.Logger, label: str, payload: Any):
+    """
+    大きなペイロードをDEBUGレベルで出力（非サンプリング時はシリアライズしない）
+
+    Args:
+        logger: 出力先のロガー
+        label: ログの見出し
+        payload: dict/list はJSON、文字列はそのまま出力
+    """
+    if not payload_logging_enabled(logger):
+        return
+    body = payload if isinstance(payload, str) else LazyJson(payload)
+    logger.debug("%s:\n%s", label, body)
@@ -0,0 +1,248 @@
+"""
+メトリクス - 処理時間のスパン・カウンター・ヒストグラム
+宮崎大学医学部英作文特訓システム
+
+gunicorn のアクセスログ（%(D)s）ではリクエスト全体の時間しか分からず、
+LLMの応答待ち・JSONの修復・points の正規化・pydantic の検証・SQLite のどこで
+時間がかかっているかが分からなかった。
+- span("llm.clean_json") / @timed("db.save_submission") で処理時間を記録（span_duration_seconds）
+- inc / observe でラベル付きのカウンター・ヒストグラムを記録
+- 値はプロセスごとにメモリで集計し、バックグラウンドスレッドが METRICS_FLUSH_INTERVAL 秒ごとに
+  METRICS_DIR/worker_<pid>_<id>.json に書き出す（リクエストの処理中にファイルは書かない）
+- /metrics（render）はすべてのワーカーのファイルを合算して Prometheus のテキスト形式で返す
+  （他のワーカーの値は最大 METRICS_FLUSH_INTERVAL 秒遅れる）
+- 終了したワーカーのファイルも残す（カウンターが減らないように）。gunicorn の起動時に clear_shared() で削除する
+"""
+import os
+import json
+import time
+import uuid
+import bisect
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "eisakubun_"
+
+# 名前 → (種類, 説明)
+DEFINITIONS: Dict[str, Tuple[str, str]] = {
+    "http_request_duration_seconds": ("histogram", "HTTPリクエストの処理時間"),
+    "span_duration_seconds": ("histogram", "処理段階（スパン）ごとの時間"),
+    "llm_request_duration_seconds": ("histogram", "OpenAI API 呼び出し1回の応答時間"),
+    "llm_requests_total": ("counter", "OpenAI API 呼び出し回数（結果別）"),
+    "llm_retries_total": ("counter", "OpenAI API 呼び出しのリトライ回数"),
+    "llm_parse_failures_total": ("counter", "LLM応答のJSON解析・検証の失敗回数"),
+    "llm_reprompts_total": ("counter", "添削ポイント不足による再プロンプトの回数"),
+    "llm_fallbacks_total": ("counter", "フォールバック（固定問題・バンクの問題・簡易添削・補足ポイントなど）の使用回数"),
+    "llm_tokens_total": ("counter", "OpenAI API のトークン数"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# プロセスごとの集計（fork 後の子プロセスでは空から始める）
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Labels], float] = {}
+_histograms: Dict[Tuple[str, Labels], List[float]] = {}  # バケットごとの件数 + [合計, 件数]
+_pid = None
+_file_id = None
+_dirty = False
+
+
+def _ensure_process():
+    """
+    fork 後の最初の記録で、マスターから引き継いだ値を捨てて書き出し用のスレッドを起動する
+    （呼び出し側で _lock を取得済み）
+    """
+    global _pid, _file_id
+    if _pid != os.getpid():
+        _counters.clear()
+        _histograms.clear()
+        _pid = os.getpid()
+        _file_id = uuid.uuid4().hex[:8]
+        threading.Thread(target=_flush_loop, args=(_pid,), daemon=True, name="metrics-flush").start()
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    """カウンターを加算"""
+    if not config.METRICS_ENABLED:
+        return
+    global _dirty
+    key = (name, _labels(labels))
+    with _lock:
+        _ensure_process()
+        _counters[key] = _counters.get(key, 0.0) + value
+        _dirty = True
+
+
+def observe(name: str, value: float, **labels):
+    """ヒストグラムに値（秒）を記録"""
+    if not config.METRICS_ENABLED:
+        return
+    global _dirty
+    key = (name, _labels(labels))
+    buckets = config.METRICS_BUCKETS
+    with _lock:
+        _ensure_process()
+        data = _histograms.get(key)
+        if data is None:
+            data = _histograms[key] = [0.0] * (len(buckets) + 3)
+        data[bisect.bisect_left(buckets, value)] += 1
+        data[-2] += value
+        data[-1] += 1
+        _dirty = True
+
+
+@contextmanager
+def span(name: str, **labels) -> Iterator[None]:
+    """ブロックの処理時間を span_duration_seconds{span=name} に記録"""
+    if not config.METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("span_duration_seconds", time.perf_counter() - start, span=name, **labels)
+
+
+def timed(name: str):
+    """関数の処理時間を span_duration_seconds{span=name} に記録するデコレーター"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ===== ワーカー間の集計 =====
+
+def _snapshot() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "counters": [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            "histograms": [[name, list(labels), list(data)] for (name, labels), data in _histograms.items()],
+        }
+
+
+def _own_file() -> Path:
+    return Path(config.METRICS_DIR) / f"worker_{_pid}_{_file_id}.json"
+
+
+def flush():
+    """このプロセスの値をファイルに書き出す（一時ファイルに書いてから置き換える）"""
+    global _dirty
+    with _lock:
+        if _pid != os.getpid():
+            return
+        _dirty = False
+        path = _own_file()
+    data = _snapshot()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Metrics flush failed: {e}")
+
+
+def _flush_loop(pid: int):
+    """METRICS_FLUSH_INTERVAL 秒ごとに、値が変わっていれば書き出す（fork 後の子プロセスでは終了）"""
+    while _pid == pid == os.getpid():
+        time.sleep(config.METRICS_FLUSH_INTERVAL)
+        if _dirty:
+            flush()
+
+
+def clear_shared():
+    """書き出し済みのファイルを削除（gunicorn マスターの起動時）"""
+    directory = Path(config.METRICS_DIR)
+    if directory.exists():
+        for path in directory.glob("worker_*.json"):
+            path.unlink(missing_ok=True)
+
+
+def collect() -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], List[float]]]:
+    """全ワーカーの値を合算（このプロセスはファイルではなくメモリ上の最新値を使う）"""
+    counters: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], List[float]] = {}
+    snapshots = [_snapshot()] if _pid == os.getpid() else []
+    own = _own_file().name if _pid == os.getpid() else None
+
+    directory = Path(config.METRICS_DIR)
+    if directory.exists():
+        for path in directory.glob("worker_*.json"):
+            if path.name == own:
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                # 書き込み中・壊れたファイルは次回に回す
+                continue
+
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0.0) + value
+        for name, labels, data in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if key not in histograms:
+                histograms[key] = list(data)
+            elif len(histograms[key]) == len(data):
+                histograms[key] = [a + b for a, b in zip(histograms[key], data)]
+    return counters, histograms
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render() -> str:
+    """全ワーカーの値を Prometheus のテキスト形式（0.0.4）にする"""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text) in DEFINITIONS.items():
+        series = counters if kind == "counter" else histograms
+        keys = sorted(key for key in series if key[0] == name)
+        if not keys:
+            continue
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        for key in keys:
+            labels = key[1]
+            if kind == "counter":
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {_format_value(series[key])}")
+                continue
+            data = series[key]
+            cumulative = 0.0
+            for bound, count in zip(list(config.METRICS_BUCKETS) + ["+Inf"], data[:-2]):
+                cumulative += count
+                le = bound if isinstance(bound, str) else _format_value(bound)
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, (('le', le),))} {_format_value(cumulative)}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {_format_value(data[-2])}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {_format_value(data[-1])}")
+    return "\n".join(lines) + "\n"
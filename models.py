@@ -208,6 +208,26 @@ class ValidationResponse(BaseModel):
     ready_to_submit: bool = Field(..., description="提出可能か")
 
 
+class BatchValidationRequest(BaseModel):
+    """制約一括検証リクエスト"""
+    texts: List[str] = Field(..., min_length=1, max_length=1000, description="検証対象のテキストのリスト")
+    min_words: int = Field(..., ge=10, le=200, description="最小語数")
+    max_words: int = Field(..., ge=10, le=200, description="最大語数")
+    required_units: int = Field(2, ge=1, le=5, description="必要な理由/提案/例の数")
+    
+    @model_validator(mode='after')
+    def check_min_max(self):
+        if self.min_words > self.max_words:
+            raise ValueError("min_words must be less than or equal to max_words")
+        return self
+
+
+class BatchValidationResponse(BaseModel):
+    """制約一括検証レスポンス（入力順）"""
+    results: List[ValidationResponse] = Field(..., description="各テキストの検証結果")
+    count: int = Field(..., ge=0, description="検証したテキスト数")
+
+
 # ===== アウトライン支援（Phase 3追加） =====
 class OutlineSection(BaseModel):
     """アウトライン1セクション"""
@@ -0,0 +1,73 @@
+"""
+問題本文の近似重複判定（MinHash + LSH）
+宮崎大学医学部英作文特訓システム
+
+出題の重複はジャンル・サブトピックのラベルでしか避けておらず、GPT-4o が
+ほぼ同じ本文（睡眠とスマホの話など）を何度も生成していた。
+このモジュールは日本語本文の文字 n-gram から MinHash の署名を作り、
+署名をバンドに分けたハッシュ（LSH のバケット）で候補を引けるようにする。
+- 署名・バケットは database の question_signatures / question_lsh_buckets に保存し、
+  問題を保存するたびに追加する（再構築は不要）
+- 判定は候補バケットの索引検索と、候補との署名の一致率（Jaccard 係数の推定値）の比較のみ
+- n-gram ごとに SHAKE-256 の出力を MINHASH_NUM_PERM 個の32ビット値に分け、それぞれを
+  独立したハッシュ関数とみなす（最小値の計算は zip/min で C 側に任せ、Python のループを減らす）。
+  乱数種に依存しないため、プロセス・再起動をまたいで同じ署名になる
+"""
+import struct
+import hashlib
+from typing import Iterable, List, Set, Tuple
+
+import config
+
+_MAX_HASH = (1 << 32) - 1
+_ROWS_PER_BAND = config.MINHASH_NUM_PERM // config.MINHASH_BANDS
+_HASH_FORMAT = struct.Struct(f"<{config.MINHASH_NUM_PERM}I")
+
+
+def normalize_text(text: str) -> str:
+    """空白・句読点・記号を除く（文字と数字のみ残す）"""
+    return "".join(ch for ch in text if ch.isalnum())
+
+
+def shingles(text: str, size: int = None) -> Set[str]:
+    """正規化した本文の文字 n-gram の集合"""
+    size = size or config.MINHASH_SHINGLE_SIZE
+    normalized = normalize_text(text)
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def signature(texts: Iterable[str]) -> List[int]:
+    """本文（段落・文のリスト）の MinHash 署名（MINHASH_NUM_PERM 個の32ビット値）"""
+    grams = shingles("".join(texts))
+    if not grams:
+        return [_MAX_HASH] * config.MINHASH_NUM_PERM
+    hashes = [
+        _HASH_FORMAT.unpack(hashlib.shake_256(gram.encode("utf-8")).digest(_HASH_FORMAT.size))
+        for gram in grams
+    ]
+    return list(map(min, zip(*hashes)))
+
+
+def band_buckets(sig: List[int]) -> List[Tuple[int, int]]:
+    """署名をバンドに分け、(バンド番号, バケットのハッシュ) のリストにする"""
+    buckets = []
+    for band in range(config.MINHASH_BANDS):
+        rows = sig[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack(f"<{len(rows)}I", *rows), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "little", signed=True)))
+    return buckets
+
+
+def similarity(sig1: List[int], sig2: List[int]) -> float:
+    """署名の一致率（Jaccard 係数の推定値）"""
+    return sum(1 for a, b in zip(sig1, sig2) if a == b) / len(sig1)
+
+
+def pack(sig: List[int]) -> bytes:
+    return struct.pack(f"<{len(sig)}I", *sig)
+
+
+def unpack(data: bytes) -> List[int]:
+    return list(struct.unpack(f"<{len(data) // 4}I", data))
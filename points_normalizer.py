@@ -9,6 +9,9 @@ import logging
 import re
 from typing import List, Dict, Any
 
+import metrics
+from logging_utils import LazyPreview
+
 logger = logging.getLogger(__name__)
 
 
@@ -389,25 +392,26 @@ def normalize_level(level: str, before: str, after: str) -> tuple:
     """
     # level が無い、または 💡 を含む場合
     if not level or '💡' in level:
-        logger.info(f"Normalizing level: '{level}' → '✅ 正しい表現' (after=before)")
+        logger.debug("Normalizing level: '%s' → '✅ 正しい表現' (after=before)", level)
         return ('✅ 正しい表現', before)
     
     # ❌ の場合はそのまま
     if '❌' in level:
-        logger.info(f"Level is ❌, keeping after: '{after[:50]}...'")
+        logger.debug("Level is ❌, keeping after: '%s'", LazyPreview(after, 50))
         return (level, after)
     
     # ✅ の場合は after=before に矯正
     if '✅' in level:
         if before != after:
-            logger.info(f"Level is ✅ but after≠before. Setting after=before")
+            logger.debug("Level is ✅ but after≠before. Setting after=before")
         return (level, before)
     
     # その他の場合はデフォルトで ✅
-    logger.info(f"Unknown level '{level}', defaulting to '✅ 正しい表現' (after=before)")
+    logger.debug("Unknown level '%s', defaulting to '✅ 正しい表現' (after=before)", level)
     return ('✅ 正しい表現', before)
 
 
+@metrics.timed("points.normalize")
 def normalize_points(
     points: List[Dict[str, Any]],
     normalized_answer: str,
@@ -437,14 +441,14 @@ def normalize_points(
     
     # 学生英文をセンテンスに分割（正規化後）
     student_sentences = split_into_sentences(normalized_answer)
-    logger.info(f"Student answer split into {len(student_sentences)} sentences")
+    logger.debug("Student answer split into %d sentences", len(student_sentences))
     
     # 元のユーザー入力もセンテンスに分割（正規化前）
     original_sentences = []
     if original_user_answer:
         # 正規化前の入力を同じロジックで分割（ピリオドなしでも対応）
         original_sentences = split_into_sentences(original_user_answer)
-        logger.info(f"Original user input split into {len(original_sentences)} sentences")
+        logger.debug("Original user input split into %d sentences", len(original_sentences))
     
     normalized_points = []
     
@@ -454,7 +458,7 @@ def normalize_points(
             original_after = point.get('after', '').strip()
             original_level = point.get('level', '')
             
-            logger.info(f"Processing point {i+1}: before='{original_before[:50]}...', level='{original_level}'")
+            logger.debug("Processing point %d: before='%s', level='%s'", i + 1, LazyPreview(original_before, 50), original_level)
             
             # before が空の場合はスキップ
             if not original_before:
@@ -463,7 +467,7 @@ def normalize_points(
             
             # 🚨重要: LLMが返す before も正規化する（ピリオル補完など）
             normalized_before = normalize_user_input(original_before)
-            logger.info(f"Point {i+1}: Normalized before='{normalized_before[:50]}...'")
+            logger.debug("Point %d: Normalized before='%s'", i + 1, LazyPreview(normalized_before, 50))
             
             # 断片 → 全文に拡張（正規化後の before で検索）
             sentence_index, full_sentence = find_sentence_containing_fragment(normalized_before, student_sentences)
@@ -473,7 +477,7 @@ def normalize_points(
                 logger.warning(f"Point {i+1}: Fragment '{original_before[:50]}' not found in student answer, skipping")
                 continue
             
-            logger.info(f"Point {i+1}: Found in sentence {sentence_index + 1}: '{full_sentence[:50]}...'")
+            logger.debug("Point %d: Found in sentence %d: '%s'", i + 1, sentence_index + 1, LazyPreview(full_sentence, 50))
             
             # before を全文に置換（既に正規化済みの文字列を使用）
             full_before = full_sentence
@@ -487,7 +491,7 @@ def normalize_points(
                 full_after = replace_fragment_in_sentence(full_sentence, normalized_before, normalized_after)
                 # 修正後の文字列も正規化（念のため）
                 full_after = normalize_user_input(full_after)
-                logger.info(f"Point {i+1}: Replaced fragment in sentence: '{full_after[:50]}...'")
+                logger.debug("Point %d: Replaced fragment in sentence: '%s'", i + 1, LazyPreview(full_after, 50))
             else:
                 # 修正不要な場合：after は before と同じ
                 full_after = full_before
@@ -504,14 +508,14 @@ def normalize_points(
             if normalized_user_input == normalized_llm_after:
                 # 正規化後に同じ = 形式ミスのみ = ✅
                 if '❌' in normalized_level:
-                    logger.info(f"Point {i+1}: Normalized input matches LLM output → changing ❌ to ✅")
+                    logger.debug("Point %d: Normalized input matches LLM output → changing ❌ to ✅", i + 1)
                     normalized_level = '✅正しい表現'
             
             # 元のユーザー入力（正規化前）を取得
             original_before_text = full_before  # デフォルトは正規化後
             if original_sentences and sentence_index < len(original_sentences):
                 original_before_text = original_sentences[sentence_index]
-                logger.info(f"Point {i+1}: Original user input: '{original_before_text[:50]}...'")
+                logger.debug("Point %d: Original user input: '%s'", i + 1, LazyPreview(original_before_text, 50))
             
             # sentence_no を付与
             # japanese_sentence があればそれを元に特定、なければ sentence_index+1
@@ -521,7 +525,7 @@ def normalize_points(
                 try:
                     jp_index = japanese_sentences.index(point['japanese_sentence'])
                     sentence_no = jp_index + 1
-                    logger.info(f"Point {i+1}: Matched Japanese sentence, sentence_no={sentence_no}")
+                    logger.debug("Point %d: Matched Japanese sentence, sentence_no=%d", i + 1, sentence_no)
                 except ValueError:
                     # 見つからない場合は sentence_index+1 を使用
                     logger.warning(f"Point {i+1}: Japanese sentence not found in original, using sentence_index+1")
@@ -534,7 +538,7 @@ def normalize_points(
             point['original_before'] = original_before_text  # 正規化前のユーザー入力
             
             normalized_points.append(point)
-            logger.info(f"Point {i+1}: Normalized successfully (sentence_no={sentence_no})")
+            logger.debug("Point %d: Normalized successfully (sentence_no=%d)", i + 1, sentence_no)
         
         except Exception as e:
             logger.error(f"Error normalizing point {i+1}: {e}")
@@ -0,0 +1,230 @@
+"""
+問題バンク - 過去問・作成済み問題の一括登録と出題
+宮崎大学医学部英作文特訓システム
+
+出題のたびに GPT-4o で問題を生成していたが、検証済みの問題を数千件登録しておけば
+LLM を呼ばずに出題できる。
+- import_questions: JSON（配列）/ JSONL のファイルを1件ずつ読み、QuestionResponse で検証して
+  QUESTION_IMPORT_BATCH_SIZE 件ごとに1トランザクションで登録する（ファイルの大きさによらずメモリは一定）
+  - ジャンル（theme）が7ジャンル以外の問題は登録しない
+  - topic_label がなければ本文・ヒントからサブトピック（A-H）を分類する
+  - 日本語の本文が同じ問題（空白の違いは無視）・ほぼ同じ問題（MinHash の近似重複）は重複として登録しない
+- pick_question: 出題の偏り判定と同じ方法でジャンル・抜粋タイプを決め、
+  この利用者にまだ出題していない問題をバンクから選ぶ（なければ None → LLMで生成）
+  - リクエストの excluded_themes のジャンルは出題しない（LLMで生成する場合と同じ）
+- pick_any_question: LLM での生成がすべて失敗したとき、除外ジャンル以外から未出題の問題を選ぶ
+"""
+import json
+import logging
+import random
+from pathlib import Path
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+import config
+import near_duplicate
+from models import QuestionResponse
+from database import (
+    save_imported_questions, pick_bank_question_id, get_question, classify_topic_label,
+    get_recent_themes, get_recent_excerpt_types, find_near_duplicate_signatures
+)
+
+logger = logging.getLogger(__name__)
+
+_READ_SIZE = 64 * 1024
+
+
+def _iter_json_array(f: IO[str]) -> Iterator[Any]:
+    """JSON配列の要素を1件ずつ読む（ファイル全体を読み込まない）"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if not buffer and not eof:
+                chunk = f.read(_READ_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            if not buffer.startswith("["):
+                raise ValueError("JSONファイルは問題の配列である必要があります")
+            buffer = buffer[1:]
+            started = True
+            continue
+
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(_READ_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_records(path: Path) -> Iterator[Any]:
+    """
+    問題ファイルのレコードを1件ずつ読む
+
+    Args:
+        path: .jsonl（1行1問）または .json（問題の配列）
+    """
+    path = Path(path)
+    with open(path, encoding="utf-8") as f:
+        if path.suffix == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f)
+
+
+def validate_record(record: Any) -> QuestionResponse:
+    """レコードを検証して QuestionResponse にする（不正なら ValueError / ValidationError）"""
+    from prompts_translation_simple import TRANSLATION_GENRES
+
+    if not isinstance(record, dict):
+        raise ValueError("レコードがオブジェクトではありません")
+    question = QuestionResponse(**record)
+    if question.theme not in TRANSLATION_GENRES:
+        raise ValueError(f"未対応のジャンルです: {question.theme}")
+    if not (question.japanese_paragraphs or question.japanese_sentences):
+        raise ValueError("日本語の本文がありません")
+
+    if not question.topic_label:
+        text = " ".join(question.japanese_paragraphs or question.japanese_sentences)
+        text += " " + " ".join(f"{h.en} {h.ja}" for h in question.hints)
+        question.topic_label = classify_topic_label(question.theme, text)
+    return question
+
+
+def import_questions(path: Path, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    問題ファイルを問題バンクに一括登録
+
+    Returns:
+        {"read": 読んだ件数, "imported": 登録した件数, "duplicates": 重複, "invalid": 不正}
+    """
+    batch_size = batch_size or config.QUESTION_IMPORT_BATCH_SIZE
+    stats = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+    # 検証済みで、近似重複の判定がまだの問題と署名
+    pending: List[Tuple[QuestionResponse, List[int]]] = []
+
+    def flush():
+        # 登録済みの問題との近似重複はバッチごとに1接続で判定し、
+        # 残った問題どうしの近似重複は LSH のバケット → 署名で判定する
+        batch: List[QuestionResponse] = []
+        batch_buckets: Dict[Tuple[int, int], List[List[int]]] = {}
+        known = find_near_duplicate_signatures([sig for _, sig in pending])
+        for (question, sig), duplicates in zip(pending, known):
+            buckets = near_duplicate.band_buckets(sig)
+            if duplicates or any(
+                near_duplicate.similarity(sig, other) >= config.NEAR_DUPLICATE_THRESHOLD
+                for bucket in buckets for other in batch_buckets.get(bucket, ())
+            ):
+                stats["duplicates"] += 1
+                continue
+            for bucket in buckets:
+                batch_buckets.setdefault(bucket, []).append(sig)
+            batch.append(question)
+        pending.clear()
+        if batch:
+            imported = save_imported_questions(batch)
+            stats["imported"] += imported
+            stats["duplicates"] += len(batch) - imported
+
+    for record in iter_records(path):
+        stats["read"] += 1
+        try:
+            question = validate_record(record)
+        except (ValidationError, ValueError) as e:
+            stats["invalid"] += 1
+            logger.warning(f"Skipped invalid question #{stats['read']}: {str(e)[:200]}")
+            continue
+
+        pending.append((question, near_duplicate.signature(question.japanese_paragraphs or question.japanese_sentences)))
+        if len(pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+
+    logger.info(f"Question import finished: {stats}")
+    return stats
+
+
+def pick_question(
+    user_id: str,
+    excluded_themes: Optional[List[str]] = None,
+    avoid_themes: Optional[List[str]] = None
+) -> Optional[QuestionResponse]:
+    """
+    問題バンクから、この利用者にまだ出題していない問題を選ぶ
+
+    ジャンル・抜粋タイプは LLM で生成する場合と同じく直近の出題から決め、
+    その抜粋タイプの問題がなければ同じジャンルの別の抜粋タイプから選ぶ。
+
+    Args:
+        user_id: 利用者ID
+        excluded_themes: 出題しないジャンル（リクエストの excluded_themes）
+        avoid_themes: できれば避けるジャンル（この利用者が最近使ったテーマ）。
+                      すべて避けると選べるジャンルがなくなる場合は無視する
+
+    Returns:
+        問題（バンクに該当する問題がなければ None）
+    """
+    from prompts_translation_simple import TRANSLATION_GENRES
+    from llm_service import enforce_theme_diversity, enforce_excerpt_type_diversity
+
+    excluded = set(excluded_themes or [])
+    genres = [g for g in TRANSLATION_GENRES if g not in excluded]
+    genres = [g for g in genres if g not in set(avoid_themes or [])] or genres
+    if not genres:
+        logger.info("Question bank skipped: all genres excluded")
+        return None
+
+    recent_themes = get_recent_themes(30, user_id=user_id)
+    theme = genres[0] if len(genres) == 1 else enforce_theme_diversity(recent_themes, genres)
+    excerpt_type = enforce_excerpt_type_diversity(get_recent_excerpt_types(10, user_id=user_id))
+
+    question_id = (pick_bank_question_id(theme, user_id, excerpt_type)
+                   or pick_bank_question_id(theme, user_id))
+    if question_id is None:
+        return None
+    return _load_question(question_id)
+
+
+def pick_any_question(user_id: str, excluded_themes: Optional[List[str]] = None) -> Optional[QuestionResponse]:
+    """
+    問題バンクから、除外ジャンル以外のどのジャンルでもよいので未出題の問題を選ぶ
+    （LLM での生成がすべて失敗したときに、固定の問題より先に使う）
+
+    Returns:
+        問題（バンクに該当する問題がなければ None）
+    """
+    from prompts_translation_simple import TRANSLATION_GENRES
+
+    excluded = set(excluded_themes or [])
+    genres = [g for g in TRANSLATION_GENRES if g not in excluded]
+    random.shuffle(genres)
+    for theme in genres:
+        question_id = pick_bank_question_id(theme, user_id)
+        if question_id is not None:
+            return _load_question(question_id)
+    return None
+
+
+def _load_question(question_id: str) -> QuestionResponse:
+    """バンクの問題を QuestionResponse にする"""
+    data = get_question(question_id)
+    fields = {k: v for k, v in data.items() if k in QuestionResponse.model_fields and v is not None}
+    logger.info(f"Question served from bank: {question_id} - {data.get('theme')} ({data.get('excerpt_type')})")
+    return QuestionResponse(**fields)
@@ -0,0 +1,30 @@
+"""
+提出統計の集計テーブル（submission_stats）を submissions から再計算
+宮崎大学医学部英作文特訓システム
+
+集計はトリガーで自動更新されるため通常は不要。
+DBファイルを直接編集した場合や、トリガー導入前のバックアップを戻した場合に実行する。
+
+使い方:
+    python rebuild_stats.py
+"""
+import json
+
+from database import init_database, get_statistics, rebuild_statistics
+
+
+def main():
+    init_database()
+    before = get_statistics()
+    after = rebuild_statistics()
+
+    print("再計算前:", json.dumps(before, ensure_ascii=False))
+    print("再計算後:", json.dumps(after, ensure_ascii=False))
+    if before != after:
+        print("⚠️ 集計テーブルがずれていたため修正しました")
+    else:
+        print("✅ 集計テーブルは正しい値でした")
+
+
+if __name__ == "__main__":
+    main()
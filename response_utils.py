@@ -0,0 +1,172 @@
+"""
+HTTPレスポンスの軽量化 - JSONシリアライズとレスポンス圧縮
+宮崎大学医学部英作文特訓システム
+
+添削レスポンスは reason・模範解答・解説などの日本語テキストが大半で、
+従来の jsonify（ensure_ascii=True, sort_keys=True）では日本語1文字が
+\\uXXXX の6バイトになり、さらに無圧縮で送っていた。
+- FastJSONProvider: UTF-8のまま・キーのソートなしでシリアライズ（orjson があれば使う）
+- compress_response: Accept-Encoding に応じて br / gzip で圧縮（JSON・HTML・JS・CSSなど）
+  静的ファイルは圧縮結果をメモリに保持し、リクエストごとに圧縮し直さない
+"""
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from flask.json.provider import DefaultJSONProvider
+
+import config
+
+try:
+    import orjson
+except ImportError:  # orjson がなければ標準の json を使う
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli がなければ gzip のみ
+    brotli = None
+
+# 圧縮対象の Content-Type（画像などの圧縮済み形式は対象外）
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "text/css",
+    "text/html",
+    "text/plain",
+    "image/svg+xml",
+}
+
+# 静的ファイルの圧縮結果キャッシュ（ワーカープロセスごと）
+_STATIC_CACHE_MAX_ENTRIES = 64
+_static_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+_static_cache_lock = threading.Lock()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """UTF-8・キー順そのままでシリアライズする JSON プロバイダー（orjson があれば使う）"""
+
+    ensure_ascii = False
+    sort_keys = False
+    compact = True
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is not None and not kwargs:
+            try:
+                return self._orjson_dumps(obj).decode("utf-8")
+            except TypeError:
+                # orjson が扱えない型（str 以外のキーなど）は標準の json にまかせる
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def _orjson_dumps(self, obj: Any, option: int = 0) -> bytes:
+        # datetime などは標準のプロバイダーと同じ形式（default）に変換する
+        return orjson.dumps(obj, default=self.default, option=option | orjson.OPT_PASSTHROUGH_DATETIME)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is not None:
+            try:
+                body = self._orjson_dumps(obj, orjson.OPT_APPEND_NEWLINE)
+                return self._app.response_class(body, mimetype=self.mimetype)
+            except TypeError:
+                pass
+        return super().response(obj)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Accept-Encoding から使う圧縮方式を選ぶ（br > gzip、q=0 は除外）"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """br または gzip で圧縮"""
+    if encoding == "br":
+        return brotli.compress(data, quality=config.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=config.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response, accept_encoding: str, is_static: bool = False):
+    """
+    レスポンスを圧縮（after_request から呼ぶ）
+
+    Args:
+        response: Flask のレスポンス
+        accept_encoding: リクエストの Accept-Encoding ヘッダー
+        is_static: /static/ 配下のファイルか（圧縮結果をキャッシュする）
+    """
+    if not config.COMPRESSION_ENABLED:
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    if (response.status_code != 200
+            or response.is_streamed and not response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    encoding = choose_encoding(accept_encoding or "")
+    if encoding is None:
+        return response
+
+    if is_static:
+        key = (response.headers.get("ETag"), response.content_length, response.last_modified, encoding)
+        compressed = _static_cache_get(key)
+        if compressed is None:
+            response.direct_passthrough = False
+            data = response.get_data()
+            if len(data) < config.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = compress_bytes(data, encoding)
+            _static_cache_put(key, compressed)
+    else:
+        data = response.get_data()
+        if len(data) < config.COMPRESSION_MIN_SIZE:
+            return response
+        compressed = compress_bytes(data, encoding)
+
+    # 静的ファイルをキャッシュから返す場合は、開いたままのファイルを閉じてから差し替える
+    if response.direct_passthrough and hasattr(response.response, "close"):
+        response.response.close()
+    response.direct_passthrough = False
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+
+    # 圧縮後も同じ内容とみなせるよう ETag は弱い ETag にする（If-None-Match の比較は弱い比較）
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def _static_cache_get(key: tuple) -> Optional[bytes]:
+    with _static_cache_lock:
+        compressed = _static_cache.get(key)
+        if compressed is not None:
+            _static_cache.move_to_end(key)
+        return compressed
+
+
+def _static_cache_put(key: tuple, compressed: bytes):
+    with _static_cache_lock:
+        _static_cache[key] = compressed
+        while len(_static_cache) > _STATIC_CACHE_MAX_ENTRIES:
+            _static_cache.popitem(last=False)
@@ -0,0 +1,129 @@
+"""
+重複リクエストの集約（single-flight）
+宮崎大学医学部英作文特訓システム
+
+「添削」ボタンのダブルクリックや模範解答の再取得で、同じ内容のリクエストが
+同時に届くと、それぞれが GPT-4o を呼び出していました。
+このモジュールは (エンドポイント, 問題ID, 正規化した回答のハッシュ) をキーに、
+同時に実行中の同一リクエストを1回の実行にまとめ、全員に同じ結果を返します。
+1. 同じプロセス内：最初のリクエスト（リーダー）の完了を Event で待つ
+2. ワーカープロセス間：SQLite の inflight_leases テーブルのリースで調整
+   - リースを取れたプロセスだけが実行し、結果をリースに保存
+   - 取れなかったプロセスは結果が保存されるまでポーリング
+   - リーダーが失敗・異常終了した場合は、リースの解放・期限切れ後に待機側が引き継ぐ
+"""
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Any, Optional
+
+import config
+from database import acquire_lease, complete_lease, release_lease, get_lease
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """同じプロセス内で実行中の呼び出し"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+_calls: Dict[str, _Call] = {}
+_lock = threading.Lock()
+
+
+def make_key(endpoint: str, question_id: str, normalized_answer: str = "", user_id: str = "") -> str:
+    """
+    single-flight のキーを生成
+
+    Args:
+        endpoint: エンドポイント名（correct / correct-multi / model_answer など）
+        question_id: 問題ID
+        normalized_answer: 正規化済みの回答（模範解答の場合は原文）
+        user_id: 利用者ID（結果を利用者ごとに保存するエンドポイントのみ指定）
+    """
+    answer_hash = hashlib.sha256(normalized_answer.encode("utf-8")).hexdigest()
+    if user_id:
+        return f"{endpoint}:{question_id}:{user_id}:{answer_hash}"
+    return f"{endpoint}:{question_id}:{answer_hash}"
+
+
+def run(key: str, func: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    同じキーの実行中の呼び出しがあればその結果を待ち、なければ func を実行する
+
+    Args:
+        key: make_key() で生成したキー
+        func: 結果の dict（JSONシリアライズ可能）を返す関数
+
+    Returns:
+        func の結果（同時に届いた同一リクエストには同じ結果）
+    """
+    if not config.SINGLEFLIGHT_ENABLED:
+        return func()
+
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        logger.info(f"Single-flight: waiting for in-flight call {key[:60]}")
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _run_with_lease(key, func)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _calls.pop(key, None)
+        call.done.set()
+
+
+# ===== 内部処理 =====
+
+def _run_with_lease(key: str, func: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """プロセス間のリースを取ってから実行（取れなければ他プロセスの結果を待つ）"""
+    owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    deadline = time.monotonic() + config.SINGLEFLIGHT_LEASE_SECONDS
+
+    while True:
+        if acquire_lease(key, owner, config.SINGLEFLIGHT_LEASE_SECONDS):
+            break
+
+        lease = get_lease(key)
+        if lease is not None and lease['status'] == 'done':
+            logger.info(f"Single-flight: reused result from {lease['owner']}")
+            return lease['result']
+
+        if time.monotonic() > deadline:
+            # 待ちすぎた場合はリースを無視して自分で実行する（結果は共有しない）
+            logger.warning(f"Single-flight: timed out waiting for {key[:60]}, running without lease")
+            return func()
+
+        time.sleep(config.SINGLEFLIGHT_POLL_INTERVAL)
+
+    try:
+        result = func()
+    except BaseException:
+        release_lease(key, owner)
+        raise
+
+    complete_lease(key, owner, result, config.SINGLEFLIGHT_RESULT_TTL)
+    return result
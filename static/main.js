@@ -5,6 +5,12 @@ const input = document.getElementById("user-input");
 const sendBtn = document.getElementById("send-btn");
 const wordCountEl = document.getElementById("word-count");
 
+// 語数カウンター（ルールはページに埋め込まれたサーバーと共通のJSON）
+const wordCounter = createWordCounter(
+  JSON.parse(document.getElementById("word-count-rules").textContent)
+);
+const LIVE_COUNT_DEBOUNCE_MS = 150;
+
 let currentQuestion = null;
 let currentQuestionId = null;
 let currentSentenceCount = null; // マルチ入力モードでの文数
@@ -17,6 +23,42 @@ sendBtn.addEventListener("click", () => {
   submitAnswer();
 });
 
+// 添削は非同期ジョブとして送信し、結果をポーリングで取得する
+// （長時間HTTP接続を開いたままにしないため、モバイル回線やプロキシで切断されても結果を失わない）
+const JOB_POLL_INTERVAL_MS = 1500;
+// ポーリングの上限（サーバーの JOB_STALE_SECONDS より長くし、通常はサーバー側の失敗判定を先に受け取る）
+const JOB_POLL_MAX_WAIT_MS = 16 * 60 * 1000;
+
+function postCorrectionJob(url, payload) {
+  return fetch(url + '?async=1', {
+    method: 'POST',
+    // X-API-Version: 2 → 送信した文をそのまま返すエコー項目を省いた応答
+    headers: { 'Content-Type': 'application/json', 'X-API-Version': '2' },
+    body: JSON.stringify(payload)
+  })
+  .then(res => res.json().then(data => ({ status: res.status, data })))
+  .then(({ status, data }) => {
+    // 202以外（バリデーションエラーや混雑など）はそのまま返す
+    if (status !== 202 || !data.status_url) return data;
+    console.log(`🕒 Job queued: ${data.job_id}`);
+    return pollJob(data.status_url, Date.now() + JOB_POLL_MAX_WAIT_MS);
+  });
+}
+
+function pollJob(statusUrl, deadline) {
+  if (Date.now() >= deadline) {
+    return Promise.resolve({ error: '添削が時間内に完了しませんでした。もう一度送信してください。' });
+  }
+  return new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+    .then(() => fetch(statusUrl))
+    .then(res => res.json())
+    .then(job => {
+      if (job.status === 'done') return job.result;
+      if (job.status === 'error' || !job.status) return { error: job.error || '添削に失敗しました' };
+      return pollJob(statusUrl, deadline);
+    });
+}
+
 // Enterキーは改行として動作（送信はボタンのみ）
 // キーボードショートカットでの送信は無効化（誤送信防止）
 
@@ -62,33 +104,22 @@ function normalizeUserInputForComparison(text) {
   return normalized.trim();
 }
 
+// 連続入力中の再計算を間引く（最後の入力から wait ミリ秒後に1回だけ実行）
+function debounce(fn, wait) {
+  let timer = null;
+  return (...args) => {
+    clearTimeout(timer);
+    timer = setTimeout(() => fn(...args), wait);
+  };
+}
+
 // 語数カウンター + 英語チェック
-input.addEventListener("input", () => {
+input.addEventListener("input", debounce(() => {
   let text = input.value.trim();
   
-  // 全角記号を半角に自動正規化
+  // 全角記号を半角に自動正規化（変換表はサーバーと共通）
   const originalText = text;
-  text = text.replace(/　/g, ' ')   // 全角スペース → 半角スペース
-             .replace(/ー/g, '-')   // 全角ハイフン → 半角ハイフン
-             .replace(/－/g, '-')   // 全角マイナス → 半角ハイフン
-             .replace(/—/g, '-')    // emダッシュ → 半角ハイフン
-             .replace(/–/g, '-')    // enダッシュ → 半角ハイフン
-             .replace(/！/g, '!')   // 全角感嘆符 → 半角感嘆符
-             .replace(/？/g, '?')   // 全角疑問符 → 半角疑問符
-             .replace(/．/g, '.')   // 全角ピリオド → 半角ピリオド
-             .replace(/。/g, '.')   // 全角句点 → 半角ピリオド
-             .replace(/，/g, ',')   // 全角カンマ → 半角カンマ
-             .replace(/、/g, ',')   // 全角読点 → 半角カンマ
-             .replace(/：/g, ':')   // 全角コロン → 半角コロン
-             .replace(/；/g, ';')   // 全角セミコロン → 半角セミコロン
-             .replace(/"/g, '"')    // 全角開き引用符 → 半角引用符
-             .replace(/"/g, '"')    // 全角閉じ引用符 → 半角引用符
-             .replace(/'/g, "'")    // 全角開きアポストロフィ → 半角アポストロフィ
-             .replace(/'/g, "'")    // 全角閉じアポストロフィ → 半角アポストロフィ
-             .replace(/（/g, '(')   // 全角括弧（開き） → 半角
-             .replace(/）/g, ')')   // 全角括弧（閉じ） → 半角
-             .replace(/［/g, '[')   // 全角角括弧（開き） → 半角
-             .replace(/］/g, ']');  // 全角角括弧（閉じ） → 半角
+  text = wordCounter.normalizePunctuation(text);
   
   // 正規化が行われた場合、テキストエリアを更新
   if (text !== originalText) {
@@ -98,9 +129,8 @@ input.addEventListener("input", () => {
     input.setSelectionRange(cursorPos, cursorPos);
   }
   
-  // バックエンドと同じ語数カウントロジック（句読点を除外）
-  const words = text.match(/\b[\w'-]+\b/g) || [];
-  const wordCount = words.filter(w => /[a-zA-Z]/.test(w)).length;
+  // サーバーと共通のルールで語数をカウント
+  const wordCount = wordCounter.countWords(text);
   
   // 英語チェック
   const isEnglish = isEnglishText(text);
@@ -147,7 +177,7 @@ input.addEventListener("input", () => {
   
   sendBtn.disabled = false;
   sendBtn.title = "添削を受ける";
-});
+}, LIVE_COUNT_DEBOUNCE_MS));
 
 // メッセージを追加
 function addMessage(content, type) {
@@ -502,11 +532,11 @@ async function renderMultiInputUI(questionData) {
     textarea.dataset.index = index;
     textarea.rows = 3;
     
-    textarea.addEventListener('input', () => {
+    textarea.addEventListener('input', debounce(() => {
       updateSentenceWordCount(index);
       updateSentenceStatus(index);
       updateProgressIndicator();
-    });
+    }, LIVE_COUNT_DEBOUNCE_MS));
     
     card.appendChild(textarea);
     
@@ -545,9 +575,7 @@ function updateSentenceWordCount(index) {
   
   if (!textarea || !wordCountEl) return;
   
-  const text = textarea.value.trim();
-  const words = text.match(/\b[\w'-]+\b/g) || [];
-  const wordCount = words.filter(w => /[a-zA-Z]/.test(w)).length;
+  const wordCount = wordCounter.countWords(textarea.value);
   
   wordCountEl.textContent = `${wordCount}語`;
 }
@@ -663,27 +691,18 @@ function submitMultiSentences() {
   // 添削リクエスト（ローディングメッセージを入力セクションの下に表示）
   showLoadingBelowInput();
   
-  // 語数をカウント
-  const words = combinedAnswer.match(/\b[\w'-]+\b/g) || [];
-  const wordCount = words.filter(w => /[a-zA-Z]/.test(w)).length;
+  // 語数をカウント（サーバーと共通のルール）
+  const wordCount = wordCounter.countWords(combinedAnswer);
   
   console.log(`📊 Word count: ${wordCount}`);
   console.log(`📤 Sending API request to /api/correct-multi...`);
   
-  fetch('/api/correct-multi', {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({
-      question_id: currentQuestionId,
-      user_sentences: userSentences,
-      japanese_sentences: japaneseSentences,
-      target_words: currentQuestion.target_words,
-      word_count: wordCount
-    })
-  })
-  .then(res => {
-    console.log(`📥 API response received, status: ${res.status}`);
-    return res.json();
+  postCorrectionJob('/api/correct-multi', {
+    question_id: currentQuestionId,
+    user_sentences: userSentences,
+    japanese_sentences: japaneseSentences,
+    target_words: currentQuestion.target_words,
+    word_count: wordCount
   })
   .then(data => {
     console.log(`✅ API response parsed successfully`);
@@ -893,9 +912,8 @@ function submitAnswer() {
     return;
   }
   
-  // 語数をカウント（バックエンドと同じロジック：句読点を除外）
-  const words = text.match(/\b[\w'-]+\b/g) || [];
-  const wordCount = words.filter(w => /[a-zA-Z]/.test(w)).length;
+  // 語数をカウント（サーバーと共通のルール）
+  const wordCount = wordCounter.countWords(text);
   
   // ユーザーの回答を表示
   addMessage(text, "user");
@@ -908,20 +926,15 @@ function submitAnswer() {
   // 添削リクエスト
   addMessage("🔍 添削中...（1~2分かかります）", "ai");
   
-  fetch('/api/correct', {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({
-      question_id: currentQuestionId,
-      japanese_sentences: currentQuestion.japanese_sentences || [],
-      japanese_paragraphs: currentQuestion.japanese_paragraphs || [],
-      question_text: currentQuestion.question_text || "",
-      user_answer: text,
-      target_words: currentQuestion.target_words,
-      word_count: wordCount  // フロントエンドで計算した語数を追加
-    })
+  postCorrectionJob('/api/correct', {
+    question_id: currentQuestionId,
+    japanese_sentences: currentQuestion.japanese_sentences || [],
+    japanese_paragraphs: currentQuestion.japanese_paragraphs || [],
+    question_text: currentQuestion.question_text || "",
+    user_answer: text,
+    target_words: currentQuestion.target_words,
+    word_count: wordCount  // フロントエンドで計算した語数を追加
   })
-  .then(res => res.json())
   .then(data => {
     // ローディングメッセージを削除
     chat.lastChild.remove();
@@ -0,0 +1,40 @@
+// 語数カウント共通ルール
+// サーバー（constraint_validator.py）と同じ data/word_count_rules.json を使うため、
+// ブラウザとサーバーの語数が一致する（/api/validate-constraints への問い合わせは不要）
+(function (root) {
+  // 正規表現の文字クラス内で特別な意味を持つ文字をエスケープ
+  function escapeForCharClass(ch) {
+    return ch.replace(/[\\\]^-]/g, '\\$&');
+  }
+
+  function createWordCounter(rules) {
+    const punctuationMap = rules.punctuation_map;
+    const punctuationRe = new RegExp(
+      '[' + Object.keys(punctuationMap).map(escapeForCharClass).join('') + ']',
+      'g'
+    );
+    const tokenRe = new RegExp(rules.word_token_pattern, 'g');
+    const letterRe = new RegExp(rules.english_letter_pattern);
+
+    // 全角記号を半角に正規化
+    function normalizePunctuation(text) {
+      if (!text) return text;
+      return text.replace(punctuationRe, ch => punctuationMap[ch]);
+    }
+
+    // 決定的な語数カウント（英字を1文字以上含むトークンのみ）
+    function countWords(text) {
+      if (!text || !text.trim()) return 0;
+      const tokens = normalizePunctuation(text).match(tokenRe) || [];
+      return tokens.filter(token => letterRe.test(token)).length;
+    }
+
+    return { version: rules.version, normalizePunctuation, countWords };
+  }
+
+  if (typeof module !== 'undefined' && module.exports) {
+    module.exports = { createWordCounter };
+  } else {
+    root.createWordCounter = createWordCounter;
+  }
+})(this);
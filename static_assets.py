@@ -0,0 +1,78 @@
+"""
+静的ファイルのフィンガープリント（内容のハッシュ入りURL）
+宮崎大学医学部英作文特訓システム
+
+従来は /static/ 配下をすべて no-store で配信しており、ページを開くたびに
+main.js・style.css・画像を再ダウンロードしていた。
+このモジュールは静的ファイルの内容のハッシュをファイル名に入れたURL
+（例: /assets/main.3f2a1b9c0d.js）を作り、そのURLは内容が変わらない限り
+ブラウザに無期限でキャッシュさせる（Cache-Control: immutable）。
+- テンプレートでは {{ asset_url('main.js') }} でURLを取得する
+- ハッシュはファイルの更新日時・サイズが変わったときだけ計算し直すので、
+  デプロイや開発中の編集はそのまま新しいURLに反映される
+- 古いHTMLが参照する古いハッシュのURLには、現在の内容を再検証付きで返す
+"""
+import re
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# ハッシュ入りファイル名（name.<10桁の16進>.ext、拡張子のないファイルは name.<10桁の16進>）
+HASH_LENGTH = 10
+_HASHED_NAME_RE = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)?$' % HASH_LENGTH)
+
+# filename → ((mtime_ns, size), hash)
+_hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_lock = threading.Lock()
+
+
+def file_hash(static_dir: Path, filename: str) -> Optional[str]:
+    """静的ファイルの内容のハッシュ（ファイルがなければ None）"""
+    path = Path(static_dir) / filename
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _hashes.get(filename)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:HASH_LENGTH]
+    with _lock:
+        _hashes[filename] = (signature, digest)
+    return digest
+
+
+def hashed_filename(static_dir: Path, filename: str) -> Optional[str]:
+    """main.js → main.3f2a1b9c0d.js、LICENSE → LICENSE.3f2a1b9c0d（ファイルがなければ None）"""
+    digest = file_hash(static_dir, filename)
+    if digest is None:
+        return None
+    # 拡張子はファイル名部分だけで判定する（img.v2/logo のようなディレクトリ名の「.」は無視）
+    directory, slash, name = filename.rpartition('/')
+    stem, dot, ext = name.rpartition('.')
+    if not dot or not stem:
+        return f"{filename}.{digest}"
+    return f"{directory}{slash}{stem}.{digest}.{ext}"
+
+
+def parse_hashed_filename(hashed: str) -> Optional[Tuple[str, str]]:
+    """main.3f2a1b9c0d.js → ("main.js", "3f2a1b9c0d")（ハッシュ入りでなければ None）"""
+    match = _HASHED_NAME_RE.match(hashed)
+    if not match:
+        return None
+    return f"{match.group('stem')}{match.group('ext') or ''}", match.group('hash')
+
+
+def build_manifest(static_dir: Path) -> Dict[str, str]:
+    """static/ 配下の全ファイルのハッシュ入りファイル名の対応表（起動時の事前計算・確認用）"""
+    static_dir = Path(static_dir)
+    manifest = {}
+    for path in sorted(static_dir.rglob('*')):
+        if path.is_file():
+            filename = path.relative_to(static_dir).as_posix()
+            manifest[filename] = hashed_filename(static_dir, filename)
+    return manifest
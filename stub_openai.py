@@ -0,0 +1,427 @@
+"""
+OpenAI 互換のスタブサーバー（負荷テスト・性能測定用）
+宮崎大学医学部英作文特訓システム
+
+call_openai_with_retry が使う /v1/chat/completions のサブセットだけを実装し、
+OpenAI API を呼ばずにアプリ全体（出題・添削・模範解答）を動かせるようにする。
+アプリ側は OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 を設定するだけでよい（openai SDK が読む）。
+- プロンプトの種類（question / correction / model_answer）を判定し、アプリの検証を通る応答を返す
+  - question: プロンプトで指定された theme・excerpt_type に合わせた問題
+  - correction: 学生の回答の文ごとに ✅ のポイント（回答に含まれる文をそのまま before にする）
+  - model_answer: 日本語原文の文数に合わせた translations
+  - --responses で種類ごとの固定応答（JSON）に差し替えられる
+- response_format: json_object / json_schema なら JSON のみ、未指定なら ```json で囲んで返す
+- stream: true なら SSE（chat.completion.chunk）で返す（stream_options.include_usage に対応）
+- 応答時間の分布: fixed:2 / uniform:1,3 / normal:2,0.5 / lognormal:2,0.5（中央値, σ）、種類ごとに指定可
+- 障害の注入（割合）: 429（Retry-After 付き）/ 500 / タイムアウト（応答せずに待ち続ける）/ 壊れたJSON
+- GET /stats で種類ごとの件数・注入した障害・最大同時処理数を返す
+
+注意: 同じ本文の問題を返すため、アプリ側で NEAR_DUPLICATE_THRESHOLD を 1 より大きくして
+近似重複の判定を無効にしないと、2問目以降は再生成→フォールバック問題になる。
+
+使い方:
+    python stub_openai.py --port 8900 --latency lognormal:1.5,0.4 --latency-for question=fixed:4 \
+                          --rate-429 0.05 --rate-timeout 0.01 --rate-malformed 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=sk-stub python app.py
+"""
+import re
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+PROMPT_TYPES = ["question", "correction", "model_answer"]
+
+# 問題の段落数（excerpt_type ごと、models.QuestionResponse の検証と同じ）
+_PARAGRAPH_COUNTS = {"P1_ONLY": 1, "P2_P3": 2, "P3_ONLY": 1, "P4_P5": 2, "MIDDLE": 1}
+
+_QUESTION_PARAGRAPHS = [
+    "ある研究によると、毎朝決まった時間に日光を浴びる人は夜によく眠れる傾向がある。研究者たちは、体内時計が整うことが理由だと考えている。",
+    "その研究では、大学生二百人を二つのグループに分けて比較した。一方のグループには起床後すぐに散歩をするよう指示した。",
+]
+
+_HINTS = [
+    {"en": "sunlight", "ja": "日光", "pos": "名詞"},
+    {"en": "tend to", "ja": "〜する傾向がある", "pos": "動詞句", "usage": "tend to do「〜しがちである」"},
+    {"en": "body clock", "ja": "体内時計", "pos": "名詞"},
+]
+
+
+# ===== 応答時間の分布 =====
+
+def parse_latency(spec: str):
+    """応答時間の指定（fixed:2 / uniform:1,3 / normal:2,0.5 / lognormal:2,0.5 / 2）を、秒を返す関数にする"""
+    kind, _, params = spec.partition(":")
+    if not params:
+        kind, params = "fixed", kind
+    values = [float(v) for v in params.split(",")]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        # values[0] は中央値（秒）
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"未対応の応答時間の分布です: {spec}")
+
+
+# ===== プロンプトの種類と応答 =====
+
+def classify_prompt(messages: List[Dict[str, Any]]) -> str:
+    """プロンプトの種類を判定（question / correction / model_answer / unknown）"""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") == "user")
+    if "**学生の回答" in prompt:
+        return "correction"
+    if '"translations"' in prompt and "# 日本語原文" in prompt:
+        return "model_answer"
+    if "excerpt_type" in prompt and "今回のthemeは以下に決定されました" in prompt:
+        return "question"
+    return "unknown"
+
+
+def _section(prompt: str, pattern: str) -> str:
+    match = re.search(pattern, prompt, re.S)
+    return match.group(1).strip() if match else ""
+
+
+def build_question(prompt: str) -> Dict[str, Any]:
+    """指定された theme・excerpt_type の問題"""
+    theme = _section(prompt, r"今回のthemeは以下に決定されました：\s*\*\*(.+?)\*\*") or "ブログ"
+    excerpt_type = _section(prompt, r"今回のexcerpt_typeは以下に決定されました：\s*\*\*(.+?)\*\*") or "P1_ONLY"
+    count = _PARAGRAPH_COUNTS.get(excerpt_type, 1)
+    return {
+        "theme": theme,
+        "topic_label": "C",
+        "excerpt_type": excerpt_type,
+        "japanese_paragraphs": _QUESTION_PARAGRAPHS[:count],
+        "hints": _HINTS,
+        "target_words": {"min": 60, "max": 90},
+    }
+
+
+def build_correction(prompt: str) -> Dict[str, Any]:
+    """回答の文ごとに ✅ のポイントを付けた添削結果"""
+    answer = _section(prompt, r"\*\*学生の回答[^\n]*\n(.*?)\n\s*---")
+    sentences = [
+        s.strip() for line in answer.split("\n")
+        for s in re.split(r"(?<=[.!?])\s+", line) if s.strip()
+    ]
+    points = [{
+        "before": sentence,
+        "after": sentence,
+        "reason": "文法・語法ともに適切で、原文の内容を正確に表しています。",
+        "level": "✅正しい表現",
+    } for sentence in sentences]
+    return {
+        "original": answer,
+        "corrected": answer,
+        "points": points,
+        "model_answer": "People who get sunlight every morning tend to sleep well at night.",
+        "model_answer_explanation": "スタブの模範解答です。",
+    }
+
+
+def build_model_answer(prompt: str) -> Dict[str, Any]:
+    """日本語原文の文数に合わせた構造化出力の模範解答"""
+    text = _section(prompt, r"# 日本語原文\n(.*?)\n# ")
+    sentences = [s for s in re.split(r"(?<=[。？！])", text.replace("\n", "")) if s.strip()]
+    return {"translations": [{
+        "sentence_id": i,
+        "japanese": japanese,
+        "english": f"This is the stub translation of sentence {i}.",
+        "explanation": "stub（名詞：代役）で、スタブの解説です。",
+    } for i, japanese in enumerate(sentences, start=1)]}
+
+
+BUILDERS = {
+    "question": build_question,
+    "correction": build_correction,
+    "model_answer": build_model_answer,
+}
+
+
+class StubSettings:
+    """スタブの動作設定（サーバー全体で共有）"""
+
+    def __init__(
+        self,
+        latency: str = "0",
+        latency_for: Optional[Dict[str, str]] = None,
+        rate_429: float = 0.0,
+        rate_500: float = 0.0,
+        rate_timeout: float = 0.0,
+        rate_malformed: float = 0.0,
+        hang_seconds: float = 600.0,
+        stream_chunk_delay: float = 0.01,
+        responses: Optional[Dict[str, Any]] = None,
+    ):
+        self.latency = parse_latency(latency)
+        self.latency_for = {kind: parse_latency(spec) for kind, spec in (latency_for or {}).items()}
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.rate_timeout = rate_timeout
+        self.rate_malformed = rate_malformed
+        self.hang_seconds = hang_seconds
+        self.stream_chunk_delay = stream_chunk_delay
+        self.responses = responses or {}
+
+    def sample_latency(self, kind: str) -> float:
+        return self.latency_for.get(kind, self.latency)()
+
+    def content_for(self, kind: str, messages: List[Dict[str, Any]]) -> str:
+        """種類ごとの応答本文（固定応答が指定されていればそれを返す）"""
+        if kind in self.responses:
+            canned = self.responses[kind]
+            return canned if isinstance(canned, str) else json.dumps(canned, ensure_ascii=False)
+        prompt = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") == "user")
+        builder = BUILDERS.get(kind)
+        data = builder(prompt) if builder else {"message": "stub response"}
+        return json.dumps(data, ensure_ascii=False)
+
+
+class StubStats:
+    """スタブ側で観測した件数（スレッド間で共有）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.injected = {"429": 0, "500": 0, "timeout": 0, "malformed": 0}
+            self.in_flight = 0
+            self.peak_in_flight = 0
+
+    def enter(self, kind: str):
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def inject(self, fault: str):
+        with self.lock:
+            self.injected[fault] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "injected": dict(self.injected),
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+            }
+
+
+def _estimate_tokens(text: str) -> int:
+    """トークン数の概算（日本語混じりのため4文字≒1トークンより多めに見積もる）"""
+    return max(1, len(text) // 3)
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """POST /v1/chat/completions・GET /v1/models・GET /stats"""
+
+    settings = StubSettings()
+    stats = StubStats()
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o", "object": "model", "owned_by": "stub"}]})
+        elif self.path == "/stats":
+            self._send_json(200, self.stats.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        try:
+            request = json.loads(body)
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "invalid JSON body", "type": "invalid_request_error"}})
+            return
+
+        messages = request.get("messages", [])
+        kind = classify_prompt(messages)
+        settings, stats = self.settings, self.stats
+        stats.enter(kind)
+        try:
+            fault = self._pick_fault()
+            if fault == "429":
+                stats.inject("429")
+                self._send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error",
+                                                "code": "rate_limit_exceeded"}}, {"Retry-After": "1"})
+                return
+            if fault == "500":
+                stats.inject("500")
+                self._send_json(500, {"error": {"message": "Internal server error (stub)", "type": "server_error"}})
+                return
+            if fault == "timeout":
+                # 応答せずに待ち続け、クライアント側のタイムアウトを起こす
+                stats.inject("timeout")
+                time.sleep(settings.hang_seconds)
+                self.close_connection = True
+                return
+
+            time.sleep(settings.sample_latency(kind))
+            content = settings.content_for(kind, messages)
+            if fault == "malformed":
+                stats.inject("malformed")
+                content = content[:max(1, len(content) // 2)]
+            if (request.get("response_format") or {}).get("type") not in ("json_object", "json_schema"):
+                content = f"```json\n{content}\n```"
+
+            usage = {
+                "prompt_tokens": sum(_estimate_tokens(str(m.get("content", ""))) for m in messages),
+                "completion_tokens": _estimate_tokens(content),
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            model = request.get("model", "gpt-4o")
+            if request.get("stream"):
+                include_usage = (request.get("stream_options") or {}).get("include_usage", False)
+                self._send_stream(model, content, usage if include_usage else None)
+            else:
+                self._send_json(200, {
+                    "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage,
+                })
+        except (BrokenPipeError, ConnectionResetError):
+            # クライアントがタイムアウトで切断した
+            pass
+        finally:
+            stats.leave()
+
+    def _pick_fault(self) -> Optional[str]:
+        roll = random.random()
+        for fault, rate in (("429", self.settings.rate_429), ("500", self.settings.rate_500),
+                            ("timeout", self.settings.rate_timeout), ("malformed", self.settings.rate_malformed)):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+    def _send_json(self, status: int, data: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, model: str, content: str, usage: Optional[Dict[str, int]]):
+        """SSE（chat.completion.chunk）で少しずつ返す"""
+        chunk_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        def chunk(delta, finish_reason=None, **extra):
+            data = {"id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else []}
+            data.update(extra)
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        self.wfile.write(chunk({"role": "assistant", "content": ""}))
+        for i in range(0, len(content), 64):
+            self.wfile.write(chunk({"content": content[i:i + 64]}))
+            self.wfile.flush()
+            if self.settings.stream_chunk_delay:
+                time.sleep(self.settings.stream_chunk_delay)
+        self.wfile.write(chunk({}, "stop"))
+        if usage is not None:
+            self.wfile.write(chunk(None, usage=usage))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(settings: StubSettings, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """スタブをバックグラウンドのスレッドで起動し、(サーバー, OPENAI_BASE_URL に設定するURL) を返す"""
+    StubOpenAIHandler.settings = settings
+    StubOpenAIHandler.stats.reset()
+    server = ThreadingHTTPServer((host, port), StubOpenAIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    """スタブの設定用の引数（loadtest_api.py と共通）"""
+    parser.add_argument("--latency", default="0", help="応答時間の分布（秒）: fixed:2 / uniform:1,3 / normal:2,0.5 / lognormal:2,0.5")
+    parser.add_argument("--latency-for", action="append", default=[], metavar="TYPE=SPEC",
+                        help=f"プロンプトの種類ごとの応答時間（{'/'.join(PROMPT_TYPES)}、複数指定可）")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="429 を返す割合")
+    parser.add_argument("--rate-500", type=float, default=0.0, help="500 を返す割合")
+    parser.add_argument("--rate-timeout", type=float, default=0.0, help="応答しない（タイムアウトさせる）割合")
+    parser.add_argument("--rate-malformed", type=float, default=0.0, help="途中で切れたJSONを返す割合")
+    parser.add_argument("--hang-seconds", type=float, default=600.0, help="タイムアウト注入時に待つ秒数")
+    parser.add_argument("--responses", type=Path, help="種類ごとの固定応答（{\"question\": {...}, ...} のJSON）")
+
+
+def settings_from_args(args: argparse.Namespace) -> StubSettings:
+    latency_for = dict(item.split("=", 1) for item in args.latency_for)
+    unknown = set(latency_for) - set(PROMPT_TYPES)
+    if unknown:
+        raise ValueError(f"未対応のプロンプトの種類です: {', '.join(sorted(unknown))}")
+    return StubSettings(
+        latency=args.latency,
+        latency_for=latency_for,
+        rate_429=args.rate_429,
+        rate_500=args.rate_500,
+        rate_timeout=args.rate_timeout,
+        rate_malformed=args.rate_malformed,
+        hang_seconds=args.hang_seconds,
+        responses=json.loads(args.responses.read_text(encoding="utf-8")) if args.responses else None,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 互換のスタブサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_server(settings_from_args(args), args.host, args.port)
+    print(f"OpenAI stub listening: OPENAI_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
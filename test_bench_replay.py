@@ -0,0 +1,77 @@
+"""
+添削パイプラインのオフライン・リプレイ計測（bench_replay.py）のテスト
+"""
+import json
+
+import pytest
+
+import config
+import database
+import debug_capture
+import llm_service
+import bench_replay
+
+RESPONSE = json.dumps({
+    "original": "I think smartphones are harmful to sleep quality.",
+    "corrected": "I think smartphones are harmful to sleep quality.",
+    "points": [{
+        "before": "I think smartphones are harmful to sleep quality.",
+        "after": "I think smartphones are harmful to sleep quality.",
+        "reason": "文法・語法ともに正しい表現です。主語と動詞の対応も適切です。",
+        "level": "✅正しい表現",
+    }],
+    "model_answer": "Smartphones can harm the quality of sleep.",
+}, ensure_ascii=False)
+
+REQUEST = {
+    "question_id": "q_replay",
+    "japanese_sentences": ["スマートフォンは睡眠の質に悪影響を与えると思う。"],
+    "user_answer": "I think smartphones are harmful to sleep quality.",
+    "target_words": {"min": 10, "max": 160},
+}
+
+
+@pytest.fixture
+def replay_env(temp_db, tmp_path, monkeypatch):
+    """一時DB・差し替えクライアント・キャプチャ済みのアーカイブを用意"""
+    monkeypatch.setattr(config, "CORRECTION_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "DEBUG_CAPTURE_ENABLED", True)
+    monkeypatch.setattr(config, "DEBUG_CAPTURE_DIR", tmp_path)
+    monkeypatch.setattr(llm_service, "_client", None)
+    monkeypatch.setattr(llm_service, "_client_pid", None)
+
+    assert debug_capture.capture_llm_response("r_replay", 1, RESPONSE, request=REQUEST)
+    assert debug_capture.flush()
+    monkeypatch.setattr(config, "DEBUG_CAPTURE_ENABLED", False)
+    bench_replay.install_replay_client()
+    return tmp_path / debug_capture.ARCHIVE_NAME
+
+
+def test_load_corpus_reads_captured_request(replay_env):
+    """request 付きでキャプチャした応答がリプレイ対象になる"""
+    corpus = bench_replay.load_corpus([replay_env])
+    captured = [sample for sample in corpus if sample["name"] == "r_replay"]
+    assert len(captured) == 1
+    assert captured[0]["submission"].question_id == "q_replay"
+    assert captured[0]["response"] == RESPONSE
+
+
+def test_run_stages_times_every_stage(replay_env):
+    """全段階の時間を返し、添削結果がDBに保存される"""
+    sample = next(s for s in bench_replay.load_corpus([replay_env]) if s["name"] == "r_replay")
+    timings = bench_replay.run_stages(sample)
+    assert list(timings) == bench_replay.STAGES
+    assert all(elapsed >= 0 for elapsed in timings.values())
+
+    with database.get_db_connection() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM submissions WHERE question_id = 'q_replay'").fetchone()[0]
+    assert count == 1
+
+
+def test_run_concurrent_reports_throughput(replay_env):
+    """並列実行のスループットとパーセンタイルを返す"""
+    corpus = [s for s in bench_replay.load_corpus([replay_env]) if s["name"] == "r_replay"]
+    result = bench_replay.run_concurrent(corpus, threads=2, iterations=4)
+    assert result["requests"] == 4
+    assert result["throughput_rps"] > 0
+    assert result["p50_ms"] <= result["p95_ms"] <= result["max_ms"]
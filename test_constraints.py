@@ -9,7 +9,10 @@ from constraint_validator import (
     detect_because_clauses,
     detect_sentence_boundaries,
     detect_two_units,
-    validate_constraints
+    validate_constraints,
+    validate_constraints_batch,
+    normalize_punctuation,
+    scan_text
 )
 
 
@@ -314,6 +317,66 @@ def test_edge_case_one_word_under():
     assert result["within_word_range"] is False
 
 
+# ===== 統合スキャナーテスト =====
+
+def test_scan_text_matches_individual_detectors():
+    """1回の走査で個別の検出関数と同じ結果が得られる"""
+    text = "First of all, I agree because it is cheap. Secondly, it is fun as well! Also, since it is easy, I like it. "
+    scan = scan_text(normalize_punctuation(text))
+    assert scan["markers"] == detect_discourse_markers(text)
+    assert scan["because_count"] == detect_because_clauses(text) == 2
+    assert scan["sentence_count"] == detect_sentence_boundaries(text) == 3
+
+
+def test_scan_text_trailing_punctuation():
+    """末尾の記号のみの区間も1文として数える（従来の strip → split と同じ）"""
+    assert detect_sentence_boundaries("I like cats. ? ") == 2
+    assert detect_sentence_boundaries("") == 0
+
+
+def test_normalize_curly_quotes():
+    """全角引用符・アポストロフィを半角に変換し、短縮形を1語と数える"""
+    assert normalize_punctuation("\u201cdon\u2019t\u201d") == '"don\'t"'
+    assert deterministic_word_count("I don\u2019t know.") == 3
+
+
+# ===== 一括検証テスト =====
+
+def test_markers_nested_first_of_all():
+    """First of all は First としても検出される（統合パターンでも従来と同じ結果）"""
+    markers = detect_discourse_markers("First of all, I agree. Another reason is cost.")
+    assert [m[0] for m in markers] == ["First", "First of all", "Another", "Another reason is"]
+
+
+def test_batch_matches_single_validation():
+    """一括検証の結果は単体検証と一致し、入力順を保つ"""
+    texts = [
+        "First, it is good. Second, it is cheap.",
+        " ".join(["word"] * 50),
+        "",
+        "I like it because it is fun and since it is easy.",
+    ]
+    results = validate_constraints_batch(texts, min_words=10, max_words=120, required_units=2)
+    assert len(results) == len(texts)
+    for text, result in zip(texts, results):
+        assert result == validate_constraints(text, min_words=10, max_words=120, required_units=2)
+
+
+def test_batch_with_process_pool(monkeypatch):
+    """プロセスプール経由でも入力順が保たれる"""
+    import constraint_validator
+    monkeypatch.setattr(constraint_validator, "BATCH_PROCESS_THRESHOLD", 2)
+    texts = [" ".join(["word"] * n) for n in range(1, 30)]
+    results = validate_constraints_batch(texts, min_words=10, max_words=20, max_workers=2)
+    assert [r["word_count"] for r in results] == list(range(1, 30))
+
+    # 2回目以降は同じプロセスプールを使い回す
+    pool = constraint_validator._process_pool
+    results = validate_constraints_batch(texts[:5], min_words=10, max_words=20, max_workers=2)
+    assert [r["word_count"] for r in results] == list(range(1, 6))
+    assert constraint_validator._process_pool is pool
+
+
 if __name__ == "__main__":
     # pytestがない環境でも実行可能
     print("Running constraint validation tests...")
@@ -0,0 +1,140 @@
+"""
+添削結果キャッシュ（完全一致）のテスト
+"""
+import json
+
+import pytest
+
+import config
+import correction_cache
+import database
+import llm_service
+from models import SubmissionRequest
+
+LLM_RESPONSE = json.dumps({
+    "corrected": "I am a student.",
+    "points": [{
+        "japanese_sentence": "私は学生です。",
+        "before": "I am student.",
+        "after": "I am a student.",
+        "reason": "可算名詞の単数形には冠詞 a が必要です。",
+        "level": "❌文法ミス"
+    }],
+    "model_answer": "I am a student.",
+    "model_answer_explanation": "1文目: I am a student."
+}, ensure_ascii=False)
+
+
+@pytest.fixture
+def llm_calls(temp_db, monkeypatch):
+    """一時DBに切り替え、LLM呼び出しを固定応答に置き換えて呼び出し回数を記録"""
+    monkeypatch.setattr(config, "CORRECTION_CACHE_ENABLED", True)
+    monkeypatch.setattr(correction_cache, "_stale_purged", False)
+
+    calls = []
+
+    def fake_call(prompt, **kwargs):
+        calls.append(prompt)
+        return LLM_RESPONSE
+
+    monkeypatch.setattr(llm_service, "call_openai_with_retry", fake_call)
+    return calls
+
+
+def submit(user_answer, word_count=None):
+    return llm_service.correct_answer(SubmissionRequest(
+        question_id="q_test",
+        japanese_sentences=["私は学生です。"],
+        user_answer=user_answer,
+        target_words={"min": 1, "max": 120},
+        word_count=word_count
+    ))
+
+
+def test_identical_submission_served_from_cache(llm_calls):
+    """同じ問題への同じ回答は2回目以降LLMを呼ばない"""
+    first = submit("I am student.")
+    second = submit("I am student.")
+
+    assert len(llm_calls) == 1
+    assert second.model_dump() == first.model_dump()
+
+
+def test_normalization_identical_submission_uses_own_input(llm_calls):
+    """正規化後に同一なら再利用し、original_before は今回の入力から取り直す"""
+    submit("I am student.")
+    second = submit("i am student")
+
+    assert len(llm_calls) == 1
+    assert second.points[0].original_before == "i am student"
+
+
+def test_word_count_is_part_of_key(llm_calls):
+    """語数はプロンプトに含まれるため、同じ回答でも語数が違えば再度LLMを呼ぶ"""
+    submit("I am student.", word_count=3)
+    submit("I am student.", word_count=3)
+    submit("I am student.", word_count=4)
+
+    assert len(llm_calls) == 2
+
+
+def test_prune_expired_and_least_recently_used(llm_calls):
+    """期限切れのキャッシュと、上限件数を超えた古いキャッシュを削除する"""
+    version = correction_cache.get_prompt_version()
+    for i in range(5):
+        database.save_cached_correction("q", f"a{i}", version, {"n": i})
+    with database.get_db_connection() as conn:
+        conn.execute("UPDATE correction_cache SET created_at = datetime('now', '-2 days')")
+        conn.execute("UPDATE correction_cache SET created_at = datetime('now', '-40 days') WHERE answer_hash = 'a0'")
+        conn.commit()
+    # a1 は古いが最近使われている
+    assert database.get_cached_correction("q", "a1", version) == {"n": 1}
+
+    assert database.prune_correction_cache(ttl_days=30, max_entries=2) == 3
+    with database.get_db_connection() as conn:
+        remaining = sorted(row[0] for row in conn.execute("SELECT answer_hash FROM correction_cache"))
+    assert len(remaining) == 2
+    assert remaining[0] == "a1" and "a0" not in remaining
+
+
+def test_prompt_change_invalidates_cache(llm_calls, monkeypatch):
+    """プロンプト版が変わると再度LLMを呼び、古い版のキャッシュは削除される"""
+    submit("I am student.")
+    monkeypatch.setattr(correction_cache, "_prompt_version", "v1-changed")
+    monkeypatch.setattr(correction_cache, "_stale_purged", False)
+    submit("I am student.")
+
+    assert len(llm_calls) == 2
+    with database.get_db_connection() as conn:
+        versions = [row[0] for row in conn.execute("SELECT prompt_version FROM correction_cache")]
+    assert versions == ["v1-changed"]
+
+
+def test_prompt_version_tracks_prompt_file():
+    """プロンプト版は添削・模範解答プロンプトファイルの内容から決まる"""
+    version = correction_cache.get_prompt_version()
+    assert version.startswith(f"v{correction_cache.CACHE_FORMAT_VERSION}-")
+    assert version == correction_cache.get_prompt_version()
+
+
+def test_model_answer_prompt_edit_changes_version(tmp_path, monkeypatch):
+    """get_prompts() が使う模範解答プロンプト（prompts_translation.py）を編集すると版が変わる"""
+    original = correction_cache._prompt_file
+    source = original("prompts_translation").read_text(encoding="utf-8")
+    assert "MODEL_ANSWER_PROMPT_MIYAZAKI_TRANSLATION" in source
+    before = correction_cache.compute_prompt_version()
+
+    edited = tmp_path / "prompts_translation.py"
+    edited.write_text(source.replace("MODEL_ANSWER_PROMPT_MIYAZAKI_TRANSLATION = ", "MODEL_ANSWER_PROMPT_MIYAZAKI_TRANSLATION = \"編集\" + ", 1), encoding="utf-8")
+    monkeypatch.setattr(
+        correction_cache, "_prompt_file",
+        lambda name: edited if name == "prompts_translation" else original(name)
+    )
+    assert correction_cache.compute_prompt_version() != before
+
+
+def test_inline_prompt_edit_changes_version(monkeypatch):
+    """llm_service 内の再プロンプト・システムメッセージを編集しても版が変わる"""
+    before = correction_cache.compute_prompt_version()
+    monkeypatch.setattr(llm_service, "REPROMPT_TEMPLATE", llm_service.REPROMPT_TEMPLATE + "\n追加の指示")
+    assert correction_cache.compute_prompt_version() != before
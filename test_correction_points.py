@@ -0,0 +1,102 @@
+"""
+添削ポイントの行単位保存とジャンル別集計のテスト
+"""
+import pytest
+
+import database
+from models import CorrectionPoint, CorrectionResponse
+
+
+@pytest.fixture
+def temp_db(temp_db):
+    """共通の一時DBに2ジャンルの問題を登録"""
+    with database.get_db_connection() as conn:
+        for question_id, theme in [("q_1", "医療倫理"), ("q_2", "公衆衛生")]:
+            conn.execute("""
+                INSERT INTO questions (id, theme, japanese_sentences, hints, target_words)
+                VALUES (?, ?, '["文"]', '[]', '{}')
+            """, (question_id, theme))
+        conn.commit()
+
+
+def make_correction(*levels):
+    return CorrectionResponse(
+        original="I am student.",
+        corrected="I am a student.",
+        word_count=3,
+        points=[
+            CorrectionPoint(
+                japanese_sentence="私は学生です。",
+                before="I am student.",
+                after="I am a student.",
+                reason="冠詞が必要です。",
+                level=level,
+                sentence_no=1,
+            )
+            for level in levels
+        ]
+    )
+
+
+def test_points_saved_with_submission(temp_db):
+    """提出の保存と同時に各ポイントが1行ずつ保存され、提出の削除で消える"""
+    submission_id = database.save_submission(
+        "q_1", "I am student.", make_correction("❌文法ミス", "✅正しい表現"), user_id="student_a"
+    )
+
+    with database.get_db_connection() as conn:
+        rows = conn.execute("""
+            SELECT point_no, question_id, user_id, sentence_no, level, before_text, after_text
+            FROM correction_points WHERE submission_id = ? ORDER BY point_no
+        """, (submission_id,)).fetchall()
+        assert [dict(row) for row in rows] == [
+            {"point_no": 1, "question_id": "q_1", "user_id": "student_a", "sentence_no": 1,
+             "level": "❌文法ミス", "before_text": "I am student.", "after_text": "I am a student."},
+            {"point_no": 2, "question_id": "q_1", "user_id": "student_a", "sentence_no": 1,
+             "level": "✅正しい表現", "before_text": "I am student.", "after_text": "I am a student."},
+        ]
+
+        conn.execute("DELETE FROM submissions WHERE id = ?", (submission_id,))
+        conn.commit()
+        assert conn.execute("SELECT COUNT(*) FROM correction_points").fetchone()[0] == 0
+
+
+def test_error_statistics_by_theme(temp_db):
+    """ジャンルごとに誤りの種類を多い順に集計（✅ は数えない）"""
+    database.save_submission("q_1", "a", make_correction("❌文法ミス", "❌文法ミス", "❌修正必須"), user_id="student_a")
+    database.save_submission("q_2", "b", make_correction("❌修正必須", "✅正しい表現"), user_id="student_b")
+
+    assert database.get_error_statistics() == [
+        {"theme": "公衆衛生", "level": "❌修正必須", "count": 1},
+        {"theme": "医療倫理", "level": "❌文法ミス", "count": 2},
+        {"theme": "医療倫理", "level": "❌修正必須", "count": 1},
+    ]
+    all_levels = database.get_error_statistics(theme="公衆衛生", errors_only=False)
+    assert sorted(row["level"] for row in all_levels) == ["✅正しい表現", "❌修正必須"]
+    assert database.get_error_statistics(user_id="student_b") == [
+        {"theme": "公衆衛生", "level": "❌修正必須", "count": 1},
+    ]
+
+
+def test_level_lookup_uses_index(temp_db):
+    """レベル別の件数は idx_correction_points_level から数える"""
+    with database.get_db_connection() as conn:
+        plan = conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT question_id, COUNT(*) FROM correction_points WHERE level = ? GROUP BY question_id
+        """, ("❌文法ミス",)).fetchall()
+    assert any("COVERING INDEX idx_correction_points_level" in row["detail"] for row in plan)
+
+
+def test_error_statistics_seeks_level_index(temp_db):
+    """誤りのみの集計は LIKE の全件走査ではなく、idx_correction_points_level を範囲検索する"""
+    for theme in (None, "医療倫理"):
+        query, params = database.build_error_statistics_query(theme=theme)
+        with database.get_db_connection() as conn:
+            plan = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+        assert any("SEARCH p USING COVERING INDEX idx_correction_points_level (level>? AND level<?)" in detail
+                   for detail in plan), plan
+
+    # 範囲の境界：❌ で始まるレベルだけを数える
+    database.save_submission("q_1", "a", make_correction("❌", "❌文法ミス", "❍", "✅正しい表現", ""), user_id="student_a")
+    assert sorted(row["level"] for row in database.get_error_statistics()) == ["❌", "❌文法ミス"]
@@ -0,0 +1,22 @@
+"""
+データベース操作のスレッドセーフ性テスト（gthread/gevent ワーカー想定）
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+
+def test_wal_mode_enabled(temp_db):
+    """同時読み書きのためWALモードになっている"""
+    with database.get_db_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_record_used_theme_concurrent(temp_db):
+    """複数スレッドから同じテーマを記録しても、回数が欠けずエラーにならない"""
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda _: database.record_used_theme("医療AI", "general"), range(64)))
+
+    with database.get_db_connection() as conn:
+        row = conn.execute("SELECT count FROM used_themes WHERE theme = ?", ("医療AI",)).fetchone()
+    assert row["count"] == 64
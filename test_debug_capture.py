@@ -0,0 +1,93 @@
+"""
+LLM応答デバッグ保存（非同期キャプチャ）のテスト
+"""
+import pytest
+
+import config
+import debug_capture
+
+
+@pytest.fixture
+def capture_dir(tmp_path, monkeypatch):
+    """キャプチャ先を一時ディレクトリに切り替えて有効化"""
+    monkeypatch.setattr(config, "DEBUG_CAPTURE_ENABLED", True)
+    monkeypatch.setattr(config, "DEBUG_CAPTURE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(config, "DEBUG_CAPTURE_DIR", tmp_path)
+    return tmp_path
+
+
+def test_should_capture_disabled(monkeypatch):
+    """無効時はサンプリングしない"""
+    monkeypatch.setattr(config, "DEBUG_CAPTURE_ENABLED", False)
+    assert debug_capture.should_capture() is False
+
+
+def test_should_capture_sample_rate(capture_dir, monkeypatch):
+    """サンプリング率0なら保存しない、1なら必ず保存する"""
+    assert debug_capture.should_capture() is True
+    monkeypatch.setattr(config, "DEBUG_CAPTURE_SAMPLE_RATE", 0.0)
+    assert debug_capture.should_capture() is False
+
+
+def test_capture_writes_compressed_archive(capture_dir):
+    """同じリクエストIDの全試行がアーカイブに保存される"""
+    capture_id = debug_capture.new_capture_id()
+    assert debug_capture.capture_llm_response(capture_id, 1, '{"points": []}')
+    assert debug_capture.capture_llm_response(capture_id, 2, '{"points": [1]}')
+    assert debug_capture.flush()
+
+    records = debug_capture.read_archive(capture_dir / debug_capture.ARCHIVE_NAME)
+    assert [(r["capture_id"], r["attempt"], r["response"]) for r in records] == [
+        (capture_id, 1, '{"points": []}'),
+        (capture_id, 2, '{"points": [1]}'),
+    ]
+
+
+def test_capture_rotates_archive(capture_dir, monkeypatch):
+    """上限サイズを超えたらローテーションし、古いものは backup_count 個まで残す"""
+    monkeypatch.setattr(config, "DEBUG_CAPTURE_MAX_BYTES", 1)
+    monkeypatch.setattr(config, "DEBUG_CAPTURE_BACKUP_COUNT", 2)
+
+    for attempt in range(1, 5):
+        debug_capture.capture_llm_response("r_test", attempt, "x" * 100)
+        assert debug_capture.flush()
+
+    archive = capture_dir / debug_capture.ARCHIVE_NAME
+    assert [r["attempt"] for r in debug_capture.read_archive(archive)] == [4]
+    assert [r["attempt"] for r in debug_capture.read_archive(capture_dir / "llm_responses.1.jsonl.gz")] == [3]
+    assert [r["attempt"] for r in debug_capture.read_archive(capture_dir / "llm_responses.2.jsonl.gz")] == [2]
+    assert not (capture_dir / "llm_responses.3.jsonl.gz").exists()
+
+
+def _write_from_process(capture_dir, worker: int, count: int):
+    """別プロセス（gunicorn ワーカー相当）から同じアーカイブに書き込む"""
+    config.DEBUG_CAPTURE_DIR = capture_dir
+    config.DEBUG_CAPTURE_MAX_BYTES = 2000
+    config.DEBUG_CAPTURE_BACKUP_COUNT = 1000
+    for i in range(count):
+        debug_capture._write_records([
+            {"capture_id": f"w{worker}_{i}", "attempt": 1, "response": "x" * 200},
+            {"capture_id": f"w{worker}_{i}", "attempt": 2, "response": "y" * 200},
+        ])
+
+
+def test_capture_multiple_processes_share_archive(capture_dir):
+    """複数プロセスが同時に追記・ローテーションしても、アーカイブが壊れず1件も失われない"""
+    import multiprocessing
+
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=_write_from_process, args=(capture_dir, worker, 100))
+        for worker in range(6)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    archives = sorted(capture_dir.glob("llm_responses*.jsonl.gz"))
+    assert len(archives) > 2  # ローテーションが起きている
+    records = [r for archive in archives for r in debug_capture.read_archive(archive)]
+    assert len(records) == 6 * 100 * 2
+    assert len({(r["capture_id"], r["attempt"]) for r in records}) == 6 * 100 * 2
@@ -0,0 +1,68 @@
+"""
+分析用エクスポート（CSV.gz）のテスト
+"""
+import csv
+import gzip
+
+import pytest
+
+import database
+import export_analytics
+from models import CorrectionPoint, CorrectionResponse
+
+
+def read_csv_gz(path):
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.fixture
+def temp_db(temp_db):
+    """共通の一時DBに問題と提出（添削ポイント付き）を登録"""
+    with database.get_db_connection() as conn:
+        conn.execute("""
+            INSERT INTO questions (id, theme, excerpt_type, japanese_sentences, hints, target_words)
+            VALUES ('q_1', '医療倫理', 'P1', '["文1。", "文2。"]',
+                    '[{"en": "consent", "ja": "同意", "pos": "名詞"}]', '{"min": 100, "max": 120}')
+        """)
+        conn.commit()
+    database.save_submission("q_1", "I agree.\nIt is good.", CorrectionResponse(
+        original="I agree.\nIt is good.",
+        corrected="I agree.\nIt is good.",
+        word_count=5,
+        points=[
+            CorrectionPoint(before="I agree.", after="I agree.", reason="正しい", level="✅正しい表現", sentence_no=1),
+            CorrectionPoint(before="It is good.", after="It is beneficial.", reason="語彙", level="❌文法ミス", sentence_no=2),
+        ]
+    ), user_id="student_a")
+
+
+def test_export_explodes_json_columns(temp_db, tmp_path):
+    """JSON の列は展開され、提出・ポイントには問題のジャンルが付く"""
+    out = tmp_path / "out"
+    manifest = export_analytics.export_all(out, chunk_size=1)
+
+    question = read_csv_gz(out / "questions.csv.gz")[0]
+    assert question["target_min"] == "100" and question["sentence_count"] == "2" and question["hint_count"] == "1"
+
+    sentences = read_csv_gz(out / "question_sentences.csv.gz")
+    assert [(s["kind"], s["sentence_no"], s["text"]) for s in sentences] == [("sentence", "1", "文1。"), ("sentence", "2", "文2。")]
+    assert read_csv_gz(out / "question_hints.csv.gz")[0]["ja"] == "同意"
+
+    submission = read_csv_gz(out / "submissions.csv.gz")[0]
+    assert submission["theme"] == "医療倫理"
+    assert (submission["sentence_count"], submission["point_count"], submission["error_count"]) == ("2", "2", "1")
+    assert "user_answer" not in submission
+
+    points = read_csv_gz(out / "correction_points.csv.gz")
+    assert [(p["level"], p["is_error"], p["excerpt_type"]) for p in points] == [("✅正しい表現", "0", "P1"), ("❌文法ミス", "1", "P1")]
+    assert manifest["files"]["correction_points.csv.gz"]["rows"] == 2
+
+
+def test_export_with_text(temp_db, tmp_path):
+    """--with-text では本文も出力する"""
+    out = tmp_path / "out"
+    export_analytics.export_all(out, with_text=True)
+
+    assert read_csv_gz(out / "submissions.csv.gz")[0]["user_answer"] == "I agree.\nIt is good."
+    assert read_csv_gz(out / "correction_points.csv.gz")[1]["after_text"] == "It is beneficial."
@@ -0,0 +1,122 @@
+"""
+提出履歴のキーセットページング・項目指定のテスト
+"""
+import pytest
+
+import database
+
+USER_ID = "student_0001"
+
+
+@pytest.fixture
+def client(temp_db):
+    """一時DBにこの利用者の提出を7件（うち4件は同じ時刻）登録したテストクライアント"""
+    import app as app_module
+
+    with database.get_db_connection() as conn:
+        conn.execute("""
+            INSERT INTO questions (id, theme, japanese_sentences, hints, target_words)
+            VALUES ('q_1', '医療', '["文"]', '[]', '{}')
+        """)
+        for i in range(7):
+            submitted_at = "2026-01-01 00:00:00" if i < 4 else f"2026-01-0{i} 00:00:00"
+            conn.execute("""
+                INSERT INTO submissions (id, question_id, user_answer, corrected, word_count, total_score, submitted_at, user_id)
+                VALUES (?, 'q_1', 'answer', 'corrected', ?, ?, ?, ?)
+            """, (f"s_{i}", i, i, submitted_at, USER_ID))
+        conn.commit()
+    client = app_module.app.test_client()
+    client.set_cookie("uid", USER_ID)
+    return client
+
+
+def test_cursor_pages_cover_all_rows_in_order(client):
+    """カーソルで辿ると、同じ時刻の行も含めて重複・欠落なく新しい順に返る"""
+    ids = []
+    cursor = None
+    while True:
+        url = "/api/history?limit=3" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(url).get_json()
+        assert len(body["history"]) <= 3
+        ids.extend(row["id"] for row in body["history"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert ids == ["s_6", "s_5", "s_4", "s_3", "s_2", "s_1", "s_0"]
+
+
+def test_fields_projection(client):
+    """fields で項目を絞れる（ページングのキーは常に含む）。不明な項目は 400"""
+    row = client.get("/api/history?fields=total_score,theme").get_json()["history"][0]
+    assert set(row) == {"id", "submitted_at", "total_score", "theme"}
+    assert row["theme"] == "医療"
+
+    legacy = client.get("/api/history").get_json()["history"][0]
+    assert legacy["corrected"] == "corrected" and legacy["japanese_sentences"] == '["文"]'
+
+    summary = client.get("/api/history", headers={"X-API-Version": "2"}).get_json()["history"][0]
+    assert "corrected" not in summary and "user_answer" not in summary
+
+    assert client.get("/api/history?fields=password").status_code == 400
+    assert client.get("/api/history?cursor=broken").status_code == 400
+
+
+def test_missing_question_does_not_change_row_set(client):
+    """問題が見つからない提出も、項目の指定によらず同じ行の集合・同じカーソルで辿れる"""
+    with database.get_db_connection() as conn:
+        conn.execute("""
+            INSERT INTO submissions (id, question_id, user_answer, corrected, word_count, total_score, submitted_at, user_id)
+            VALUES ('s_orphan', 'q_deleted', 'answer', 'corrected', 1, 1, '2026-01-01 00:00:00', ?)
+        """, (USER_ID,))
+        conn.commit()
+
+    def all_ids(fields):
+        ids, cursor = [], None
+        while True:
+            rows = database.get_submission_history(limit=2, before=cursor, fields=fields, user_id=USER_ID)
+            if not rows:
+                return ids
+            ids.extend(row["id"] for row in rows)
+            cursor = (rows[-1]["submitted_at"], rows[-1]["id"])
+
+    plain = all_ids(["total_score"])
+    assert "s_orphan" in plain
+    assert all_ids(["total_score", "theme"]) == plain
+    assert all_ids(None) == plain
+    orphan = database.get_submission_history(fields=["theme"], user_id=USER_ID)
+    assert {row["id"]: row["theme"] for row in orphan}["s_orphan"] is None
+
+
+def test_summary_page_uses_covering_indexes(client):
+    """一覧表示の項目（テーマを含む）は、提出・問題とも本文を読まずにカバリングインデックスで取得する"""
+    import config
+
+    query, params = database.build_history_query(
+        before=("2026-01-05 00:00:00", "s_5"), fields=config.HISTORY_SUMMARY_FIELDS, user_id=USER_ID
+    )
+    with database.get_db_connection() as conn:
+        plan = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+    assert any("COVERING INDEX idx_submissions_user_history" in detail for detail in plan)
+    assert any("COVERING INDEX idx_questions_theme" in detail for detail in plan)
+
+
+def test_history_page_uses_covering_index(client):
+    """問題側の項目がなければ、1ページ分をカバリングインデックスだけで取得する"""
+    with database.get_db_connection() as conn:
+        plan = conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT s.id, s.submitted_at, s.total_score FROM submissions s
+            WHERE (s.submitted_at, s.id) < (?, ?)
+            ORDER BY s.submitted_at DESC, s.id DESC LIMIT 50
+        """, ("2026-01-05 00:00:00", "s_5")).fetchall()
+    assert any("COVERING INDEX idx_submissions_history" in row["detail"] for row in plan)
+
+    with database.get_db_connection() as conn:
+        plan = conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT s.id, s.submitted_at, s.total_score FROM submissions s
+            WHERE s.user_id = ? AND (s.submitted_at, s.id) < (?, ?)
+            ORDER BY s.submitted_at DESC, s.id DESC LIMIT 50
+        """, (USER_ID, "2026-01-05 00:00:00", "s_5")).fetchall()
+    assert any("COVERING INDEX idx_submissions_user_history" in row["detail"] for row in plan)
@@ -0,0 +1,113 @@
+"""
+非同期ジョブ（job_id 発行 → GET /api/jobs/<id> でポーリング）のテスト
+"""
+import time
+
+import config
+import database
+import jobs
+from models import CorrectionResponse
+
+
+def wait_for_job(job_id, timeout=5.0):
+    """ジョブが完了（done / error）するまで待つ"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get_job_status(job_id)
+        if job and job["status"] in ("done", "error"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def wait_until_idle(timeout=5.0):
+    """実行待ち・実行中のジョブがなくなるまで待つ"""
+    deadline = time.time() + timeout
+    while jobs._pending and time.time() < deadline:
+        time.sleep(0.02)
+
+
+def test_job_result_stored(temp_db):
+    """結果がDBに保存され、job_id で取得できる"""
+    job_id = jobs.submit_job("correct", lambda: {"corrected": "I am a student.", "points": [1]})
+    job = wait_for_job(job_id)
+
+    assert job["status"] == "done"
+    assert job["result"] == {"corrected": "I am a student.", "points": [1]}
+
+
+def test_job_error_recorded(temp_db):
+    """失敗したジョブはエラー内容が記録される"""
+    def fail():
+        raise RuntimeError("LLM timeout")
+
+    job = wait_for_job(jobs.submit_job("correct", fail))
+    assert job["status"] == "error"
+    assert job["error"] == "LLM timeout"
+    assert "result" not in job
+
+
+def test_job_rejected_when_queue_full(temp_db, monkeypatch):
+    """実行待ちが上限に達していれば受け付けない"""
+    monkeypatch.setattr(config, "JOB_MAX_PENDING", 0)
+    assert jobs.submit_job("correct", dict) is None
+
+
+def test_expired_job_not_returned(temp_db, monkeypatch):
+    """保持期限切れのジョブは取得できず、削除対象になる"""
+    monkeypatch.setattr(config, "JOB_RESULT_TTL", 0)
+    job_id = jobs.submit_job("correct", dict)
+    wait_until_idle()
+
+    assert jobs.get_job_status(job_id) is None
+    assert database.delete_expired_jobs() == 1
+
+
+def test_stale_running_job_marked_as_error(temp_db, monkeypatch):
+    """ワーカーの再起動で running のまま止まったジョブは、JOB_STALE_SECONDS 後に error になる"""
+    database.create_job("j_stale", "correct", config.JOB_RESULT_TTL)
+    database.update_job("j_stale", "running", config.JOB_RESULT_TTL)
+    with database.get_db_connection() as conn:
+        conn.execute("UPDATE jobs SET updated_at = datetime('now', '-20 minutes') WHERE id = 'j_stale'")
+        conn.commit()
+    database.create_job("j_fresh", "correct", config.JOB_RESULT_TTL)
+
+    job = jobs.get_job_status("j_stale")
+    assert job["status"] == "error"
+    assert "もう一度送信" in job["error"]
+    assert jobs.get_job_status("j_fresh")["status"] == "queued"
+
+    monkeypatch.setattr(config, "JOB_STALE_SECONDS", 0)
+    assert database.fail_stale_jobs(config.JOB_STALE_SECONDS) == 1
+
+
+def test_async_correct_endpoint(temp_db, monkeypatch):
+    """?async=1 なら 202 と job_id を即座に返し、結果は /api/jobs/<id> で取得できる"""
+    import app as app_module
+
+    correction = CorrectionResponse(
+        original="I am student.",
+        corrected="I am a student.",
+        word_count=3,
+        points=[{"before": "I am student.", "after": "I am a student.", "reason": "冠詞が必要", "level": "❌文法ミス"}]
+    )
+    monkeypatch.setattr(app_module, "correct_answer", lambda submission: correction)
+    client = app_module.app.test_client()
+
+    response = client.post("/api/correct?async=1", json={
+        "question_id": "q_test",
+        "japanese_sentences": ["私は学生です。"],
+        "user_answer": "I am student.",
+        "target_words": {"min": 1, "max": 120}
+    })
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    assert response.headers["Location"] == f"/api/jobs/{job_id}"
+
+    wait_for_job(job_id)
+    job = client.get(f"/api/jobs/{job_id}").get_json()
+    assert job["status"] == "done"
+    assert job["result"]["corrected"] == "I am a student."
+    assert job["result"]["submission_id"].startswith("s_")
+
+    assert client.get("/api/jobs/j_missing").status_code == 404
@@ -0,0 +1,56 @@
+"""
+構造化ロギング（logging_utils）のテスト
+"""
+import json
+import logging
+
+import config
+import logging_utils
+from logging_utils import JsonFormatter, LazyJson, log_payload
+
+
+class ExplodingPayload:
+    """シリアライズされたら失敗するペイロード（遅延評価の確認用）"""
+
+    def __str__(self):
+        raise AssertionError("payload was serialized")
+
+
+def test_lazy_args_not_formatted_when_level_disabled(caplog):
+    """INFOレベルではDEBUGログの引数を文字列化しない"""
+    logger = logging.getLogger("test_lazy")
+    with caplog.at_level(logging.INFO, logger="test_lazy"):
+        logger.debug("payload: %s", ExplodingPayload())
+    assert caplog.records == []
+
+
+def test_log_payload_gated_by_sampling(caplog, monkeypatch):
+    """DEBUGレベルでもサンプリングに外れたリクエストはペイロードを出力しない"""
+    logger = logging.getLogger("test_payload")
+    with caplog.at_level(logging.DEBUG, logger="test_payload"):
+        monkeypatch.setattr(config, "LOG_PAYLOAD_SAMPLE_RATE", 0.0)
+        assert logging_utils.start_request_sampling() is False
+        log_payload(logger, "Full response", ExplodingPayload())
+        assert caplog.records == []
+
+        monkeypatch.setattr(config, "LOG_PAYLOAD_SAMPLE_RATE", 1.0)
+        assert logging_utils.start_request_sampling() is True
+        log_payload(logger, "Full response", {"points": ["日本語"]})
+    assert '"日本語"' in caplog.records[0].getMessage()
+
+
+def test_json_formatter_includes_extra_fields():
+    """JSONフォーマッターは extra= のフィールドを含めて1行で出力する"""
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "done %d", (3,), None)
+    record.submission_id = 42
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "done 3"
+    assert entry["level"] == "INFO"
+    assert entry["submission_id"] == 42
+
+
+def test_lazy_json_matches_json_dumps():
+    """LazyJson は出力時に json.dumps と同じ文字列になる"""
+    payload = {"before": "I am student.", "level": "❌"}
+    assert str(LazyJson(payload)) == json.dumps(payload, ensure_ascii=False, indent=2)
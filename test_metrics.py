@@ -0,0 +1,122 @@
+"""
+メトリクス（スパン・カウンター・ヒストグラムと /metrics のワーカー間集計）のテスト
+"""
+import json
+
+import openai
+import pytest
+
+import config
+import metrics
+import llm_service
+import stub_openai
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    """書き出し先を一時ディレクトリにし、このプロセスの値を空にする"""
+    monkeypatch.setattr(config, "METRICS_ENABLED", True)
+    monkeypatch.setattr(config, "METRICS_DIR", tmp_path)
+    monkeypatch.setattr(config, "METRICS_FLUSH_INTERVAL", 3600.0)
+    # pid が変わった（fork 後）とみなして値を捨てさせる
+    monkeypatch.setattr(metrics, "_pid", None)
+    return tmp_path
+
+
+def test_render_counters_and_histograms(metrics_dir):
+    """カウンターはラベルごと、ヒストグラムは累積バケット・合計・件数で出力する"""
+    metrics.inc("llm_reprompts_total")
+    metrics.inc("llm_tokens_total", 120, call_type="question", kind="prompt")
+    metrics.observe("llm_request_duration_seconds", 0.3, call_type="question")
+    metrics.observe("llm_request_duration_seconds", 2.0, call_type="question")
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE eisakubun_llm_reprompts_total counter" in lines
+    assert "eisakubun_llm_reprompts_total 1" in lines
+    assert 'eisakubun_llm_tokens_total{call_type="question",kind="prompt"} 120' in lines
+    assert 'eisakubun_llm_request_duration_seconds_bucket{call_type="question",le="0.25"} 0' in lines
+    assert 'eisakubun_llm_request_duration_seconds_bucket{call_type="question",le="0.5"} 1' in lines
+    assert 'eisakubun_llm_request_duration_seconds_bucket{call_type="question",le="+Inf"} 2' in lines
+    assert 'eisakubun_llm_request_duration_seconds_sum{call_type="question"} 2.3' in lines
+    assert 'eisakubun_llm_request_duration_seconds_count{call_type="question"} 2' in lines
+
+
+def test_span_records_duration(metrics_dir):
+    """span / timed は span_duration_seconds に記録する（例外でも記録する）"""
+    with metrics.span("db.test"):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.span("db.test"):
+            raise RuntimeError("boom")
+
+    @metrics.timed("points.test")
+    def work():
+        return 42
+
+    assert work() == 42
+    _, histograms = metrics.collect()
+    assert histograms[("span_duration_seconds", (("span", "db.test"),))][-1] == 2
+    assert histograms[("span_duration_seconds", (("span", "points.test"),))][-1] == 1
+
+
+def test_render_aggregates_other_workers(metrics_dir):
+    """他のワーカーが書き出したファイルと、このプロセスのメモリ上の値を合算する"""
+    metrics.inc("llm_retries_total", call_type="correction")
+    metrics.observe("span_duration_seconds", 0.002, span="db.save_submission")
+    metrics.flush()
+
+    # 別のワーカーの書き出し（このプロセスの値を複製したもの）
+    own = next(metrics_dir.glob("worker_*.json"))
+    (metrics_dir / "worker_99999_deadbeef.json").write_text(own.read_text(encoding="utf-8"), encoding="utf-8")
+    # 書き込み途中のファイルは無視する
+    (metrics_dir / "worker_99998_broken000.json").write_text('{"counters": [', encoding="utf-8")
+
+    metrics.inc("llm_retries_total", call_type="correction")
+    lines = metrics.render().splitlines()
+    assert 'eisakubun_llm_retries_total{call_type="correction"} 3' in lines
+    assert 'eisakubun_span_duration_seconds_count{span="db.save_submission"} 2' in lines
+
+
+def test_forked_process_starts_empty(metrics_dir, monkeypatch):
+    """fork 後（pid が変わった後）はマスターの値を引き継がない"""
+    metrics.inc("llm_reprompts_total")
+    monkeypatch.setattr(metrics, "_pid", -1)
+    metrics.inc("llm_fallbacks_total", kind="question")
+    counters, _ = metrics.collect()
+    assert counters == {("llm_fallbacks_total", (("kind", "question"),)): 1.0}
+
+
+def test_llm_call_metrics(metrics_dir, monkeypatch):
+    """OpenAI API 呼び出しの時間・トークン数・リトライを呼び出し種別ごとに数える"""
+    server, base_url = stub_openai.start_server(stub_openai.StubSettings())
+    try:
+        monkeypatch.setattr(llm_service, "_client", openai.OpenAI(api_key="sk-test", base_url=base_url, max_retries=0))
+        monkeypatch.setattr(llm_service, "_client_pid", llm_service.os.getpid())
+        assert json.loads(llm_service.call_openai_with_retry("hello", call_type="question"))
+
+        stub_openai.StubOpenAIHandler.settings = stub_openai.StubSettings(rate_429=1.0)
+        with pytest.raises(openai.RateLimitError):
+            llm_service.call_openai_with_retry("hello", max_retries=2, call_type="correction")
+    finally:
+        server.shutdown()
+
+    counters, histograms = metrics.collect()
+    assert counters[("llm_requests_total", (("call_type", "question"), ("result", "ok")))] == 1
+    assert counters[("llm_requests_total", (("call_type", "correction"), ("result", "error")))] == 2
+    assert counters[("llm_retries_total", (("call_type", "correction"),))] == 1
+    assert counters[("llm_tokens_total", (("call_type", "question"), ("kind", "completion")))] > 0
+    assert histograms[("llm_request_duration_seconds", (("call_type", "question"),))][-1] == 1
+
+
+def test_metrics_endpoint(metrics_dir, tmp_path, monkeypatch):
+    """/metrics はリクエストの処理時間をURLルールごとに返し、利用者IDの Cookie を発行しない"""
+    import app as app_module
+
+    client = app_module.app.test_client()
+    assert client.get("/health").status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    assert config.USER_COOKIE_NAME not in response.headers.get("Set-Cookie", "")
+    body = response.get_data(as_text=True)
+    assert 'eisakubun_http_request_duration_seconds_count{endpoint="/health",method="GET",status="200"} 1' in body
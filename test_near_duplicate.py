@@ -0,0 +1,138 @@
+"""
+問題本文の近似重複判定（MinHash + LSH）のテスト
+"""
+import json
+
+import pytest
+
+import database
+import llm_service
+import near_duplicate
+from models import QuestionResponse
+
+PASSAGE = "最近、睡眠の質を改善したいと思っていた。夜遅くまでスマホを見る習慣があり、なかなか寝付けないことが多かった。"
+SIMILAR = "最近、睡眠の質を改善したいと考えていた。夜遅くまでスマホを見る習慣があって、なかなか寝付けないことが多かった。"
+DIFFERENT = "ある研究によると、右手を握りしめることで記憶が良くなることが明らかになった。"
+
+
+def make_question(paragraph):
+    return QuestionResponse(
+        theme="ブログ",
+        excerpt_type="P1_ONLY",
+        japanese_paragraphs=[paragraph],
+        hints=[{"en": "sleep", "ja": "睡眠"}, {"en": "habit", "ja": "習慣"}, {"en": "phone", "ja": "スマホ"}],
+        target_words={"min": 60, "max": 80},
+    )
+
+
+def test_signature_similarity_tracks_text_overlap():
+    """言い回しが少し違うだけの本文は類似度が高く、別の本文は低い。署名は毎回同じ"""
+    base = near_duplicate.signature([PASSAGE])
+    assert base == near_duplicate.signature([PASSAGE])
+    assert near_duplicate.similarity(base, near_duplicate.signature([SIMILAR])) >= 0.6
+    assert near_duplicate.similarity(base, near_duplicate.signature([DIFFERENT])) < 0.2
+
+
+def test_saved_questions_are_indexed_incrementally(temp_db):
+    """保存した問題はすぐに索引に入り、近似重複として見つかる"""
+    assert database.find_near_duplicate_questions([SIMILAR]) == []
+
+    database.save_question(make_question(PASSAGE), user_id="student_a")
+
+    matches = database.find_near_duplicate_questions([SIMILAR])
+    assert len(matches) == 1 and matches[0][1] >= 0.6
+    assert database.find_near_duplicate_questions([DIFFERENT]) == []
+
+
+def test_existing_questions_indexed_on_startup(temp_db):
+    """索引の導入前に保存された問題は起動時に索引に追加される"""
+    with database.get_db_connection() as conn:
+        conn.execute("""
+            INSERT INTO questions (id, theme, japanese_sentences, hints, target_words)
+            VALUES ('q_old', 'ブログ', ?, '[]', '{}')
+        """, (json.dumps([PASSAGE], ensure_ascii=False),))
+        conn.commit()
+
+    assert database.index_missing_question_signatures() == 1
+    assert database.index_missing_question_signatures() == 0
+    assert database.find_near_duplicate_questions([SIMILAR])
+
+
+def test_generation_rejects_near_duplicate(temp_db, monkeypatch):
+    """既出の問題とほぼ同じ本文が生成されたら、指示を追加して生成し直す"""
+    database.save_question(make_question(PASSAGE))
+
+    monkeypatch.setattr(llm_service, "enforce_theme_diversity", lambda recent, genres: "ブログ")
+    monkeypatch.setattr(llm_service, "enforce_excerpt_type_diversity", lambda recent: "P1_ONLY")
+    responses = iter([make_question(SIMILAR), make_question(DIFFERENT)])
+    prompts = []
+
+    def fake_call(prompt, **kwargs):
+        prompts.append(prompt)
+        return next(responses).model_dump_json()
+
+    monkeypatch.setattr(llm_service, "call_openai_with_retry", fake_call)
+
+    question = llm_service.generate_question()
+    assert question.japanese_paragraphs == [DIFFERENT]
+    assert "既出の問題とほぼ同じ" in prompts[1]
+
+
+@pytest.fixture
+def always_duplicate(temp_db, monkeypatch):
+    """生成するたびに既出の問題とほぼ同じ本文が返る"""
+    database.save_question(make_question(PASSAGE))
+    monkeypatch.setattr(llm_service, "enforce_theme_diversity", lambda recent, genres: "ブログ")
+    monkeypatch.setattr(llm_service, "enforce_excerpt_type_diversity", lambda recent: "P1_ONLY")
+    monkeypatch.setattr(llm_service, "call_openai_with_retry",
+                        lambda prompt, **kwargs: make_question(SIMILAR).model_dump_json())
+
+
+def test_all_duplicates_fall_back_to_unseen_bank_question(always_duplicate, monkeypatch):
+    """生成がすべて近似重複なら、固定の問題ではなくバンクの未出題の問題を出す"""
+    import config
+
+    monkeypatch.setattr(config, "QUESTION_BANK_ENABLED", True)
+    database.save_imported_questions([make_question(DIFFERENT)])
+
+    question = llm_service.generate_question(user_id="student_a")
+    assert question.japanese_paragraphs == [DIFFERENT]
+
+
+def test_all_duplicates_fall_back_to_unseen_candidate(always_duplicate, monkeypatch):
+    """バンクになければ、ジャンル違いで却下したが既出でない生成済みの問題を出す"""
+    responses = iter([make_question(DIFFERENT).model_copy(update={"theme": "コラム"}), make_question(SIMILAR), make_question(SIMILAR)])
+    monkeypatch.setattr(llm_service, "call_openai_with_retry",
+                        lambda prompt, **kwargs: next(responses).model_dump_json())
+
+    question = llm_service.generate_question(user_id="student_a")
+    assert question.japanese_paragraphs == [DIFFERENT] and question.theme == "コラム"
+
+    # 除外ジャンルの問題は出さない（固定の問題になる）
+    responses = iter([make_question(DIFFERENT).model_copy(update={"theme": "コラム"}), make_question(SIMILAR), make_question(SIMILAR)])
+    question = llm_service.generate_question(excluded_themes=["コラム"], user_id="student_a")
+    assert question.theme == "ブログ" and question.japanese_sentences
+
+
+def test_import_checks_known_duplicates_once_per_batch(temp_db, monkeypatch, tmp_path):
+    """一括登録は署名を1回だけ計算し、登録済みの問題との判定はバッチごとにまとめて行う"""
+    import question_bank
+
+    database.save_question(make_question(PASSAGE))
+    path = tmp_path / "questions.jsonl"
+    path.write_text("\n".join(
+        make_question(text).model_dump_json() for text in [SIMILAR, DIFFERENT, DIFFERENT]
+    ), encoding="utf-8")
+
+    calls = []
+    original = database.find_near_duplicate_signatures
+    monkeypatch.setattr(question_bank, "find_near_duplicate_signatures",
+                        lambda sigs: calls.append(len(sigs)) or original(sigs))
+    signatures = []
+    original_signature = near_duplicate.signature
+    monkeypatch.setattr(near_duplicate, "signature", lambda texts: signatures.append(texts) or original_signature(texts))
+
+    stats = question_bank.import_questions(path, batch_size=10)
+    assert stats == {"read": 3, "imported": 1, "duplicates": 2, "invalid": 0}
+    assert calls == [3]
+    assert len(signatures) == 3 + 1  # 読んだ3件 + 登録時の索引1件
@@ -0,0 +1,116 @@
+"""
+問題バンク（一括登録・出題）のテスト
+"""
+import json
+
+import database
+import question_bank
+
+
+def make_record(paragraph, theme="研究紹介", **overrides):
+    record = {
+        "theme": theme,
+        "excerpt_type": "P1_ONLY",
+        "japanese_paragraphs": [paragraph],
+        "hints": [
+            {"en": "memory", "ja": "記憶"},
+            {"en": "recall", "ja": "想起"},
+            {"en": "study", "ja": "研究"},
+        ],
+        "target_words": {"min": 60, "max": 80},
+    }
+    record.update(overrides)
+    return record
+
+
+def test_import_jsonl_validates_dedups_and_classifies(temp_db, tmp_path):
+    """検証・重複排除（空白の違いは無視）・サブトピック分類をしながら分割して登録する"""
+    path = tmp_path / "questions.jsonl"
+    records = [
+        make_record("ある研究によると、記憶の想起は手を握ると良くなる。"),
+        make_record("ある研究によると、 記憶の想起は手を握ると良くなる。"),  # 空白だけ違う重複
+        make_record("夜のスマホ利用と睡眠の関係を調べた研究がある。", hints=[
+            {"en": "sleep", "ja": "睡眠"}, {"en": "nap", "ja": "昼寝"}, {"en": "focus", "ja": "集中"},
+        ]),
+        make_record("未対応のジャンルの問題。", theme="小説"),
+        {"theme": "研究紹介"},  # 必須項目なし
+    ]
+    path.write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in records), encoding="utf-8")
+
+    stats = question_bank.import_questions(path, batch_size=2)
+    assert stats == {"read": 5, "imported": 2, "duplicates": 1, "invalid": 2}
+
+    # 再実行しても重複として登録されない
+    assert question_bank.import_questions(path)["imported"] == 0
+
+    with database.get_db_connection() as conn:
+        labels = [row[0] for row in conn.execute(
+            "SELECT topic_label FROM questions WHERE source = 'import' ORDER BY topic_label"
+        )]
+    assert labels == ["A", "C"]
+
+
+def test_import_streams_json_array(temp_db, tmp_path, monkeypatch):
+    """JSON配列は少しずつ読み込んでも全件を取り出せる"""
+    monkeypatch.setattr(question_bank, "_READ_SIZE", 7)
+    path = tmp_path / "questions.json"
+    path.write_text(json.dumps([make_record(f"研究{i}の記憶実験。") for i in range(5)], ensure_ascii=False, indent=2),
+                    encoding="utf-8")
+
+    assert question_bank.import_questions(path)["imported"] == 5
+
+
+def test_bank_question_not_repeated_for_same_user(temp_db, tmp_path, monkeypatch):
+    """出題済みの問題は同じ利用者には再度出さず、バンクが尽きたら None（LLMで生成）"""
+    path = tmp_path / "questions.jsonl"
+    path.write_text(json.dumps(make_record("記憶の研究。"), ensure_ascii=False), encoding="utf-8")
+    question_bank.import_questions(path)
+
+    import llm_service
+    monkeypatch.setattr(llm_service, "enforce_theme_diversity", lambda recent, genres: "研究紹介")
+
+    question = question_bank.pick_question("student_a")
+    assert question.japanese_paragraphs == ["記憶の研究。"]
+    database.save_question(question, user_id="student_a", source="bank")
+
+    assert question_bank.pick_question("student_a") is None
+    assert question_bank.pick_question("student_b") is not None
+
+    # バンクに登録しただけの問題は直近の出題には数えない
+    assert database.get_recent_themes(30) == ["研究紹介"]
+
+
+def test_bank_honours_excluded_themes(temp_db, tmp_path):
+    """リクエストの除外テーマは出題せず、最近使ったテーマは他に選べるジャンルがなければ使う"""
+    from prompts_translation_simple import TRANSLATION_GENRES
+
+    path = tmp_path / "questions.jsonl"
+    path.write_text(json.dumps(make_record("記憶の研究。"), ensure_ascii=False), encoding="utf-8")
+    question_bank.import_questions(path)
+
+    for _ in range(10):
+        assert question_bank.pick_question("student_a", excluded_themes=["研究紹介"]) is None
+
+    others = [g for g in TRANSLATION_GENRES if g != "研究紹介"]
+    question = question_bank.pick_question("student_a", excluded_themes=others, avoid_themes=["研究紹介"])
+    assert question.theme == "研究紹介"
+    assert question_bank.pick_question("student_a", excluded_themes=list(TRANSLATION_GENRES)) is None
+
+
+def test_question_endpoint_passes_exclusions_to_bank(temp_db, tmp_path, monkeypatch):
+    """/api/question は除外テーマが問題バンクの唯一のジャンルなら、バンクから出題しない"""
+    import app as app_module
+    import config
+    from models import QuestionResponse
+
+    path = tmp_path / "questions.jsonl"
+    path.write_text(json.dumps(make_record("記憶の研究。"), ensure_ascii=False), encoding="utf-8")
+    question_bank.import_questions(path)
+    monkeypatch.setattr(config, "QUESTION_BANK_ENABLED", True)
+    generated = QuestionResponse(**make_record("時事の本文。", theme="時事"))
+    monkeypatch.setattr(app_module, "generate_question", lambda **kwargs: generated)
+
+    client = app_module.app.test_client()
+    for _ in range(5):
+        body = client.post("/api/question", json={"excluded_themes": ["研究紹介"]}).get_json()
+        assert body["theme"] == "時事"
@@ -0,0 +1,86 @@
+"""
+添削ポイント不足時の再プロンプトのテスト
+"""
+import inspect
+import json
+
+import pytest
+
+import config
+import llm_service
+from models import SubmissionRequest
+
+
+def correction_response(points):
+    return json.dumps({
+        "corrected": "I am a student. He is a doctor.",
+        "points": points,
+        "model_answer": "I am a student. He is a doctor.",
+        "model_answer_explanation": "1文目: I am a student."
+    }, ensure_ascii=False)
+
+
+FIRST_POINT = {
+    "japanese_sentence": "私は学生です。",
+    "before": "I am student.",
+    "after": "I am a student.",
+    "reason": "可算名詞の単数形には冠詞 a が必要です。",
+    "level": "❌文法ミス"
+}
+SECOND_POINT = {
+    "japanese_sentence": "彼は医者です。",
+    "before": "He is doctor.",
+    "after": "He is a doctor.",
+    "reason": "可算名詞の単数形には冠詞 a が必要です。",
+    "level": "❌文法ミス"
+}
+
+
+@pytest.fixture
+def llm_calls(temp_db, monkeypatch):
+    """一時DBに切り替え、添削は1ポイントだけ・再プロンプトは残りのポイントを返す"""
+    monkeypatch.setattr(config, "CORRECTION_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "REPROMPT_ENABLED", True)
+
+    calls = []
+    real_signature = inspect.signature(llm_service.call_openai_with_retry)
+
+    def fake_call(prompt, **kwargs):
+        # 実際の関数が受け付けない引数なら TypeError（以前は再プロンプトがこれで毎回失敗していた）
+        real_signature.bind(prompt, **kwargs)
+        calls.append(kwargs)
+        if kwargs.get("call_type") == "reprompt":
+            return json.dumps({"points": [SECOND_POINT]}, ensure_ascii=False)
+        return correction_response([FIRST_POINT])
+
+    monkeypatch.setattr(llm_service, "call_openai_with_retry", fake_call)
+    return calls
+
+
+def submit():
+    return llm_service.correct_answer(SubmissionRequest(
+        question_id="q_test",
+        japanese_sentences=["私は学生です。", "彼は医者です。"],
+        user_answer="I am student. He is doctor.",
+        target_words={"min": 1, "max": 120}
+    ))
+
+
+def test_points_shortage_is_filled_by_reprompt(llm_calls):
+    """REPROMPT_ENABLED なら、ポイントが原文の文数に足りない分を再プロンプトで補い、未提出の補足（filler）は使わない"""
+    result = submit()
+
+    assert [call["call_type"] for call in llm_calls] == ["correction", "reprompt"]
+    assert llm_calls[1]["temperature"] == 0.7
+    befores = [point.before for point in result.points]
+    assert any("He is doctor." in before for before in befores)
+    assert not any(before.startswith("(未提出") for before in befores)
+
+
+def test_reprompt_disabled_by_default_uses_filler(llm_calls, monkeypatch):
+    """既定（REPROMPT_ENABLED=false）では LLM を追加で呼ばず、不足分は補足ポイントで埋める"""
+    monkeypatch.setattr(config, "REPROMPT_ENABLED", False)
+    result = submit()
+
+    assert [call["call_type"] for call in llm_calls] == ["correction"]
+    assert any(point.before.startswith("(未提出") for point in result.points)
@@ -0,0 +1,83 @@
+"""
+レスポンス圧縮・JSONシリアライズ・レスポンス形式の版のテスト
+"""
+import gzip
+
+import pytest
+
+import config
+from models import CorrectionResponse
+from response_utils import choose_encoding
+
+
+@pytest.fixture
+def client(temp_db, monkeypatch):
+    """一時DBに切り替えたテストクライアント"""
+    import app as app_module
+
+    monkeypatch.setattr(config, "COMPRESSION_ENABLED", True)
+    monkeypatch.setattr(config, "COMPRESSION_MIN_SIZE", 500)
+    return app_module.app.test_client()
+
+
+def post_multi(client, monkeypatch, headers=None):
+    """添削を固定結果に置き換えて /api/correct-multi を呼ぶ"""
+    import app as app_module
+
+    correction = CorrectionResponse(
+        original="I am student.",
+        corrected="I am a student.",
+        word_count=3,
+        points=[{"before": "I am student.", "after": "I am a student.", "reason": "冠詞が必要です。" * 100, "level": "❌文法ミス"}]
+    )
+    monkeypatch.setattr(app_module, "correct_multi_sentences", lambda submission: correction)
+    return client.post("/api/correct-multi", headers=headers or {}, json={
+        "question_id": "q_test",
+        "japanese_sentences": ["私は学生です。"],
+        "user_sentences": ["I am student."],
+        "target_words": {"min": 1, "max": 120}
+    })
+
+
+def test_json_response_is_gzipped_and_utf8(client, monkeypatch):
+    """Accept-Encoding: gzip なら圧縮し、日本語は \\u エスケープしない"""
+    response = post_multi(client, monkeypatch, headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    body = gzip.decompress(response.get_data()).decode("utf-8")
+    assert "冠詞が必要です。" in body
+
+
+def test_uncompressed_without_accept_encoding(client, monkeypatch):
+    """Accept-Encoding がなければ圧縮しない。小さいレスポンスも圧縮しない"""
+    response = post_multi(client, monkeypatch)
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()["corrected"] == "I am a student."
+
+    health = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in health.headers
+
+
+def test_static_file_is_gzipped(client):
+    """静的ファイル（JS）も圧縮する"""
+    response = client.get("/static/main.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert b"function" in gzip.decompress(response.get_data())
+
+
+def test_api_version_2_omits_echo_fields(client, monkeypatch):
+    """X-API-Version: 2 ではリクエストのエコー項目を省く"""
+    v1 = post_multi(client, monkeypatch).get_json()
+    v2 = post_multi(client, monkeypatch, headers={"X-API-Version": "2"}).get_json()
+
+    assert v1["user_sentences"] == ["I am student."]
+    assert "user_sentences" not in v2 and "japanese_sentences" not in v2
+    assert v2["points"] == v1["points"]
+
+
+def test_choose_encoding():
+    """q=0 の方式は選ばない"""
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("") is None
@@ -0,0 +1,129 @@
+"""
+複数文モードの文単位キャッシュ・部分再添削のテスト
+"""
+import json
+
+import pytest
+
+import config
+import correction_cache
+import llm_service
+from models import SubmissionRequest
+
+JAPANESE_SENTENCES = ["私は学生です。", "彼は医者です。"]
+
+# 学生の英文 → 添削ポイント（プロンプトに含まれる文だけを返す）
+POINTS = {
+    "I am student.": ("私は学生です。", "I am a student.", "❌文法ミス"),
+    "He is doctor.": ("彼は医者です。", "He is a doctor.", "❌文法ミス"),
+    "He is a doctor.": ("彼は医者です。", "He is a doctor.", "✅正しい表現"),
+}
+
+
+@pytest.fixture
+def llm_prompts(temp_db, monkeypatch):
+    """一時DBに切り替え、LLM呼び出しを固定応答に置き換えてプロンプトを記録"""
+    monkeypatch.setattr(config, "CORRECTION_CACHE_ENABLED", True)
+    monkeypatch.setattr(correction_cache, "_stale_purged", False)
+
+    prompts = []
+
+    def fake_call(prompt, **kwargs):
+        prompts.append(prompt)
+        points = [
+            {
+                "japanese_sentence": japanese,
+                "before": before,
+                "after": after,
+                "reason": "テスト用の解説です。",
+                "level": level
+            }
+            for before, (japanese, after, level) in POINTS.items()
+            if before in prompt
+        ]
+        return json.dumps({
+            "corrected": " ".join(p["after"] for p in points),
+            "points": points,
+            "model_answer": "I am a student.\n\nHe is a doctor.",
+            "model_answer_explanation": "1文目: I am a student."
+        }, ensure_ascii=False)
+
+    monkeypatch.setattr(llm_service, "call_openai_with_retry", fake_call)
+    return prompts
+
+
+def submit(user_sentences):
+    return llm_service.correct_multi_sentences(SubmissionRequest(
+        question_id="q_test",
+        japanese_sentences=JAPANESE_SENTENCES,
+        user_answer="\n".join(user_sentences),
+        target_words={"min": 1, "max": 120}
+    ))
+
+
+def test_only_changed_sentence_is_sent_to_llm(llm_prompts):
+    """1文だけ直して再提出すると、その文だけをLLMに送り、もう1文はキャッシュから結合する"""
+    submit(["I am student.", "He is doctor."])
+    second = submit(["I am student.", "He is a doctor."])
+
+    assert len(llm_prompts) == 2
+    assert "He is a doctor." in llm_prompts[1]
+    assert "I am student." not in llm_prompts[1]
+
+    assert [(p.sentence_no, p.before, p.level) for p in second.points] == [
+        (1, "I am student.", "❌文法ミス"),
+        (2, "He is a doctor.", "✅正しい表現"),
+    ]
+    assert second.corrected == "I am a student.\nHe is a doctor."
+    assert second.model_answer == "I am a student.\n\nHe is a doctor."
+
+
+def test_unchanged_resubmission_skips_llm(llm_prompts):
+    """すべての文がキャッシュにあればLLMを呼ばず、正規化前の入力を original_before に使う"""
+    submit(["I am student.", "He is doctor."])
+    second = submit(["i am student", "He is doctor."])
+
+    assert len(llm_prompts) == 1
+    assert second.points[0].original_before == "i am student"
+    assert second.word_count == 6
+
+
+def test_misaligned_lines_fall_back_to_full_correction(llm_prompts):
+    """英文の行数が日本語の文数と合わない場合は全体を添削する"""
+    submit(["I am student.", "He is doctor."])
+    submit(["I am student.\nHe is doctor.", "He is a doctor."])
+
+    assert len(llm_prompts) == 2
+    assert "I am student." in llm_prompts[1]
+
+
+def test_unsubmitted_sentences_are_not_sent_to_llm(llm_prompts):
+    """未提出の文はLLMに送らず、模範解答から解説ポイントを作る"""
+    result = submit(["I am student.", "(未提出：原文第2文)"])
+
+    correction_prompts = [p for p in llm_prompts if "I am student." in p]
+    assert len(correction_prompts) == 1
+    assert "未提出" not in correction_prompts[0]
+
+    unsubmitted = result.points[-1]
+    assert unsubmitted.sentence_no == 2
+    assert unsubmitted.japanese_sentence == "彼は医者です。"
+    assert unsubmitted.after == "He is a doctor."
+    assert unsubmitted.level == "✅ 補足解説"
+    assert result.word_count == 3
+
+
+def test_fully_unsubmitted_answer_uses_cached_model_answer(llm_prompts):
+    """すべて未提出の場合、模範解答がキャッシュ済みならLLMを呼ばない"""
+    correction_cache.store_model_answer(
+        "\n".join(JAPANESE_SENTENCES),
+        "I am a student.\n\nHe is a doctor.",
+        "文法・表現のポイント解説\n\n1文目: I am a student.\n\n（私は学生です。）\n\n冠詞 a が必要です。\n\n"
+        "2文目: He is a doctor.\n\n（彼は医者です。）\n\n職業にも冠詞が必要です。"
+    )
+    result = submit(["(未提出：原文第1文)", "(未提出：原文第2文)"])
+
+    assert llm_prompts == []
+    assert [p.after for p in result.points] == ["I am a student.", "He is a doctor."]
+    assert result.points[1].reason.endswith("職業にも冠詞が必要です。")
+    assert result.corrected == "I am a student.\nHe is a doctor."
@@ -0,0 +1,92 @@
+"""
+重複リクエストの集約（single-flight）のテスト
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import config
+import database
+import singleflight
+
+
+@pytest.fixture
+def temp_db(temp_db, monkeypatch):
+    """共通の一時DBに加えて、リースの待機間隔を短くする"""
+    monkeypatch.setattr(config, "SINGLEFLIGHT_POLL_INTERVAL", 0.01)
+    return temp_db
+
+
+def test_make_key_depends_on_answer():
+    """同じ回答なら同じキー、違う回答・エンドポイントなら別のキー"""
+    key = singleflight.make_key("correct", "q_1", "I am a student.")
+    assert key == singleflight.make_key("correct", "q_1", "I am a student.")
+    assert key != singleflight.make_key("correct", "q_1", "I am a teacher.")
+    assert key != singleflight.make_key("correct-multi", "q_1", "I am a student.")
+
+
+def test_concurrent_identical_requests_share_one_call(temp_db):
+    """同時に届いた同一リクエストは1回だけ実行され、全員が同じ結果を受け取る"""
+    calls = []
+    release = threading.Event()
+
+    def slow_llm_call():
+        calls.append(1)
+        release.wait(5)
+        return {"model_answer": "Doctors should listen to patients."}
+
+    key = singleflight.make_key("model_answer", "q_1", "医師は患者の話を聞くべきだ。")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(singleflight.run, key, slow_llm_call) for _ in range(8)]
+        time.sleep(0.1)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r == {"model_answer": "Doctors should listen to patients."} for r in results)
+
+
+def test_error_shared_and_lease_released(temp_db):
+    """リーダーが失敗したら待機中のリクエストにも同じエラーを返し、リースを解放する"""
+    key = singleflight.make_key("correct", "q_1", "I am student.")
+
+    def fail():
+        raise RuntimeError("LLM timeout")
+
+    with pytest.raises(RuntimeError, match="LLM timeout"):
+        singleflight.run(key, fail)
+    assert database.get_lease(key) is None
+    assert singleflight.run(key, lambda: {"ok": True}) == {"ok": True}
+
+
+def test_waits_for_other_worker_lease(temp_db):
+    """他のワーカープロセスが実行中なら、自分では実行せずその結果を使う"""
+    key = singleflight.make_key("correct", "q_1", "I am a student.")
+    assert database.acquire_lease(key, "other-worker", 60)
+    assert not database.acquire_lease(key, "another-worker", 60)
+
+    def finish_other_worker():
+        time.sleep(0.1)
+        database.complete_lease(key, "other-worker", {"corrected": "from other worker"}, 10)
+
+    threading.Thread(target=finish_other_worker).start()
+    result = singleflight.run(key, lambda: pytest.fail("should not call LLM"))
+    assert result == {"corrected": "from other worker"}
+
+
+def test_takes_over_expired_lease(temp_db):
+    """リースの持ち主が異常終了して期限切れになったら、引き継いで実行する"""
+    key = singleflight.make_key("correct", "q_1", "I am a student.")
+    assert database.acquire_lease(key, "crashed-worker", 0)
+    assert singleflight.run(key, lambda: {"corrected": "mine"}) == {"corrected": "mine"}
+
+
+def test_disabled_runs_every_call(temp_db, monkeypatch):
+    """無効化した場合は毎回実行する"""
+    monkeypatch.setattr(config, "SINGLEFLIGHT_ENABLED", False)
+    calls = []
+    for _ in range(2):
+        singleflight.run("k", lambda: calls.append(1) or {})
+    assert len(calls) == 2
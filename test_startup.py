@@ -0,0 +1,39 @@
+"""
+起動時間（遅延読み込み）の回帰テスト
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+
+# app の import 時には読み込まない重いモジュール（初回の添削・出題時に読み込む）
+LAZY_MODULES = [
+    "openai",
+    "prompts_correction_respect",
+    "prompts_translation",
+    "prompts_translation_simple",
+]
+
+
+def test_app_import_does_not_load_llm_dependencies():
+    """import app だけでは openai パッケージとプロンプトモジュールを読み込まない"""
+    script = "import sys, app; print(','.join(m for m in %r if m in sys.modules))" % LAZY_MODULES
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BASE_DIR,
+        env=dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY") or "sk-test"),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_prompts_loaded_on_first_use():
+    """get_prompts() で添削・出題・模範解答のプロンプトがそろう"""
+    import llm_service
+    prompts = llm_service.get_prompts()
+    assert set(prompts) == {"question", "correction", "model_answer"}
+    assert llm_service.get_prompts() is prompts
@@ -0,0 +1,85 @@
+"""
+静的ファイルのハッシュ入りURL・キャッシュヘッダーのテスト
+"""
+import os
+import re
+
+import pytest
+
+import static_assets
+
+
+@pytest.fixture
+def client():
+    import app as app_module
+    return app_module.app.test_client()
+
+
+def test_index_references_hashed_assets(client):
+    """index.html の静的ファイル参照はハッシュ入りURLに書き換えられる"""
+    html = client.get('/').get_data(as_text=True)
+    assert re.search(r'/assets/main\.[0-9a-f]{10}\.js', html)
+    assert re.search(r'/assets/style\.[0-9a-f]{10}\.css', html)
+    assert '/static/main.js' not in html
+
+
+def test_hashed_asset_is_immutable(client):
+    """現在のハッシュのURLは無期限キャッシュ、古いハッシュは再検証付き"""
+    html = client.get('/').get_data(as_text=True)
+    url = re.search(r'/assets/main\.[0-9a-f]{10}\.js', html).group(0)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+
+    stale = client.get('/assets/main.0000000000.js')
+    assert stale.status_code == 200
+    assert stale.headers['Cache-Control'] == 'no-cache'
+
+    assert client.get('/assets/missing.0000000000.js').status_code == 404
+
+
+def test_unhashed_static_revalidates_with_etag(client):
+    """/static/ は毎回再検証させ、変更がなければ 304"""
+    response = client.get('/static/main.js')
+    assert response.headers['Cache-Control'] == 'no-cache'
+    etag = response.headers['ETag']
+
+    assert client.get('/static/main.js', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_hash_follows_file_content(tmp_path):
+    """ファイルの内容が変わるとハッシュ入りファイル名も変わる"""
+    path = tmp_path / 'app.js'
+    path.write_text('console.log(1);')
+    first = static_assets.hashed_filename(tmp_path, 'app.js')
+
+    path.write_text('console.log(2);')
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1_000_000))
+    second = static_assets.hashed_filename(tmp_path, 'app.js')
+
+    assert first != second
+    assert static_assets.parse_hashed_filename(second) == ('app.js', second.split('.')[1])
+    assert static_assets.hashed_filename(tmp_path, 'missing.js') is None
+
+
+def test_extensionless_and_dotted_directory_round_trip(tmp_path, monkeypatch):
+    """拡張子のないファイルや「.」を含むディレクトリでも、asset_url() のURLで配信できる"""
+    import app as app_module
+
+    (tmp_path / 'img.v2').mkdir()
+    for filename in ['LICENSE', 'img.v2/logo', 'img.v2/logo.png', '.nojekyll']:
+        (tmp_path / filename).write_text(filename)
+    monkeypatch.setattr(app_module, 'STATIC_DIR', tmp_path)
+
+    for filename, hashed in static_assets.build_manifest(tmp_path).items():
+        assert static_assets.parse_hashed_filename(hashed) == (filename, static_assets.file_hash(tmp_path, filename))
+
+    client = app_module.app.test_client()
+    for filename in ['LICENSE', 'img.v2/logo']:
+        url = app_module.asset_url(filename)
+        assert url.startswith('/assets/')
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.get_data(as_text=True) == filename
+        assert 'immutable' in response.headers['Cache-Control']
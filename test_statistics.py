@@ -0,0 +1,92 @@
+"""
+提出統計の集計テーブル（トリガーで更新）のテスト
+"""
+import database
+
+
+def insert_submission(conn, submission_id, total_score, content=None):
+    conn.execute("""
+        INSERT INTO submissions (id, question_id, user_answer, corrected, total_score, score_content)
+        VALUES (?, 'q_1', 'answer', 'corrected', ?, ?)
+    """, (submission_id, total_score, content))
+
+
+def full_scan_statistics(conn):
+    """従来の全件集計（比較用）"""
+    row = conn.execute("""
+        SELECT COUNT(*) AS total, AVG(total_score) AS avg_score, MAX(total_score) AS max_score,
+               AVG(score_content) AS avg_content
+        FROM submissions
+    """).fetchone()
+    return {
+        'total_submissions': row['total'],
+        'average_score': round(row['avg_score'] or 0, 2),
+        'max_score': row['max_score'] or 0,
+        'content': round(row['avg_content'] or 0, 2),
+    }
+
+
+def summary(stats):
+    return {
+        'total_submissions': stats['total_submissions'],
+        'average_score': stats['average_score'],
+        'max_score': stats['max_score'],
+        'content': stats['average_scores']['content'],
+    }
+
+
+def test_rollup_tracks_insert_update_delete(temp_db):
+    """INSERT / UPDATE / DELETE 後も全件集計と同じ値になる"""
+    with database.get_db_connection() as conn:
+        insert_submission(conn, "s_1", 20, 4)
+        insert_submission(conn, "s_2", 15, None)
+        insert_submission(conn, "s_3", None, None)
+        conn.commit()
+        assert summary(database.get_statistics()) == full_scan_statistics(conn)
+
+        conn.execute("UPDATE submissions SET total_score = 10 WHERE id = 's_1'")
+        conn.commit()
+        assert summary(database.get_statistics()) == full_scan_statistics(conn)
+
+        conn.execute("DELETE FROM submissions WHERE id = 's_2'")
+        conn.commit()
+        assert summary(database.get_statistics()) == full_scan_statistics(conn)
+        assert database.get_statistics()['max_score'] == 10
+
+
+def test_rebuild_restores_drifted_rollup(temp_db):
+    """集計テーブルがずれても rebuild_statistics で元に戻る"""
+    with database.get_db_connection() as conn:
+        insert_submission(conn, "s_1", 20, 4)
+        conn.execute("UPDATE submission_stats SET total_submissions = 99, max_score = 1")
+        conn.commit()
+
+    rebuilt = database.rebuild_statistics()
+    assert rebuilt['total_submissions'] == 1
+    assert rebuilt['max_score'] == 20
+    assert rebuilt['average_scores']['content'] == 4
+
+
+def test_existing_submissions_counted_on_upgrade(temp_db):
+    """集計テーブル導入前のDBでは、初期化時に既存の提出から集計する"""
+    with database.get_db_connection() as conn:
+        insert_submission(conn, "s_1", 12)
+        conn.execute("DROP TABLE submission_stats")
+        conn.commit()
+
+    database.init_database()
+    assert database.get_statistics()['total_submissions'] == 1
+    assert database.get_statistics()['average_score'] == 12
+
+
+def test_theme_statistics_read_from_index(temp_db):
+    """テーマ統計は使用回数のインデックス順に読み、ソートしない"""
+    with database.get_db_connection() as conn:
+        plan = conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT theme, count, last_used FROM used_themes WHERE user_id = ?
+            ORDER BY count DESC, last_used DESC LIMIT 20
+        """, ("",)).fetchall()
+    details = " ".join(row["detail"] for row in plan)
+    assert "idx_used_themes_user_count" in details
+    assert "TEMP B-TREE" not in details
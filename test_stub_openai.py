@@ -0,0 +1,85 @@
+"""
+OpenAI 互換スタブ（stub_openai.py）のテスト
+"""
+import json
+
+import openai
+import pytest
+
+import stub_openai
+from models import QuestionResponse
+from prompts_correction_respect import get_correction_prompt
+from llm_service import get_prompts
+
+
+@pytest.fixture
+def stub():
+    """スタブを起動し、openai クライアント（SDKのリトライなし）を返す"""
+    server, base_url = stub_openai.start_server(stub_openai.StubSettings())
+    client = openai.OpenAI(api_key="sk-test", base_url=base_url, max_retries=0)
+    yield client
+    server.shutdown()
+
+
+def messages(prompt):
+    return [{"role": "system", "content": "JSON形式のみで回答してください。"}, {"role": "user", "content": prompt}]
+
+
+def test_classify_prompt_types():
+    """アプリのプロンプトから種類を判定できる"""
+    correction = get_correction_prompt("医師は患者の話を聞くべきだ。", "Doctors should listen to patients.", 5)
+    model_answer = get_prompts()['model_answer'].format(question_text="医師は患者の話を聞くべきだ。")
+    assert stub_openai.classify_prompt(messages(correction)) == "correction"
+    assert stub_openai.classify_prompt(messages(model_answer)) == "model_answer"
+    assert stub_openai.classify_prompt(messages("hello")) == "unknown"
+
+
+def test_built_responses_pass_app_validation():
+    """生成した応答がアプリの検証を通る（問題の段落数・模範解答の文数・添削の before）"""
+    prompt = "今回のthemeは以下に決定されました：\n**レビュー**\n今回のexcerpt_typeは以下に決定されました：\n**P2_P3**\n"
+    question = QuestionResponse(**stub_openai.build_question(prompt))
+    assert (question.theme, question.excerpt_type, len(question.japanese_paragraphs)) == ("レビュー", "P2_P3", 2)
+
+    model_answer = get_prompts()['model_answer'].format(question_text="医師は患者の話を聞く。\n看護師も同じだ。")
+    assert [t["japanese"] for t in stub_openai.build_model_answer(model_answer)["translations"]] == [
+        "医師は患者の話を聞く。", "看護師も同じだ。"
+    ]
+
+    answer = "Doctors listen to patients.\nNurses do the same."
+    points = stub_openai.build_correction(get_correction_prompt("原文。", answer, 8))["points"]
+    assert [p["before"] for p in points] == ["Doctors listen to patients.", "Nurses do the same."]
+
+
+def test_stream_and_response_format(stub):
+    """stream=True では SSE のチャンクを連結すると JSON になり、response_format 未指定ならコードブロックで返す"""
+    prompt = get_prompts()['model_answer'].format(question_text="医師は患者の話を聞く。")
+    chunks = stub.chat.completions.create(
+        model="gpt-4o", messages=messages(prompt), stream=True,
+        response_format={"type": "json_object"}, stream_options={"include_usage": True}
+    )
+    chunks = list(chunks)
+    content = "".join(c.choices[0].delta.content or "" for c in chunks if c.choices)
+    assert json.loads(content)["translations"][0]["sentence_id"] == 1
+    assert chunks[-1].usage.total_tokens > 0
+
+    text = stub.chat.completions.create(model="gpt-4o", messages=messages(prompt)).choices[0].message.content
+    assert text.startswith("```json")
+
+
+def test_error_injection(stub):
+    """429・壊れたJSONを注入でき、/stats に件数が残る"""
+    stub_openai.StubOpenAIHandler.settings = stub_openai.StubSettings(rate_429=1.0)
+    with pytest.raises(openai.RateLimitError):
+        stub.chat.completions.create(model="gpt-4o", messages=messages("hello"))
+
+    stub_openai.StubOpenAIHandler.settings = stub_openai.StubSettings(rate_malformed=1.0)
+    content = stub.chat.completions.create(
+        model="gpt-4o", messages=messages("hello"), response_format={"type": "json_object"}
+    ).choices[0].message.content
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(content)
+
+    stats = stub_openai.StubOpenAIHandler.stats.snapshot()
+    assert stats["injected"]["429"] == 1
+    assert stats["injected"]["malformed"] == 1
+    assert stats["requests"] == {"unknown": 2}
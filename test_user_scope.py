@@ -0,0 +1,93 @@
+"""
+利用者ごとの履歴・出題テーマ・統計のテスト
+"""
+import sqlite3
+
+import database
+
+
+def insert_submission(conn, submission_id, user_id, total_score):
+    conn.execute("""
+        INSERT OR IGNORE INTO questions (id, theme, japanese_sentences, hints, target_words)
+        VALUES ('q_1', '医療', '["文"]', '[]', '{}')
+    """)
+    conn.execute("""
+        INSERT INTO submissions (id, question_id, user_answer, corrected, total_score, user_id)
+        VALUES (?, 'q_1', 'answer', 'corrected', ?, ?)
+    """, (submission_id, total_score, user_id))
+
+
+def test_used_themes_counted_per_user_and_globally(temp_db):
+    """出題テーマは利用者ごとの行と全体（user_id = ''）の行の両方に数える"""
+    database.record_used_theme("医療倫理", "paragraph", user_id="student_a")
+    database.record_used_theme("医療倫理", "paragraph", user_id="student_b")
+    database.record_used_theme("公衆衛生", "paragraph", user_id="student_a")
+
+    assert database.get_excluded_themes(10, user_id="student_b") == ["医療倫理"]
+    assert sorted(database.get_excluded_themes(10, user_id="student_a")) == ["公衆衛生", "医療倫理"]
+
+    overall = {row["theme"]: row["count"] for row in database.get_theme_statistics()}
+    assert overall == {"医療倫理": 2, "公衆衛生": 1}
+    mine = {row["theme"]: row["count"] for row in database.get_theme_statistics(user_id="student_b")}
+    assert mine == {"医療倫理": 1}
+
+
+def test_history_and_statistics_per_user(temp_db):
+    """履歴・統計は利用者で絞り込め、None なら全利用者"""
+    with database.get_db_connection() as conn:
+        insert_submission(conn, "s_1", "student_a", 10)
+        insert_submission(conn, "s_2", "student_a", 20)
+        insert_submission(conn, "s_3", "student_b", 60)
+        conn.commit()
+
+    assert [row["id"] for row in database.get_submission_history(10, user_id="student_a")] == ["s_2", "s_1"]
+    assert len(database.get_submission_history(10)) == 3
+
+    mine = database.get_statistics(user_id="student_a")
+    assert mine["total_submissions"] == 2 and mine["average_score"] == 15 and mine["max_score"] == 20
+    assert database.get_statistics()["total_submissions"] == 3
+
+
+def test_existing_used_themes_migrated_to_global_rows(tmp_path, monkeypatch):
+    """旧形式の used_themes（theme が主キー）は全体の行として引き継ぐ"""
+    db_path = tmp_path / "old.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE questions (id TEXT PRIMARY KEY, theme TEXT NOT NULL, japanese_sentences TEXT NOT NULL,
+                                hints TEXT NOT NULL, target_words TEXT NOT NULL,
+                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE used_themes (theme TEXT PRIMARY KEY, mode TEXT, count INTEGER DEFAULT 1,
+                                  last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        INSERT INTO used_themes (theme, mode, count) VALUES ('医療倫理', 'paragraph', 3);
+    """)
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, "DB_PATH", db_path)
+    database.init_database()
+
+    assert database.get_theme_statistics()[0]["count"] == 3
+    database.record_used_theme("医療倫理", "paragraph", user_id="student_a")
+    assert database.get_theme_statistics()[0]["count"] == 4
+    assert database.get_theme_statistics(user_id="student_a")[0]["count"] == 1
+
+
+def test_user_cookie_issued_and_reused(temp_db):
+    """利用者IDの Cookie がなければ発行し、以降はその利用者の履歴を返す"""
+    import app as app_module
+
+    client = app_module.app.test_client()
+    first = client.get("/api/history")
+    cookie = first.headers.get("Set-Cookie", "")
+    assert cookie.startswith("uid=") and "HttpOnly" in cookie
+
+    second = client.get("/api/history")
+    assert "Set-Cookie" not in second.headers
+
+    user_id = client.get_cookie("uid").value
+    with database.get_db_connection() as conn:
+        insert_submission(conn, "s_1", user_id, 10)
+        insert_submission(conn, "s_2", "someone_else", 20)
+        conn.commit()
+    assert [row["id"] for row in client.get("/api/history").get_json()["history"]] == ["s_1"]
+    assert len(client.get("/api/history?scope=all").get_json()["history"]) == 2
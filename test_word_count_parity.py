@@ -0,0 +1,74 @@
+"""
+語数カウントのサーバー/フロントエンド一致テスト
+constraint_validator.py と static/word_count.js が同じルールで同じ語数を返すことを確認
+"""
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from constraint_validator import (
+    deterministic_word_count,
+    normalize_punctuation,
+    WORD_COUNT_RULES,
+    WORD_COUNT_RULES_PATH
+)
+
+BASE_DIR = Path(__file__).parent
+CORPUS_PATH = BASE_DIR / 'data' / 'word_count_parity_corpus.json'
+WORD_COUNT_JS = BASE_DIR / 'static' / 'word_count.js'
+
+
+def load_corpus():
+    with open(CORPUS_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_js_counter(texts):
+    """Node.js で static/word_count.js を実行し、語数と正規化結果を返す"""
+    script = """
+const fs = require('fs');
+const { createWordCounter } = require(process.argv[1]);
+const rules = JSON.parse(fs.readFileSync(process.argv[2], 'utf8'));
+const texts = JSON.parse(fs.readFileSync(0, 'utf8'));
+const counter = createWordCounter(rules);
+process.stdout.write(JSON.stringify(texts.map(t => [counter.countWords(t), counter.normalizePunctuation(t)])));
+"""
+    result = subprocess.run(
+        ['node', '-e', script, str(WORD_COUNT_JS), str(WORD_COUNT_RULES_PATH)],
+        input=json.dumps(texts),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout)
+
+
+# ===== サーバー側 =====
+
+def test_server_matches_corpus():
+    """サーバーの語数カウントがコーパスの期待値と一致"""
+    for case in load_corpus():
+        assert deterministic_word_count(case['text']) == case['word_count'], case['note']
+
+
+def test_rules_are_single_character_mappings():
+    """変換表はすべて1文字→1文字（str.translate と JS の文字クラスで同じ結果になる条件）"""
+    for full_width, half_width in WORD_COUNT_RULES['punctuation_map'].items():
+        assert len(full_width) == 1 and len(half_width) == 1
+
+
+# ===== フロントエンド側 =====
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="Node.js がインストールされていません")
+def test_frontend_matches_server():
+    """フロントエンドの語数カウント・正規化がサーバーと完全に一致"""
+    corpus = load_corpus()
+    texts = [case['text'] for case in corpus]
+    js_results = run_js_counter(texts)
+
+    for case, (js_count, js_normalized) in zip(corpus, js_results):
+        assert js_count == case['word_count'], case['note']
+        assert js_normalized == normalize_punctuation(case['text']), case['note']
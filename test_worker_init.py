@@ -0,0 +1,39 @@
+"""
+gunicorn ワーカー初期化（fork 後の OpenAI クライアント作り直し）のテスト
+"""
+import os
+
+import pytest
+
+import config
+import llm_service
+
+
+@pytest.fixture(autouse=True)
+def dummy_key(monkeypatch):
+    """OPENAI_API_KEY のない環境でもクライアントを作れるようにし、作ったクライアントはテスト後に戻す"""
+    monkeypatch.setattr(config, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(llm_service, "_client", None)
+    monkeypatch.setattr(llm_service, "_client_pid", None)
+
+
+def test_client_reused_within_process():
+    """同じプロセス内では1つのクライアントを共有する"""
+    assert llm_service.get_client() is llm_service.get_client()
+
+
+def test_client_recreated_after_fork(monkeypatch):
+    """fork 後（pid が変わった場合）は親のクライアントを使わない"""
+    parent_client = llm_service.get_client()
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    child_client = llm_service.get_client()
+
+    assert child_client is not parent_client
+    assert llm_service.get_client() is child_client
+
+
+def test_reset_client():
+    """post_fork フックで破棄すると次回は新しいクライアントを作る"""
+    before = llm_service.get_client()
+    llm_service.reset_client()
+    assert llm_service.get_client() is not before